@@ -1,15 +1,20 @@
 from __future__ import annotations
 import os
 import os.path
-os.environ['PYGAME_HIDE_SUPPORT_PROMPT'] = "hide"
-import pygame
-from pygame import gfxdraw
-from pygame import freetype
-import sys
 import random
+import time
 import toml
 import re
-import os.path
+from typing import NamedTuple, TYPE_CHECKING
+from atoms_simulator.stats import RunningStats
+
+if TYPE_CHECKING:
+    import numpy
+    from atoms_simulator.checkpoint import Checkpoint
+    from atoms_simulator.profiling import Observer
+    from atoms_simulator.recorder import Recorder
+    from atoms_simulator.tracers import Tracers
+    from atoms_simulator.warmstart import WarmStart
 
 
 class Settings:
@@ -78,6 +83,11 @@ class Settings:
         return True
 
 
+# The version of the results of the objects engine, the Atom and TestAtom classes. Increase it with every change that
+# alters the result of any simulation, the results cached by atoms_simulator.cache are keyed by it.
+ENGINE_VERSION = 1
+
+
 class Atom:
     """A class used to store and process information about an instance of an atom.
 
@@ -89,12 +99,12 @@ class Atom:
     :type vx: float
     :ivar vy: the velocity vector's y coordinate
     :type vy: float
-    :ivar color: the color used to mark the atom during the simulation
-    :type color: :class:`pygame.Color`
+    :ivar color: the RGB color used to mark the atom during the simulation
+    :type color: tuple
     :ivar radius: the radius of the atom
-    :type radius: int
+    :type radius: float
     """
-    def __init__(self, x: int, y: int, vx: int, vy: int, color: pygame.Color, radius: int):
+    def __init__(self, x: int, y: int, vx: int, vy: int, color: tuple, radius: float):
         """Initialize an Atom type object.
 
         :param x: the x position coordinate
@@ -118,7 +128,7 @@ class Atom:
         """
         self.x, self.y = self.x + self.vx * time_step, self.y + self.vy * time_step
 
-    def wall_bounce(self, width: int, height: int, collision_tolerance: int) -> bool:
+    def wall_bounce(self, width: int, height: int, collision_tolerance: float) -> bool:
         """Checks if a collision between the atom and the wall occured and modifies the atom's velocity.
 
         :param width: width of the container
@@ -145,44 +155,70 @@ class Atom:
             result = True
         return result
 
-    def atom_bounce(self, other: Atom, collision_tolerance: int) -> bool:
+    def atom_bounce(self, other: Atom, collision_tolerance: float) -> bool:
         """Checks if a collision between two atoms occured and modifies their velocities.
 
         :param other: an another atom
         :param collision_tolerance:
         :return:
         """
-        distance = ((self.x - other.x) ** 2 + (self.y - other.y) ** 2) ** 0.5
-        future_distance = ((self.x + self.vx - other.x - other.vx) ** 2 +
-                           (self.y + self.vy - other.y - other.vy) ** 2) ** 0.5
-        condition_1 = self.radius + other.radius <= distance <= self.radius + other.radius + collision_tolerance
-        a = other.x - self.x
-        b = other.y - self.y
-        condition_2 = round(self.vx * a + self.vy * b, 1) > 0
-        # condition_2 = (abs(self.vx) >= abs(self.vy) and self.vx * a > 0) or \
-        #               (abs(self.vx) < abs(self.vy) and self.vy * b > 0)
-        a, b = -a, -b
-        condition_3 = round(other.vx * a + other.vy * b, 1) > 0
-        # condition_3 = (abs(other.vx) >= abs(other.vy) and other.vx * a > 0) or \
-        #               (abs(other.vx) < abs(other.vy) and other.vy * b > 0)
-        # condition_4 = future_distance < self.radius + other.radius
-        if condition_1 and (condition_2 or condition_3):
-            a, b = -a, -b
-            if a == b == 0:
-                xn1, yn1 = 0, 0
-            else:
-                xn1 = (a * (a * self.vx + b * self.vy)) / (a ** 2 + b ** 2)
-                yn1 = (b * (a * self.vx + b * self.vy)) / (a ** 2 + b ** 2)
-            a, b = -a, -b
-            if a == b == 0:
-                xn2, yn2 = 0, 0
-            else:
-                xn2 = (a * (a * other.vx + b * other.vy)) / (a ** 2 + b ** 2)
-                yn2 = (b * (a * other.vx + b * other.vy)) / (a ** 2 + b ** 2)
-            self.vx, self.vy, other.vx, other.vy = \
-                self.vx - xn1 + xn2, self.vy - yn1 + yn2, other.vx - xn2 + xn1, other.vy - yn2 + yn1
-            return True
-        return False
+        velocities = atom_collision(self.x, self.y, self.vx, self.vy, self.radius, other.x, other.y, other.vx,
+                                    other.vy, other.radius, collision_tolerance)
+        if velocities is None:
+            return False
+        self.vx, self.vy, other.vx, other.vy = velocities
+        return True
+
+
+def atom_collision(x1: float, y1: float, vx1: float, vy1: float, r1: float, x2: float, y2: float, vx2: float,
+                   vy2: float, r2: float, collision_tolerance: float) -> tuple:
+    """Checks if a collision between two atoms occured and calculates their velocities after it.
+
+    This is the rule of :py:meth:`Atom.atom_bounce`, the numpy engine applies the same operations to the same pairs
+    in the same order in :py:func:`atoms_simulator.arrays.resolve_collisions`, so both engines give the same results.
+
+    :param x1: the x position coordinate of the first atom
+    :param y1: the y position coordinate of the first atom
+    :param vx1: the velocity vector's x coordinate of the first atom
+    :param vy1: the velocity vector's y coordinate of the first atom
+    :param r1: the radius of the first atom
+    :param x2: the x position coordinate of the second atom
+    :param y2: the y position coordinate of the second atom
+    :param vx2: the velocity vector's x coordinate of the second atom
+    :param vy2: the velocity vector's y coordinate of the second atom
+    :param r2: the radius of the second atom
+    :param collision_tolerance:
+    :return: the velocity vectors' x and y coordinates of the first and the second atom after the collision, None if
+        the atoms didn't collide
+    """
+    distance = ((x1 - x2) ** 2 + (y1 - y2) ** 2) ** 0.5
+    condition_1 = r1 + r2 <= distance <= r1 + r2 + collision_tolerance
+    if not condition_1:
+        return None
+    a = x2 - x1
+    b = y2 - y1
+    condition_2 = round(vx1 * a + vy1 * b, 1) > 0
+    # condition_2 = (abs(vx1) >= abs(vy1) and vx1 * a > 0) or \
+    #               (abs(vx1) < abs(vy1) and vy1 * b > 0)
+    a, b = -a, -b
+    condition_3 = round(vx2 * a + vy2 * b, 1) > 0
+    # condition_3 = (abs(vx2) >= abs(vy2) and vx2 * a > 0) or \
+    #               (abs(vx2) < abs(vy2) and vy2 * b > 0)
+    if not (condition_2 or condition_3):
+        return None
+    a, b = -a, -b
+    if a == b == 0:
+        xn1, yn1 = 0, 0
+    else:
+        xn1 = (a * (a * vx1 + b * vy1)) / (a ** 2 + b ** 2)
+        yn1 = (b * (a * vx1 + b * vy1)) / (a ** 2 + b ** 2)
+    a, b = -a, -b
+    if a == b == 0:
+        xn2, yn2 = 0, 0
+    else:
+        xn2 = (a * (a * vx2 + b * vy2)) / (a ** 2 + b ** 2)
+        yn2 = (b * (a * vx2 + b * vy2)) / (a ** 2 + b ** 2)
+    return vx1 - xn1 + xn2, vy1 - yn1 + yn2, vx2 - xn2 + xn1, vy2 - yn2 + yn1
 
 
 class TestAtom(Atom):
@@ -196,18 +232,18 @@ class TestAtom(Atom):
         :type vx: float
         :ivar vy: the velocity vector's y coordinate
         :type vy: float
-        :ivar color: the color used to mark the atom during the simulation
-        :type color: :class:`pygame.Color`
+        :ivar color: the RGB color used to mark the atom during the simulation
+        :type color: tuple
         :ivar radius: the radius of the atom
-        :type radius: int
+        :type radius: float
         :ivar bounced: Indicates if the atom has bounced recently.
         :type bounced: bool
         :ivar distance: The distance that the atom has managed to travel since the last bounce.
         :type distance: float
-        :ivar distance_storage: A list containing all previous distances.
-        :type distance_storage: list
+        :ivar stats: The statistics of all previous distances.
+        :type stats: :py:class:`atoms_simulator.stats.RunningStats`
         """
-    def __init__(self, x: int, y: int, vx: int, vy: int, color: pygame.Color, radius: int):
+    def __init__(self, x: int, y: int, vx: int, vy: int, color: tuple, radius: float):
         """Initialize an Atom type object.
 
         :param x: the x position coordinate
@@ -220,7 +256,7 @@ class TestAtom(Atom):
         super().__init__(x, y, vx, vy, color, radius)
         self.bounced = False
         self.distance = 0.0
-        self.distance_storage = []
+        self.stats = RunningStats()
 
     def store_distance(self):
         """Saves the current distance and resets its counter.
@@ -228,7 +264,7 @@ class TestAtom(Atom):
         :return:
         """
         if self.bounced:
-            self.distance_storage.append(self.distance)
+            self.stats.push(self.distance)
             self.distance = 0.0
         self.bounced = False
 
@@ -245,11 +281,9 @@ class TestAtom(Atom):
 
         :return:
         """
-        if len(self.distance_storage) == 0:
-            return 0.0
-        return sum(self.distance_storage) / len(self.distance_storage)
+        return self.stats.mean
 
-    def atom_bounce(self, other: Atom, collision_tolerance: int) -> bool:
+    def atom_bounce(self, other: Atom, collision_tolerance: float) -> bool:
         """Checks if a collision between two atoms occured and modifies their velocities.
 
         :param other: an another atom
@@ -261,169 +295,38 @@ class TestAtom(Atom):
         return result
 
 
-class TextBlock:
-    """A class used to create text blocks for :py:mod:`pygame` simulation.
-
-    :ivar text: The actual text that will be displayed.
-    :type text: str
-    :ivar width: A value that will be displayed must be within range (-10 ^ (*width* - 1), 10 ^ *width*). 0 - disable
-    :type width: int
-    :ivar precision: the precision of the fraction part of the number
-    :type precision: int
-    :ivar color: The color that will be applied to the text.
-    :type color: :py:class:`pygame.Color`
-    :ivar font: The font that will be used to generate the text.
-    :type font: :py:class:`pygame.freetype.Font`
-    :ivar field:
-    :type field: :py:class:`pygame.Rect`
-    :ivar p_field: Field with added padding around it.
-    :type p_field: :py:class:`pygame.Rect`
-    """
-    def __init__(self, text: str, width: int, precision: int, color: pygame.Color, font: pygame.freetype.Font,
-                 padding: int):
-        """Initialize a TextBlock type object
-
-        :param text: The actual text that will be displayed.
-        :param width: A value that will be displayed must be within range (-10 ^ (*width* - 1), 10 ^ *width*).
-        :param precision: the precision of the fraction part of the number
-        :param color: The color that will be applied to the text.
-        :param font: The font that will be used to generate the text.
-        :param padding: The size of the padding that will be created.
-        """
-        self.text = text
-        self.width = width
-        self.precision = precision
-        self.color = color
-        self.font = font
-        self.field = self.gen_rect()
-        self.render_point = (0, self.font.get_sized_ascender())
-        self.p_field = self.gen_padded_rect(padding)
-        self.font.origin = True
-
-    def gen_rect(self) -> pygame.Rect:
-        """Generates a field.
-
-        :return:
-        """
-        if self.width == 0:
-            _, rect = self.font.render(f"|{self.text}|", self.color)
-        else:
-            placeholder = float(10 ** (self.width - 1))
-            charr = f"|{self.text}: {placeholder:<{self.width + self.precision + 1}.{self.precision}f}|"
-            _, rect = self.font.render(charr, self.color)
-        rect.width += rect.x
-        rect.height = self.font.get_sized_height()
-        return rect
-
-    def gen_padded_rect(self, padding) -> pygame.Rect:
-        """Generates a padded field.
-
-        :param padding: The size of the padding that will be created.
-        :return:
-        """
-        p_field = pygame.Rect(self.field)
-        p_field.width += 2 * padding
-        p_field.height += 2 * padding
-        return p_field
-
-    def update_field(self):
-        """Centers the field based on the position of padded field."""
-        self.field.center = self.p_field.center
-        self.render_point = (self.render_point[0] + self.field.x, self.render_point[1] + self.field.y)
-
-    def gen_text(self, surface: pygame.Surface, value: float = 0):
-        """Generates a *text* surface.
-
-        :param value: An updated value for an optional number field.
-        """
-        if self.width == 0:
-            self.font.render_to(surface, self.render_point, f"|{self.text}|", self.color)
-        elif value >= 10 ** self.width:
-            placeholder = float(10 ** self.width - 10 ** -self.precision)
-            charr = f"|{self.text}: {placeholder:<{self.width + self.precision + 1}.{self.precision}f}|"
-            self.font.render_to(surface, self.render_point, charr, self.color)
-        elif value <= -10 ** (self.width - 1):
-            placeholder = float(-10 ** (self.width - 1) + 10 ** -self.precision)
-            charr = f"|{self.text}: {placeholder:<{self.width + self.precision + 1}.{self.precision}f}|"
-            self.font.render_to(surface, self.render_point, charr, self.color)
-        else:
-            charr = f"|{self.text}: {float(value):<{self.width + self.precision + 1}.{self.precision}f}|"
-            self.font.render_to(surface, self.render_point, charr, self.color)
-
-
 def random_list(n: int, width: int, height: int, v: int,
-                atom_radius: int, collision_tolerance: int, atoms: list = None) -> list:
+                atom_radius: float, collision_tolerance: float, atoms: list = None, rng: random.Random = None) -> list:
     """Create a list containing *n* randomly generated :py:class:`Atom` objects.
 
     :param n: number of atoms
     :param width: width of the available space
     :param height: height of the available space
-    :param v: velocity will be randomly chosen from <-v, v>
+    :param v: velocity coordinates will be randomly chosen from <-v, v> without 0
     :param atom_radius:
     :param collision_tolerance:
-    :param atoms: New atoms will be added to this list.
+    :param atoms: New atoms will be added to this list, their slots won't be used.
+    :param rng: The random number generator that will be used, the :py:mod:`random` module by default.
     :return: list containing *n* randomly generated :py:class:`Atom` objects
     :raise ValueError: if the container is too small for the chosen number of atoms
     """
+    # The atoms are placed by atoms_simulator.arrays.random_arrays, the generator is seeded from *rng*.
+    import numpy
+    from atoms_simulator.arrays import random_arrays
     if atoms is None:
         atoms = []
-    positions = []
-    for i in range(height // (2 * atom_radius + collision_tolerance)):
-        for j in range(width // (2 * atom_radius + collision_tolerance)):
-            positions.append(
-                (i * (2 * atom_radius + collision_tolerance) + atom_radius,
-                 j * (2 * atom_radius + collision_tolerance) + atom_radius)
-            )
-
-    for atom in atoms:
-        for i in range(len(positions)):
-            if positions[i] == (atom.x, atom.y):
-                del positions[i]
-                break
-
-    for _ in range(n):
-        if len(positions) == 0:
-            raise ValueError("The container is too small for the chosen number of atoms.")
-        index = random.randint(0, len(positions) - 1)
-        x, y = positions[index]
-        del positions[index]
-        vx = 0
-        vy = 0
-        while vx == 0:
-            vx = random.randint(-v, v)
-        while vy == 0:
-            vy = random.randint(-v, v)
-        atoms.append(Atom(x, y, vx, vy, pygame.Color(0, 0, 255), atom_radius))
+    if rng is None:
+        rng = random
+    x, y, vx, vy = random_arrays(n, width, height, v, atom_radius, collision_tolerance,
+                                 [atom.x for atom in atoms], [atom.y for atom in atoms],
+                                 numpy.random.default_rng(rng.getrandbits(64)))
+    atoms.extend(
+        Atom(*values, (0, 0, 255), atom_radius)
+        for values in zip(x.tolist(), y.tolist(), vx.tolist(), vy.tolist())
+    )
     return atoms
 
 
-def create_text_blocks(font: pygame.freetype.Font, padding: int) -> dict:
-    """Initializes all the text blocks for later use.
-
-    :param font: The font that will be used to generate the texts.
-    :param padding: The size of the padding that will be created.
-    :return: A dictionary containing :py:class:`TextBlock` objects.
-    """
-    text_blocks = {
-        "title": TextBlock("Dane atomu czerwonego", 0, 0, pygame.Color(0, 0, 0), font, padding),
-        "bounces": TextBlock("Ilość odbić", 3, 0, pygame.Color(0, 0, 0), font, padding),
-        "average": TextBlock("Średnia droga swobodna", 3, 2, pygame.Color(0, 0, 0), font, padding)
-    }
-    return text_blocks
-
-
-def convert_coords(container: pygame.Rect, x: float, y: float) -> (int, int):
-    """Converts the given coordinates for a simulation display purposes.
-
-    :param container: the simulation surface
-    :param x: the x position coordinate
-    :param y: the x position coordinate
-    :return: converted coordinates
-    """
-    y = container.height - y
-    return int(x), int(y)
-
-
 def settings_check(settings: Settings):
     """Checks if all of the necessary keys are present in a settings dictionary.
 
@@ -448,97 +351,752 @@ def settings_check(settings: Settings):
         raise ValueError("The settings file doesn't specify the number of atoms")
 
 
-def simulate(settings: Settings, graphics: bool):
+class SimulationConfig(NamedTuple):
+    """The settings of a single simulation, checked and converted once, so that the engines read plain attributes
+    instead of looking the values up in :py:class:`Settings` in every turn.
+
+    :ivar h: the height coefficient of the container
+    :type h: int
+    :ivar w: the width coefficient of the container
+    :type w: int
+    :ivar r: the radius of the atoms
+    :type r: float
+    :ivar v: the velocity limit
+    :type v: int
+    :ivar c: the collision tolerance
+    :type c: float
+    :ivar M: the M constant, 0 for a continuous simulation
+    :type M: int
+    :ivar K: the K constant
+    :type K: int
+    :ivar N: number of atoms, without the test atom
+    :type N: int
+    """
+    h: int
+    w: int
+    r: float
+    v: int
+    c: float
+    M: int
+    K: int
+    N: int
+
+    @classmethod
+    def from_settings(cls, settings: Settings, strict: bool = False) -> SimulationConfig:
+        """Checks the settings against the constraints documented in the settings file and creates the config.
+
+        :param settings: Settings file containing all of the necessary options.
+        :param strict: Indicates if the recommended ranges of the settings file, 20 <= h <= 100, 20 <= w <= 100,
+            1 < v, 1 < M or M = 0 and min(h, w) <= K, should be enforced too. They are not required by the
+            simulation, and the generated settings file doesn't satisfy the last one.
+        :return:
+        :raise ValueError: if one of the settings is not present, has a wrong type or is out of its range, r and c
+            may be fractional, the other settings must be integers
+        """
+        settings_check(settings)
+        values = {name: settings[name] for name in cls._fields}
+        for name, value in values.items():
+            if value is None:
+                raise ValueError(f"The settings file doesn't specify the {name} setting.")
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                raise ValueError(f"The {name} setting must be a number.")
+            if name not in ("r", "c") and not isinstance(value, int):
+                raise ValueError(f"The {name} setting must be an integer.")
+        # Every engine accepts a fractional radius and collision tolerance, they are always passed as floats so that
+        # the engines see the same types whatever the settings file contains.
+        values["r"], values["c"] = float(values["r"]), float(values["c"])
+        config = cls(**values)
+        if config.h < 1 or config.w < 1:
+            raise ValueError("The height and the width coefficients must be greater than 0.")
+        if config.r <= 0:
+            raise ValueError("The atom radius must be greater than 0.")
+        if config.v == 0:
+            raise ValueError("The velocity limit value must be different than 0.")
+        if config.v < 0:
+            raise ValueError("The velocity limit must be greater than 0.")
+        if not 0 <= config.c <= config.r / 10:
+            raise ValueError(f"The collision tolerance must be between 0 and r / 10 = {config.r / 10:g}.")
+        if config.M < 0:
+            raise ValueError("The M constant can't be negative.")
+        if config.K < 1:
+            raise ValueError("The K constant must be greater than 0.")
+        if config.N < 0:
+            raise ValueError("The number of atoms can't be negative.")
+        if config.N > config.h * config.w / 4 - 1:
+            raise ValueError(f"The number of atoms can't be greater than h * w / 4 - 1 = "
+                             f"{config.h * config.w / 4 - 1:g}.")
+        if strict:
+            if not (20 <= config.h <= 100 and 20 <= config.w <= 100):
+                raise ValueError("The height and the width coefficients should be between 20 and 100.")
+            if config.v <= 1:
+                raise ValueError("The velocity limit should be greater than 1.")
+            if config.M == 1:
+                raise ValueError("The M constant should be greater than 1, or 0 for a continuous simulation.")
+            if config.K < min(config.h, config.w):
+                raise ValueError(f"The K constant should be at least min(h, w) = {min(config.h, config.w)}.")
+        return config
+
+    @property
+    def width(self):
+        """The width of the container."""
+        return self.w * self.r
+
+    @property
+    def height(self):
+        """The height of the container."""
+        return self.h * self.r
+
+    @property
+    def time_step(self) -> float:
+        """The time step of a single turn."""
+        return 1 / (self.K * self.v)
+
+    @property
+    def cell_size(self):
+        """The largest distance between the centres of two colliding atoms."""
+        return 2 * self.r + self.c
+
+
+def create_atoms(settings: Settings | SimulationConfig, rng: random.Random = None) -> list:
+    """Creates the test atom in the corner of the container and *N* randomly placed atoms.
+
+    :param settings: Settings file containing all of the necessary options, or the config created from it.
+    :param rng: The random number generator that will be used, the :py:mod:`random` module by default.
+    :return: list of atoms, the test atom is the first one
+    """
+    if rng is None:
+        rng = random
+    config = SimulationConfig.from_settings(settings) if isinstance(settings, Settings) else settings
+    test_atom = TestAtom(config.r, config.r, rng.randint(1, config.v), rng.randint(1, config.v), (255, 0, 0), config.r)
+    return random_list(config.N, config.width, config.height, config.v, config.r, config.c, atoms=[test_atom],
+                       rng=rng)
+
+
+def create_arrays(settings: Settings | SimulationConfig, rng: random.Random = None) -> tuple:
+    """Creates the same atoms as :py:func:`create_atoms`, but returns them as arrays.
+
+    :param settings: Settings file containing all of the necessary options, or the config created from it.
+    :param rng: The random number generator that will be used, the :py:mod:`random` module by default.
+    :return: the x and y position coordinates, the velocity vectors' x and y coordinates and the radii of the atoms,
+        the test atom is the first one
+    """
+    import numpy
+    from atoms_simulator.arrays import random_arrays
+    if rng is None:
+        rng = random
+    config = SimulationConfig.from_settings(settings) if isinstance(settings, Settings) else settings
+    r = config.r
+    test_vx, test_vy = rng.randint(1, config.v), rng.randint(1, config.v)
+    x, y, vx, vy = random_arrays(config.N, config.width, config.height, config.v, r, config.c, [r], [r],
+                                 numpy.random.default_rng(rng.getrandbits(64)))
+    return numpy.concatenate(([r], x)), numpy.concatenate(([r], y)), numpy.concatenate(([test_vx], vx)), \
+        numpy.concatenate(([test_vy], vy)), numpy.full(config.N + 1, r, dtype=numpy.float64)
+
+
+ENGINES = ("objects", "numpy", "events")
+BROAD_PHASES = ("grid", "brute")
+
+
+class Snapshot(NamedTuple):
+    """The observables of a simulation after a step, yielded by :py:meth:`Simulation.iter_observables`.
+
+    :ivar turn: the turn counter, it doesn't grow in a continuous simulation
+    :type turn: int
+    :ivar steps: the number of performed turns
+    :type steps: int
+    :ivar time: the simulated time
+    :type time: float
+    :ivar bounces: number of bounces of the test atom
+    :type bounces: int
+    :ivar average: the average distance that the test atom travels
+    :type average: float
+    """
+    turn: int
+    steps: int
+    time: float
+    bounces: int
+    average: float
+
+
+class Simulation:
+    """A class used to perform a simulation of atoms in an enclosed container step by step.
+
+    The simulation is created from the settings, advanced with :py:meth:`step`, :py:meth:`run` or
+    :py:meth:`iter_observables`, and finished with :py:meth:`close`, so it can be stopped at any point and its state
+    inspected between the steps. It never draws anything, see :py:func:`simulate` for the graphical representation.
+    The meaning of the options is the same as in :py:func:`simulate`.
+
+    :ivar settings: Settings file containing all of the necessary options.
+    :type settings: :py:class:`Settings`
+    :ivar config: the checked settings, read by the simulation
+    :type config: :py:class:`SimulationConfig`
+    :ivar engine: the simulation engine
+    :type engine: str
+    :ivar broad_phase: the broad phase method
+    :type broad_phase: str
+    :ivar width: width of the container
+    :type width: int
+    :ivar height: height of the container
+    :type height: int
+    :ivar time_step: the time step of a single turn
+    :type time_step: float
+    :ivar turn: the turn counter, it doesn't grow in a continuous simulation
+    :type turn: int
+    :ivar steps: the number of performed turns
+    :type steps: int
+    :ivar state: the engine object, :py:class:`atoms_simulator.arrays.AtomArrays`,
+        :py:class:`atoms_simulator.events.EventSimulation` or :py:class:`atoms_simulator.parallel.StripSimulation`,
+        None in the objects engine
+    :ivar atoms: the list of :py:class:`Atom` objects of the objects engine, None in the other engines
+    :type atoms: list
+    """
+    def __init__(self, settings: Settings, engine: str = "objects", broad_phase: str = "grid", seed: int = None,
+                 stats: RunningStats = None, recorder: Recorder = None, checkpoint: Checkpoint = None,
+                 observer: Observer = None, adaptive: int = 0, tracers: Tracers = None, workers: int = 0,
+                 start: WarmStart = None):
+        """Initialize a Simulation type object, the atoms are placed and the saved state is loaded from the checkpoint.
+
+        :param settings: Settings file containing all of the necessary options.
+        :param engine: "objects", "numpy" or "events", see :py:func:`simulate`.
+        :param broad_phase: "grid" or "brute", see :py:func:`simulate`.
+        :param seed: Seed of the random number generator used to place the atoms.
+        :param stats: If given, the statistics of the distances travelled by the test atom are merged into it by
+            :py:meth:`close`.
+        :param recorder: If given, the frames of the simulation are written to the disk by this object.
+        :param checkpoint: If given, the state of the simulation is periodically saved by this object.
+        :param observer: If given, this object is notified about the time of every phase of every turn.
+        :param adaptive: the largest number of turns of a single adaptive step of the numpy engine, 0 - disabled
+        :param tracers: If given, the bounces and the distances of every atom are merged into it by :py:meth:`close`.
+        :param workers: number of processes of the numpy engine, see :py:func:`simulate`
+        :param start: the state that the atoms start from, see :py:func:`simulate`
+        :raise ValueError: if the settings are invalid (see :py:meth:`SimulationConfig.from_settings`), the engine is
+            unknown, an option isn't available in it or the warm start doesn't match the settings
+        """
+        config = SimulationConfig.from_settings(settings)
+        if engine not in ENGINES:
+            raise ValueError(f"Unknown simulation engine: {engine}.")
+        if broad_phase not in BROAD_PHASES:
+            raise ValueError(f"Unknown broad phase: {broad_phase}.")
+        if adaptive and engine != "numpy":
+            raise ValueError("The adaptive time step is available only in the numpy engine.")
+        if tracers is not None and engine == "objects":
+            raise ValueError("The tracers are available only in the numpy and the events engines.")
+        if workers > 1 and (engine != "numpy" or recorder is not None or checkpoint is not None or adaptive):
+            raise ValueError("The parallel simulation is available only in the numpy engine, without graphics, "
+                             "recording, checkpoints and the adaptive time step.")
+        if workers > 1 and config.M == 0:
+            raise ValueError("The parallel simulation can't be continuous.")
+        if start is not None and not start.matches(config):
+            raise ValueError("The warm start has a different container, number of atoms or collision tolerance.")
+        self.settings = settings
+        self.config = config
+        self.engine = engine
+        self.broad_phase = broad_phase
+        self.width = config.width
+        self.height = config.height
+        self.time_step = config.time_step
+        self.turn = 0
+        self.steps = 0
+        self.state = None
+        self.atoms = None
+        self._cell_size = config.cell_size
+        self._stats = stats
+        self._recorder = recorder
+        self._checkpoint = checkpoint
+        self._observer = observer
+        self._adaptive = adaptive
+        self._tracers = tracers
+        self._workers = workers
+        self._closed = False
+        self._colors = [(255, 0, 0)] + [(0, 0, 255)] * config.N
+
+        # Create atoms
+        self._rng = None if seed is None else random.Random(seed)
+        if start is not None:
+            arrays = start.arrays()
+        elif engine != "objects":
+            arrays = create_arrays(config, self._rng)
+        if workers > 1:
+            from atoms_simulator.parallel import StripSimulation
+            self.state = StripSimulation(*arrays, self.width, self.height, workers, self._cell_size)
+            self._test_stats = RunningStats()
+        elif engine == "numpy":
+            from atoms_simulator.arrays import AtomArrays
+            self.state = AtomArrays(*arrays)
+        elif engine == "events":
+            from atoms_simulator.events import EventSimulation
+            self.state = EventSimulation(*arrays, self.width, self.height)
+        elif start is not None:
+            x, y, vx, vy, _ = (values.tolist() for values in arrays)
+            self.atoms = [TestAtom(x[0], y[0], vx[0], vy[0], (255, 0, 0), config.r)]
+            self.atoms += [Atom(*values, (0, 0, 255), config.r) for values in zip(x[1:], y[1:], vx[1:], vy[1:])]
+        else:
+            self.atoms = create_atoms(config, self._rng)
+        if workers <= 1:
+            if stats is not None:
+                self._tracer.stats = stats.empty()
+            if tracers is not None:
+                from atoms_simulator.tracers import Tracers
+                self.state.tracers = Tracers(len(self.state))
+        if checkpoint is not None and (saved := checkpoint.load()) is not None:
+            self.turn, self.steps = saved["turn"], saved["step"]
+            if self.state is None:
+                self.atoms = saved["state"]
+            else:
+                self.state = saved["state"]
+            if self._rng is not None and saved["rng_state"] is not None:
+                self._rng.setstate(saved["rng_state"])
+        self._resumed = self.steps
+        if broad_phase == "grid":
+            from atoms_simulator.grid import candidate_pairs
+            self._candidate_pairs = candidate_pairs
+        if recorder is not None:
+            recorder.open(config.N + 1, config.M + 1 if config.M > 0 else 0, self.width, self.height, config.r,
+                          self.time_step)
+
+    @property
+    def _tracer(self):
+        # The object that holds the statistics of the test atom.
+        return self.atoms[0] if self.state is None else self.state
+
+    @property
+    def finished(self) -> bool:
+        """Indicates if all turns have been performed, always False in a continuous simulation."""
+        return 0 < self.config.M < self.turn
+
+    @property
+    def bounces(self) -> int:
+        """The number of bounces of the test atom."""
+        if self._workers > 1:
+            return self._test_stats.count
+        return self._tracer.stats.count
+
+    @property
+    def average(self) -> float:
+        """The average distance that the test atom travels."""
+        if self._workers > 1:
+            return self._test_stats.mean
+        return self._tracer.average_distance()
+
+    def snapshot(self) -> Snapshot:
+        """Returns the current observables.
+
+        :return:
+        """
+        return Snapshot(self.turn, self.steps, self.steps * self.time_step, self.bounces, self.average)
+
+    def positions(self) -> tuple:
+        """Returns the current positions of the atoms.
+
+        :return: the x and y position coordinates, the arrays of the engine are not copied
+        """
+        if self._workers > 1:
+            return self.state.state()[:2]
+        if self.state is None:
+            return [atom.x for atom in self.atoms], [atom.y for atom in self.atoms]
+        return self.state.x, self.state.y
+
+    def radii(self) -> list:
+        """Returns the radii of the atoms.
+
+        :return:
+        """
+        if self.state is None:
+            return [atom.radius for atom in self.atoms]
+        return [self.config.r] * (self.config.N + 1) if self._workers > 1 else self.state.radius.tolist()
+
+    def drawables(self):
+        """Returns the atoms in the form accepted by :py:meth:`atoms_simulator.graphics.Window.draw`.
+
+        :return: iterable of (x, y, radius, color) tuples
+        """
+        if self.state is None:
+            return ((atom.x, atom.y, atom.radius, atom.color) for atom in self.atoms)
+        x, y = self.positions()
+        return zip(x, y, self.radii(), self._colors)
+
+    def _lap(self, phase: str, start: float) -> float:
+        now = time.perf_counter()
+        self._observer.on_phase(phase, now - start)
+        return now
+
+    def step(self, n: int = 1) -> int:
+        """Performs up to *n* turns, fewer if the simulation finishes earlier.
+
+        The events engine and the parallel simulation perform all turns at once if nothing has to be done between
+        them, the other engines perform them one by one, or in adaptive steps that never cross *n*.
+
+        :param n: number of turns
+        :return: number of performed turns
+        :raise ValueError: if the simulation has already been closed
+        """
+        if self._closed:
+            raise ValueError("The simulation has already been closed.")
+        if self.config.M > 0:
+            n = min(n, self.config.M + 1 - self.turn)
+        if n <= 0:
+            return 0
+        if self._workers > 1 or (self.engine == "events" and self._recorder is None and self._checkpoint is None):
+            if self._observer is not None:
+                start = time.perf_counter()
+            if self._workers > 1:
+                self.state.run(n, self.time_step, self.config.c)
+                self._test_stats = self.state.tracers().atom_stats(0)
+            else:
+                self.state.advance(n * self.time_step)
+            if self._observer is not None:
+                self._lap("collisions", start)
+                self._observer.on_turn(n, self.bounces, self.average)
+            if self.config.M > 0:
+                self.turn += n
+            self.steps += n
+            return n
+        performed = 0
+        while performed < n:
+            performed += self._turn(n - performed)
+        return performed
+
+    def _turn(self, limit: int) -> int:
+        # A single iteration of the main loop, one turn or a single adaptive step of at most limit turns.
+        config = self.config
+        c = config.c
+        state = self.state
+        atoms = self.atoms
+        observer = self._observer
+        recorder = self._recorder
+        checkpoint = self._checkpoint
+        if checkpoint is not None and self.steps > self._resumed and self.steps % checkpoint.every == 0:
+            checkpoint.save(self.turn, self.steps, atoms if state is None else state,
+                            None if self._rng is None else self._rng.getstate())
+        if observer is not None:
+            start = time.perf_counter()
+        span = 1
+        if self.engine == "events" or self._adaptive:
+            pairs = None
+        elif self.broad_phase == "grid":
+            if state is not None:
+                pairs = self._candidate_pairs(state.x, state.y, self._cell_size, self.width, self.height)
+            else:
+                import numpy
+                pairs = self._candidate_pairs(
+                    numpy.array([atom.x for atom in atoms]), numpy.array([atom.y for atom in atoms]),
+                    self._cell_size, self.width, self.height
+                )
+        else:
+            pairs = None
+        if observer is not None:
+            start = self._lap("broad_phase", start)
+        if self.engine == "events":
+            pass
+        elif self._adaptive:
+            span = min(state.safe_turns(self.time_step, self.width, self.height, self._adaptive), limit)
+            # The steps end at the turns that are recorded or checkpointed.
+            for every in (recorder.every if recorder is not None else 0,
+                          checkpoint.every if checkpoint is not None else 0):
+                if every:
+                    span = min(span, every - self.steps % every)
+            span, *hits, walls = state.adaptive_step(
+                span, self.time_step, self.width, self.height, c,
+                self._cell_size if self.broad_phase == "grid" else None
+            )
+            if observer is not None:
+                start = self._lap("collisions", start)
+                observer.on_count("atom_bounces", len(hits[0]))
+                observer.on_count("wall_hits", int(walls.sum()))
+        elif state is not None:
+            hits = state.atom_bounce(c, pairs)
+            walls = state.wall_bounce(self.width, self.height, c)
+            if observer is not None:
+                start = self._lap("collisions", start)
+                observer.on_count("atom_bounces", len(hits[0]))
+                observer.on_count("wall_hits", int(walls.sum()))
+            state.store_distance()
+        else:
+            hits = 0
+            walls = 0
+            if pairs is not None:
+                first, second = pairs[0].tolist(), pairs[1].tolist()
+                k = 0
+                for i in range(len(atoms)):
+                    while k < len(first) and first[k] == i:
+                        hits += atoms[i].atom_bounce(atoms[second[k]], c)
+                        k += 1
+                    walls += atoms[i].wall_bounce(self.width, self.height, c)
+            else:
+                for i in range(len(atoms)):
+                    for j in range(i, len(atoms)):
+                        if i == j:
+                            continue
+                        hits += atoms[i].atom_bounce(atoms[j], c)
+                    walls += atoms[i].wall_bounce(self.width, self.height, c)
+            if observer is not None:
+                start = self._lap("collisions", start)
+                observer.on_count("atom_bounces", hits)
+                observer.on_count("wall_hits", walls)
+            atoms[0].store_distance()
+        if observer is not None:
+            if self.engine != "events" and not self._adaptive:
+                start = self._lap("store_distance", start)
+                observer.on_count(
+                    "pair_checks", len(pairs[0]) if pairs is not None else (config.N + 1) * config.N // 2
+                )
+        if recorder is not None and self.steps % recorder.every == 0:
+            if state is not None:
+                recorder.record(state.x, state.y, state.vx, state.vy, self.bounces, self.average)
+            else:
+                recorder.record([atom.x for atom in atoms], [atom.y for atom in atoms], [atom.vx for atom in atoms],
+                                [atom.vy for atom in atoms], self.bounces, self.average)
+            if observer is not None:
+                start = self._lap("record", start)
+        if self.engine == "events":
+            state.advance(self.time_step)
+            if observer is not None:
+                self._lap("collisions", start)
+        elif state is not None:
+            if not self._adaptive:
+                state.update(self.time_step)
+        else:
+            for atom in atoms:
+                atom.update(self.time_step)
+        if observer is not None:
+            if self.engine != "events":
+                self._lap("update", start)
+            observer.on_turn(span, self.bounces, self.average)
+        if config.M > 0:
+            self.turn += span
+        self.steps += span
+        return span
+
+    def iter_observables(self, every: int = 1):
+        """Performs the simulation and yields its observables after every *every* turns, and after the last turn.
+
+        The simulation isn't closed when the generator is exhausted, a continuous simulation yields forever.
+
+        :param every: number of turns between two snapshots
+        :return: generator of :py:class:`Snapshot` objects
+        """
+        while not self.finished:
+            self.step(every)
+            yield self.snapshot()
+
+    def run(self) -> (int, float):
+        """Performs all remaining turns and closes the simulation.
+
+        :return: number of bounces and the average distance of the test atom
+        """
+        while not self.finished:
+            self.step(self.config.M + 1 if self.config.M > 0 else 1)
+        self.close()
+        return self.bounces, self.average
+
+    def close(self):
+        """Finishes the simulation, can be called more than once.
+
+        The recording is closed, the statistics are merged into the *stats* and *tracers* objects, and the saved
+        state is removed from the checkpoint if all turns have been performed.
+        """
+        if self._closed:
+            return
+        self._closed = True
+        if self._recorder is not None:
+            self._recorder.close()
+        if self._workers > 1:
+            result = self.state.tracers()
+            self.state.close()
+            stats = self._test_stats
+        else:
+            result = self.state.tracers if self._tracers is not None else None
+            stats = self._tracer.stats
+        if self._checkpoint is not None and self.finished:
+            self._checkpoint.remove()
+        if self._stats is not None:
+            self._stats.merge(stats)
+        if self._tracers is not None:
+            self._tracers.merge(result)
+
+    def __enter__(self) -> Simulation:
+        return self
+
+    def __exit__(self, *exception):
+        self.close()
+
+
+def simulate(settings: Settings, graphics: bool, engine: str = "objects", broad_phase: str = "grid",
+             seed: int = None, stats: RunningStats = None, recorder: Recorder = None, checkpoint: Checkpoint = None,
+             observer: Observer = None, fps: int = 60, threaded: bool = False, adaptive: int = 0,
+             tracers: Tracers = None, workers: int = 0, start: WarmStart = None):
     """Performs a simulation of atoms in an enclosed container.
 
+    The simulation is performed by a :py:class:`Simulation` object, this function adds the graphical representation.
+
     :param settings: Settings file containing all of the necessary options.
     :param graphics: Indicates if the pygame module should be used for graphical representation of the simulation.
-    :raise ValueError: if velocity value if equal to 0
+    :param engine: "objects" processes a list of :py:class:`Atom` objects one at a time, "numpy" keeps the atoms in
+        contiguous arrays (see :py:class:`atoms_simulator.arrays.AtomArrays`) and processes them in batches, "events"
+        jumps from one collision to the next (see :py:class:`atoms_simulator.events.EventSimulation`) and doesn't
+        depend on the collision tolerance.
+    :param broad_phase: "grid" tests only the pairs of atoms from neighbouring cells of a uniform grid
+        (see :py:func:`atoms_simulator.grid.candidate_pairs`), "brute" tests every pair of atoms.
+    :param seed: Seed of the random number generator used to place the atoms, the global :py:mod:`random` state is
+        used if omitted.
+    :param stats: If given, the statistics of the distances travelled by the test atom are merged into it.
+    :param recorder: If given, the frames of the simulation are written to the disk by this
+        :py:class:`atoms_simulator.recorder.Recorder` object.
+    :param checkpoint: If given, the state of the simulation is periodically saved by this
+        :py:class:`atoms_simulator.checkpoint.Checkpoint` object, and if a saved state already exists, the simulation
+        continues from it. The saved state is deleted when the simulation finishes.
+    :param observer: If given, this :py:class:`atoms_simulator.profiling.Observer` object is notified about the time
+        of every phase of every turn and the number of tested pairs, bounces and wall hits.
+    :param fps: The highest number of frames drawn per second in the graphics mode, the physics runs as many turns
+        between two frames as it manages to. 0 - every turn is drawn.
+    :param threaded: Indicates if the physics should run on a separate thread in the graphics mode, so that drawing
+        and handling the window never stall it. The overlay shows the number of turns and frames per second.
+    :param adaptive: If greater than 0, the numpy engine performs up to this many turns in a single step, moving the
+        atoms that can't collide during it at once and sub-stepping the rest turn by turn
+        (see :py:meth:`atoms_simulator.arrays.AtomArrays.adaptive_step`). The step is sized from the speed of the
+        fastest atom and the average gap between atoms, the results are still counted in turns.
+    :param tracers: If given, the bounces and the distances travelled by every atom, not only by the test atom, are
+        merged into this :py:class:`atoms_simulator.tracers.Tracers` object, which must have N + 1 atoms. Available
+        in the numpy and the events engines.
+    :param workers: If greater than 1, the numpy engine splits the container into this many strips and performs the
+        simulation in as many processes sharing the atoms' arrays (see
+        :py:class:`atoms_simulator.parallel.StripSimulation`). The results are the same as with a single process.
+        Not available with graphics, recording, checkpoints, the adaptive time step or a continuous simulation.
+    :param start: If given, the atoms start from this :py:class:`atoms_simulator.warmstart.WarmStart` state, ex. a
+        relaxed gas, instead of being placed on the lattice. It must have the same container, number of atoms and
+        collision tolerance.
+    :return: number of bounces and the average distance of the test atom
+    :raise ValueError: if the settings are invalid (see :py:meth:`SimulationConfig.from_settings`), the engine is
+        unknown, the adaptive time step is used with an engine other than numpy, the tracers are used with the
+        objects engine, the workers are used with an unsupported option or the warm start doesn't match the settings
     """
-    here = os.path.dirname(__file__)
-
-    settings_check(settings)
-
-    # Variables
-    with open(os.path.join(here, "VERSION"), 'r') as version_source:
+    if graphics and workers > 1:
+        raise ValueError("The parallel simulation is available only in the numpy engine, without graphics, "
+                         "recording, checkpoints and the adaptive time step.")
+    simulation = Simulation(settings, engine, broad_phase, seed, stats, recorder, checkpoint, observer, adaptive,
+                            tracers, workers, start)
+    if not graphics:
+        with simulation:
+            return simulation.run()
+
+    # Prepare graphic enviroment
+    from atoms_simulator.graphics import Window
+    with open(os.path.join(os.path.dirname(__file__), "VERSION"), 'r') as version_source:
         version = version_source.read()
-    width = settings['w'] * settings['r']
-    height = settings['h'] * settings['r']
-    number_of_atoms = settings["N"]
-    time_step = 1 / (settings['K'] * settings['v'])
-    if settings['v'] == 0:
-        raise ValueError("The velocity limit value must be different than 0.")
-
-    # Prepare graphic enviroment if necessary
-    if graphics:
-        # Pygame variables #1
-        pygame.init()
-        icon = pygame.image.load(os.path.join(here, "assets/icon.png"))
-        pygame.display.set_caption(f"atoms_simulator {version}")
-        pygame.display.set_icon(icon)
-        font = pygame.freetype.Font(os.path.join(here, "assets/JetBrainsMono-Bold.ttf"), size=25)
-        padding = 10
-        border_width = 1
-
-        # Arrange the fields
-        text_blocks = create_text_blocks(font, padding)
-        container = pygame.Rect((0, 0), (width, height))
-        p_container = pygame.Rect((0, 0), (width + 2 * padding, height + 2 * padding))
-        current = 0
-        for text_block in text_blocks.values():
-            text_block.p_field.top = p_container.bottom
-            text_block.p_field.left = current
-            current = text_block.p_field.right
-        screen_rect = pygame.Rect((0, 0), (0, 0))
-        screen_rect.union_ip(p_container)
-        for text_block in text_blocks.values():
-            screen_rect.union_ip(text_block.p_field)
-            text_block.update_field()
-        info_object = pygame.display.Info()
-        p_container.centerx = screen_rect.centerx
-        container.center = p_container.center
-        border_rect = container.inflate(2 * border_width, 2 * border_width)
-        if info_object.current_w < screen_rect.width or info_object.current_h < screen_rect.height:
-            screen_rect = container
-
-        # Pygame variables #2
-        screen = pygame.display.set_mode(screen_rect.bottomright)
-        container_surface = pygame.Surface(container.size)
-
-    # Create atoms
-    test_atom = TestAtom(settings['r'], settings['r'], random.randint(1, settings['v']),
-                         random.randint(1, settings['v']), pygame.Color(255, 0, 0), settings['r'])
-    atoms = [test_atom]
-    atoms = random_list(number_of_atoms, width, height, settings['v'], settings['r'], settings['c'], atoms=atoms)
-
-    # Start simulation
-    turn = 0
-    while turn <= settings['M']:
-        for i in range(len(atoms)):
-            for j in range(i, len(atoms)):
-                if i == j:
-                    continue
-                atoms[i].atom_bounce(atoms[j], settings['c'])
-            atoms[i].wall_bounce(width, height, settings['c'])
-        test_atom.store_distance()
-        if graphics:
-            screen.fill(pygame.Color(246, 248, 250))
-            container_surface.fill(pygame.Color(250, 251, 252))
-            pygame.draw.rect(screen, pygame.Color(225, 228, 232), border_rect, border_width)
-            for i in range(number_of_atoms):
-                x, y = convert_coords(container, atoms[i].x, atoms[i].y)
-                pygame.gfxdraw.filled_circle(container_surface, x, y, atoms[i].radius, atoms[i].color)
-                pygame.gfxdraw.aacircle(container_surface, x, y, atoms[i].radius, atoms[i].color)
-            screen.blit(container_surface, container)
-            text_blocks["title"].gen_text(screen)
-            text_blocks["bounces"].gen_text(screen, len(test_atom.distance_storage))
-            text_blocks["average"].gen_text(screen, test_atom.average_distance())
-            pygame.display.flip()
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT:
-                    sys.exit(0)
-        for i in range(number_of_atoms):
-            atoms[i].update(time_step)
-        if settings['M'] > 0:
-            turn += 1
-    return len(test_atom.distance_storage), test_atom.average_distance()
+    window = Window(simulation.width, simulation.height, f"atoms_simulator {version}", observer, threaded)
+    frame_time = 1 / fps if fps else 0.0
+    next_frame = time.perf_counter()
+    # An adaptive step is never split between two frames.
+    chunk = max(adaptive, 1)
+    with simulation:
+        if threaded:
+            import threading
+            import numpy
+            from atoms_simulator.buffers import DoubleBuffer
+            frames = DoubleBuffer(simulation.config.N + 1)
+
+            def physics():
+                while not simulation.finished and not frames.stop.is_set():
+                    performed = simulation.step(chunk)
+                    if not frames.fresh:
+                        frames.publish(*simulation.positions(), simulation.bounces, simulation.average)
+                    frames.steps += performed
+
+            positions = numpy.zeros((2, simulation.config.N + 1))
+            radii = simulation.radii()
+            colors = [(255, 0, 0)] + [(0, 0, 255)] * simulation.config.N
+            worker = threading.Thread(target=frames.run, args=(physics,), daemon=True)
+            worker.start()
+            rates = (0.0, 0.0)
+            drawn = 0
+            last = (time.perf_counter(), 0, 0)
+            try:
+                while worker.is_alive():
+                    if frames.fresh:
+                        bounces, average = frames.read(positions)
+                        window.draw(zip(positions[0], positions[1], radii, colors), bounces, average, rates)
+                        drawn += 1
+                    window.handle_events()
+                    now = time.perf_counter()
+                    if now - last[0] >= 0.5:
+                        rates = ((frames.steps - last[1]) / (now - last[0]), (drawn - last[2]) / (now - last[0]))
+                        last = (now, frames.steps, drawn)
+                    # The drawing thread mostly sleeps, so that the physics thread holds the interpreter.
+                    next_frame = max(next_frame + frame_time, now)
+                    time.sleep(max(next_frame - now, 0.001))
+            finally:
+                frames.stop.set()
+                worker.join()
+            if frames.error is not None:
+                raise frames.error
+        else:
+            while not simulation.finished:
+                simulation.step(chunk)
+                if (now := time.perf_counter()) >= next_frame:
+                    next_frame = now + frame_time
+                    # The window reports the time of drawing the frame itself.
+                    window.draw(simulation.drawables(), simulation.bounces, simulation.average)
+                    if observer is not None:
+                        start = time.perf_counter()
+                    window.handle_events()
+                    if observer is not None:
+                        observer.on_phase("events", time.perf_counter() - start)
+        return simulation.run()
+
+
+def simulate_ensemble(settings: Settings, seeds: list, broad_phase: str = "grid", stats: RunningStats | list = None,
+                      tracers: list = None) -> (numpy.ndarray, numpy.ndarray):
+    """Performs several independent simulations with the same settings at once, without graphics.
+
+    :param settings: Settings file containing all of the necessary options.
+    :param seeds: Seeds of the random number generators used to place the atoms, one per replica.
+    :param broad_phase: "grid" or "brute", see :py:func:`simulate`.
+    :param stats: If given, the statistics of the distances travelled by all test atoms are merged into it. If it is
+        a list, the statistics of every replica are merged into its own element.
+    :param tracers: If given, the bounces and the distances travelled by every atom of every replica are merged into
+        its own element of this list of :py:class:`atoms_simulator.tracers.Tracers` objects.
+    :return: number of bounces and the average distance of the test atom of every replica
+    :raise ValueError: if the settings are invalid (see :py:meth:`SimulationConfig.from_settings`), M is equal to 0
+        or the broad phase is unknown
+    """
+    config = SimulationConfig.from_settings(settings)
+    if config.M == 0:
+        raise ValueError("The ensemble mode can't perform a continuous simulation.")
+    if broad_phase not in BROAD_PHASES:
+        raise ValueError(f"Unknown broad phase: {broad_phase}.")
+    width, height, time_step, cell_size, c = config.width, config.height, config.time_step, config.cell_size, config.c
+
+    import numpy
+    from atoms_simulator.ensemble import Ensemble
+    replicas = [create_arrays(config, random.Random(seed)) for seed in seeds]
+    state = Ensemble(*(numpy.stack(values) for values in zip(*replicas)))
+    if tracers is not None:
+        from atoms_simulator.tracers import Tracers
+        state.tracers = Tracers(len(state))
+    for _ in range(config.M + 1):
+        if broad_phase == "grid":
+            pairs = state.grid_pairs(cell_size, width, height)
+        else:
+            pairs = None
+        state.atom_bounce(c, pairs)
+        state.wall_bounce(width, height, c)
+        state.store_distance()
+        state.update(time_step)
+    if isinstance(stats, list):
+        for target, replica_stats in zip(stats, state.replica_stats()):
+            target.merge(replica_stats)
+    elif stats is not None:
+        for replica_stats in state.replica_stats():
+            stats.merge(replica_stats)
+    if tracers is not None:
+        for target, replica_tracers in zip(tracers, state.tracers.split(state.replicas)):
+            target.merge(replica_tracers)
+    return state.count.copy(), state.average_distance()
+
+
+def __getattr__(name):
+    # The pygame helpers live in atoms_simulator.graphics, so that pygame is only imported when it is needed.
+    if name in ("TextBlock", "Window", "create_text_blocks", "convert_coords"):
+        from atoms_simulator import graphics
+        return getattr(graphics, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,453 @@
+from __future__ import annotations
+import numpy
+from atoms_simulator.stats import RunningStats
+
+
+# The version of the results of the numpy engine, which covers the ensemble and the parallel simulation too, as their
+# results are equal to the results of AtomArrays. Increase it when a change of the collision kernels or of the order of
+# the operations of a turn alters any result.
+ENGINE_VERSION = 2
+
+
+class AtomArrays:
+    """A class used to store and process information about all atoms at once.
+
+    Every attribute of the atoms is kept in a contiguous float64 array, so that position updates, wall bounces and
+    atom bounces are performed as batched :py:mod:`numpy` operations. The atom at index 0 is the test atom.
+
+    :ivar x: the x position coordinates
+    :type x: :py:class:`numpy.ndarray`
+    :ivar y: the y position coordinates
+    :type y: :py:class:`numpy.ndarray`
+    :ivar vx: the velocity vectors' x coordinates
+    :type vx: :py:class:`numpy.ndarray`
+    :ivar vy: the velocity vectors' y coordinates
+    :type vy: :py:class:`numpy.ndarray`
+    :ivar radius: the radii of the atoms
+    :type radius: :py:class:`numpy.ndarray`
+    :ivar bounced: Indicates if the test atom has bounced recently.
+    :type bounced: bool
+    :ivar distance: The distance that the test atom has managed to travel since the last bounce.
+    :type distance: float
+    :ivar stats: The statistics of all previous distances of the test atom.
+    :type stats: :py:class:`atoms_simulator.stats.RunningStats`
+    :ivar tracers: If set, the bounces and the distances of every atom are accumulated in it.
+    :type tracers: :py:class:`atoms_simulator.tracers.Tracers`
+    """
+    def __init__(self, x, y, vx, vy, radius):
+        """Initialize an AtomArrays type object.
+
+        :param x: the x position coordinates
+        :param y: the y position coordinates
+        :param vx: the velocity vectors' x coordinates
+        :param vy: the velocity vectors' y coordinates
+        :param radius: the radii of the atoms
+        """
+        self.x = numpy.array(x, dtype=numpy.float64)
+        self.y = numpy.array(y, dtype=numpy.float64)
+        self.vx = numpy.array(vx, dtype=numpy.float64)
+        self.vy = numpy.array(vy, dtype=numpy.float64)
+        self.radius = numpy.array(radius, dtype=numpy.float64)
+        self.bounced = False
+        self.distance = 0.0
+        self.stats = RunningStats()
+        self.tracers = None
+        self._pairs = None
+
+    @classmethod
+    def from_atoms(cls, atoms: list) -> AtomArrays:
+        """Create an AtomArrays type object from a list of :py:class:`Atom` objects.
+
+        :param atoms: list of atoms, the first one is treated as the test atom
+        :return:
+        """
+        return cls(
+            [atom.x for atom in atoms], [atom.y for atom in atoms],
+            [atom.vx for atom in atoms], [atom.vy for atom in atoms],
+            [atom.radius for atom in atoms]
+        )
+
+    def __len__(self):
+        return len(self.x)
+
+    def __getstate__(self):
+        # The cached pairs are cheap to recompute, but may be much larger than the atoms themselves.
+        state = self.__dict__.copy()
+        state["_pairs"] = None
+        return state
+
+    def all_pairs(self) -> (numpy.ndarray, numpy.ndarray):
+        """Returns the indices of every pair of atoms, ordered the same way as the nested loop in
+        :py:func:`atoms_simulator.simulate`.
+
+        :return:
+        """
+        if self._pairs is None:
+            self._pairs = numpy.triu_indices(len(self), 1)
+        return self._pairs
+
+    def update(self, time_step: float):
+        """Updates the positions by the velocities multiplied by *time_step*.
+
+        :param time_step:
+        """
+        self.x += self.vx * time_step
+        self.y += self.vy * time_step
+        self.distance += time_step * float(self.vx[0] ** 2 + self.vy[0] ** 2) ** 0.5
+        if self.tracers is not None:
+            self.tracers.move(self.vx, self.vy, time_step)
+
+    def wall_bounce(self, width: int, height: int, collision_tolerance: float) -> numpy.ndarray:
+        """Checks which atoms collided with the walls and modifies their velocities.
+
+        :param width: width of the container
+        :param height: height of the container
+        :param collision_tolerance:
+        :return: boolean mask of the atoms that bounced
+        """
+        flip_x, flip_y = wall_collisions(self.x, self.y, self.vx, self.vy, self.radius, width, height,
+                                         collision_tolerance)
+        self.vx[flip_x] *= -1
+        self.vy[flip_y] *= -1
+        return flip_x | flip_y
+
+    def atom_bounce(self, collision_tolerance: float, pairs: tuple = None) -> (numpy.ndarray, numpy.ndarray):
+        """Checks which pairs of atoms collided and modifies their velocities.
+
+        The pairs are resolved one by one in the order of the nested loop of :py:func:`atoms_simulator.simulate`, with
+        the rule of :py:func:`atoms_simulator.atom_collision`, so the results are equal to the results of the objects
+        engine. Only the pairs that may be in contact are resolved, they are selected at once by
+        :py:func:`contact_pairs`.
+
+        :param collision_tolerance:
+        :param pairs: indices of the candidate pairs, every pair is tested if omitted
+        :return: indices of the pairs that bounced
+        """
+        i, j = self.all_pairs() if pairs is None else pairs
+        i, j = contact_pairs(self.x, self.y, self.radius, i, j, collision_tolerance)
+        i, j = resolve_collisions(self.x, self.y, self.vx, self.vy, self.radius, i, j, collision_tolerance)
+        if len(i) == 0:
+            return i, j
+        self.mark_bounced(i, j)
+        if self.tracers is not None:
+            self.tracers.mark(i, j)
+        return i, j
+
+    def speed_limit(self) -> float:
+        """Returns the largest speed that an atom can reach in a single collision, the speed of the fastest atom
+        multiplied by the square root of 2.
+
+        :return:
+        """
+        return float(numpy.sqrt(self.vx ** 2 + self.vy ** 2).max()) * 2 ** 0.5
+
+    def safe_turns(self, time_step: float, width: float, height: float, max_turns: int) -> int:
+        """Estimates how many turns a single adaptive step should cover.
+
+        The step is sized so that two atoms moving with :py:meth:`speed_limit` close at most the average gap between
+        neighbouring atoms, estimated from the density, so that most atoms can't collide with anything during it.
+
+        :param time_step: the time step of a single turn
+        :param width: width of the container
+        :param height: height of the container
+        :param max_turns: the largest allowed number of turns
+        :return: number of turns, at least 1
+        """
+        speed = self.speed_limit()
+        gap = (width * height / len(self)) ** 0.5 - 2 * float(self.radius.mean())
+        if speed == 0:
+            return max_turns
+        return max(1, min(max_turns, int(gap / (2 * speed * time_step))))
+
+    def adaptive_step(self, turns: int, time_step: float, width: float, height: float, collision_tolerance: float,
+                      cell_size: float = None) -> (int, numpy.ndarray, numpy.ndarray, numpy.ndarray):
+        """Performs up to *turns* turns at once, sub-stepping only the atoms that may collide during them.
+
+        An atom is at risk if, moving with :py:meth:`speed_limit`, it may reach the collision window of another atom
+        or of a wall within the whole step. Only these atoms are moved turn by turn with the collisions tested in
+        every turn, the same way as in :py:func:`atoms_simulator.simulate`. All other atoms can't take part in any
+        collision, so they are moved by the whole step at once. If an atom at risk gets faster than the limit, which
+        takes several collisions within the step, the step ends early, so no collision is ever missed.
+
+        :param turns: the largest number of turns
+        :param time_step: the time step of a single turn
+        :param width: width of the container
+        :param height: height of the container
+        :param collision_tolerance:
+        :param cell_size: If given, the candidate pairs are found with :py:func:`atoms_simulator.grid.candidate_pairs`
+            using cells enlarged by the distance that the atoms can travel, every pair is tested otherwise.
+        :return: number of performed turns, indices of the pairs that bounced and the number of wall bounces of every
+            atom
+        """
+        limit = self.speed_limit()
+        travel = limit * turns * time_step
+        if cell_size is not None:
+            from atoms_simulator.grid import candidate_pairs
+            i, j = candidate_pairs(self.x, self.y, cell_size + 2 * travel, width, height)
+        else:
+            i, j = self.all_pairs()
+        gap = numpy.sqrt((self.x[j] - self.x[i]) ** 2 + (self.y[j] - self.y[i]) ** 2) - \
+            self.radius[i] - self.radius[j] - collision_tolerance
+        close = gap <= 2 * travel
+        pairs = i[close], j[close]
+        risk = numpy.zeros(len(self), dtype=bool)
+        risk[pairs[0]] = True
+        risk[pairs[1]] = True
+        margin = self.radius + collision_tolerance + travel
+        risk |= (self.x <= margin) | (self.x >= width - margin) | (self.y <= margin) | (self.y >= height - margin)
+        active = numpy.flatnonzero(risk)
+        hits = []
+        walls = numpy.zeros(len(self), dtype=numpy.int64)
+        performed = 0
+        while performed < turns:
+            hits.append(self.atom_bounce(collision_tolerance, pairs))
+            walls += self.wall_bounce(width, height, collision_tolerance)
+            self.store_distance()
+            self.x[active] += self.vx[active] * time_step
+            self.y[active] += self.vy[active] * time_step
+            if risk[0]:
+                self.distance += time_step * float(self.vx[0] ** 2 + self.vy[0] ** 2) ** 0.5
+            if self.tracers is not None:
+                self.tracers.move(self.vx, self.vy, time_step, active)
+            performed += 1
+            if len(hits[-1][0]) and (self.vx[active] ** 2 + self.vy[active] ** 2).max() > limit ** 2:
+                break
+        safe = ~risk
+        self.x[safe] += self.vx[safe] * (performed * time_step)
+        self.y[safe] += self.vy[safe] * (performed * time_step)
+        if not risk[0]:
+            self.distance += performed * time_step * float(self.vx[0] ** 2 + self.vy[0] ** 2) ** 0.5
+        if self.tracers is not None:
+            self.tracers.move(self.vx, self.vy, performed * time_step, safe)
+        return performed, numpy.concatenate([hit[0] for hit in hits]), numpy.concatenate([hit[1] for hit in hits]), \
+            walls
+
+    def mark_bounced(self, i: numpy.ndarray, j: numpy.ndarray):
+        """Marks the test atom as bounced if it is a part of one of the pairs.
+
+        :param i: indices of the first atoms of the pairs that bounced
+        :param j: indices of the second atoms of the pairs that bounced
+        """
+        if (i == 0).any():
+            self.bounced = True
+
+    def store_distance(self):
+        """Saves the current distance of the test atom and resets its counter.
+
+        :return:
+        """
+        if self.bounced:
+            self.stats.push(self.distance)
+            self.distance = 0.0
+        self.bounced = False
+        if self.tracers is not None:
+            self.tracers.store_distance()
+
+    def average_distance(self) -> float:
+        """Calculates the average distance that the test atom travels.
+
+        :return:
+        """
+        return self.stats.mean
+
+
+def wall_collisions(x: numpy.ndarray, y: numpy.ndarray, vx: numpy.ndarray, vy: numpy.ndarray,
+                    radius: numpy.ndarray, width: float, height: float,
+                    collision_tolerance: float) -> (numpy.ndarray, numpy.ndarray):
+    """Checks which atoms collided with the walls, the kernel of :py:meth:`AtomArrays.wall_bounce`.
+
+    :param x: the x position coordinates
+    :param y: the y position coordinates
+    :param vx: the velocity vectors' x coordinates
+    :param vy: the velocity vectors' y coordinates
+    :param radius: the radii of the atoms
+    :param width: width of the container
+    :param height: height of the container
+    :param collision_tolerance:
+    :return: boolean masks of the atoms whose x and y velocity coordinates should be reversed
+    """
+    flip_x = ((x - radius <= collision_tolerance) & (vx < 0)) | \
+             ((x + radius >= width - collision_tolerance) & (vx > 0))
+    flip_y = ((y - radius <= collision_tolerance) & (vy < 0)) | \
+             ((y + radius >= height - collision_tolerance) & (vy > 0))
+    return flip_x, flip_y
+
+
+def contact_pairs(x: numpy.ndarray, y: numpy.ndarray, radius: numpy.ndarray, i: numpy.ndarray, j: numpy.ndarray,
+                  collision_tolerance: float) -> (numpy.ndarray, numpy.ndarray):
+    """Selects the pairs of atoms whose distance is within the collision window, the first condition of
+    :py:func:`atoms_simulator.atom_collision`, which doesn't depend on the velocities.
+
+    The window is widened by a relative margin of 1e-9, so that no pair is lost to a different rounding of the
+    distance, the exact condition is checked again when the pairs are resolved.
+
+    :param x: the x position coordinates
+    :param y: the y position coordinates
+    :param radius: the radii of the atoms
+    :param i: indices of the first atoms of the candidate pairs
+    :param j: indices of the second atoms of the candidate pairs
+    :param collision_tolerance:
+    :return: indices of the first and the second atoms of the selected pairs, in the order of the candidates
+    """
+    distance = numpy.sqrt((x[j] - x[i]) ** 2 + (y[j] - y[i]) ** 2)
+    reach = radius[i] + radius[j]
+    close = numpy.flatnonzero(
+        (reach * (1 - 1e-9) <= distance) & (distance <= (reach + collision_tolerance) * (1 + 1e-9))
+    )
+    return i[close], j[close]
+
+
+def pair_collisions(x1: numpy.ndarray, y1: numpy.ndarray, vx1: numpy.ndarray, vy1: numpy.ndarray, r1: numpy.ndarray,
+                    x2: numpy.ndarray, y2: numpy.ndarray, vx2: numpy.ndarray, vy2: numpy.ndarray, r2: numpy.ndarray,
+                    collision_tolerance: float) -> tuple:
+    """Applies :py:func:`atoms_simulator.atom_collision` to many pairs at once, the pairs mustn't share atoms.
+
+    Every operation is the one performed by the rule on Python floats: the powers are computed by
+    :py:func:`numpy.float_power` with an array of exponents, which calls the same ``pow`` as Python does, and
+    round(v, 1) > 0 is the same as v >= 0.05, so the results are equal to the ones of the rule.
+
+    :param x1: the x position coordinates of the first atoms
+    :param y1: the y position coordinates of the first atoms
+    :param vx1: the velocity vectors' x coordinates of the first atoms
+    :param vy1: the velocity vectors' y coordinates of the first atoms
+    :param r1: the radii of the first atoms
+    :param x2: the x position coordinates of the second atoms
+    :param y2: the y position coordinates of the second atoms
+    :param vx2: the velocity vectors' x coordinates of the second atoms
+    :param vy2: the velocity vectors' y coordinates of the second atoms
+    :param r2: the radii of the second atoms
+    :param collision_tolerance:
+    :return: a mask of the pairs that collided and the velocity vectors' x and y coordinates of the first and the
+        second atoms of these pairs after the collisions
+    """
+    a = x2 - x1
+    b = y2 - y1
+    hit = (vx1 * a + vy1 * b >= 0.05) | (vx2 * -a + vy2 * -b >= 0.05)
+    close = numpy.flatnonzero(hit)
+    two = numpy.full(len(close), 2.0)
+    distance = numpy.float_power(
+        numpy.float_power(x1[close] - x2[close], two) + numpy.float_power(y1[close] - y2[close], two), two / 4
+    )
+    reach = r1[close] + r2[close]
+    hit[close] = (reach <= distance) & (distance <= reach + collision_tolerance)
+    a, b, two = a[hit], b[hit], numpy.full(numpy.count_nonzero(hit), 2.0)
+    vx1, vy1, vx2, vy2 = vx1[hit], vy1[hit], vx2[hit], vy2[hit]
+    square = numpy.float_power(a, two) + numpy.float_power(b, two)
+    # The atoms of a pair never share their position, as their distance has to be at least the sum of their radii.
+    xn1 = (a * (a * vx1 + b * vy1)) / square
+    yn1 = (b * (a * vx1 + b * vy1)) / square
+    a, b = -a, -b
+    square = numpy.float_power(a, two) + numpy.float_power(b, two)
+    xn2 = (a * (a * vx2 + b * vy2)) / square
+    yn2 = (b * (a * vx2 + b * vy2)) / square
+    return hit, vx1 - xn1 + xn2, vy1 - yn1 + yn2, vx2 - xn2 + xn1, vy2 - yn2 + yn1
+
+
+def resolve_collisions(x: numpy.ndarray, y: numpy.ndarray, vx: numpy.ndarray, vy: numpy.ndarray,
+                       radius: numpy.ndarray, i: numpy.ndarray, j: numpy.ndarray,
+                       collision_tolerance: float) -> (numpy.ndarray, numpy.ndarray):
+    """Resolves the collisions of the pairs in their order with the rule of :py:func:`atoms_simulator.atom_collision`
+    and modifies the velocities, every pair sees the velocities left by the previous ones.
+
+    :param x: the x position coordinates
+    :param y: the y position coordinates
+    :param vx: the velocity vectors' x coordinates
+    :param vy: the velocity vectors' y coordinates
+    :param radius: the radii of the atoms
+    :param i: indices of the first atoms of the pairs, in the order of resolution
+    :param j: indices of the second atoms of the pairs
+    :param collision_tolerance:
+    :return: indices of the first and the second atoms of the pairs that bounced, in the order of resolution
+    """
+    if len(i) == 0:
+        return i, j
+    # A pair can only collide if one of its atoms moves towards the other one. With the velocities from before the
+    # resolution this is checked exactly, round(v, 1) > 0 is the same as v >= 0.05. The rule has to be applied only
+    # to the pairs which are approaching and to the pairs connected to them by common atoms, the velocities of all the
+    # other atoms don't change before their pairs are checked.
+    a = x[j] - x[i]
+    b = y[j] - y[i]
+    approaching = (vx[i] * a + vy[i] * b >= 0.05) | (vx[j] * -a + vy[j] * -b >= 0.05)
+    involved = numpy.zeros(len(x), dtype=bool)
+    selected = approaching
+    count = -1
+    while count != numpy.count_nonzero(selected):
+        count = numpy.count_nonzero(selected)
+        involved[i[selected]] = True
+        involved[j[selected]] = True
+        selected = involved[i] | involved[j]
+    order = numpy.flatnonzero(selected)
+    # Every pair is placed on the level following the levels of the previous pairs of its atoms, so the pairs of a
+    # level don't share atoms and see the velocities left by all the previous pairs, the levels are resolved one after
+    # another.
+    count = len(order)
+    ends = numpy.concatenate((i[order], j[order]))
+    pair = numpy.tile(numpy.arange(count), 2)
+    slots = numpy.lexsort((pair, ends))
+    same = ends[slots[1:]] == ends[slots[:-1]]
+    previous = numpy.full(2 * count, count)
+    previous[slots[1:][same]] = pair[slots[:-1][same]]
+    levels = numpy.ones(count + 1, dtype=numpy.int64)
+    levels[count] = 0
+    while True:
+        following = numpy.maximum(levels[previous[:count]], levels[previous[count:]]) + 1
+        if numpy.array_equal(following, levels[:count]):
+            break
+        levels[:count] = following
+    levels = levels[:count]
+    hits = []
+    for level in range(1, int(levels.max(initial=0)) + 1):
+        pairs = order[levels == level]
+        first, second = i[pairs], j[pairs]
+        hit, vx1, vy1, vx2, vy2 = pair_collisions(x[first], y[first], vx[first], vy[first], radius[first], x[second],
+                                                  y[second], vx[second], vy[second], radius[second],
+                                                  collision_tolerance)
+        vx[first[hit]], vy[first[hit]], vx[second[hit]], vy[second[hit]] = vx1, vy1, vx2, vy2
+        hits.append(pairs[hit])
+    hits = numpy.sort(numpy.concatenate(hits)) if hits else numpy.zeros(0, dtype=numpy.int64)
+    return i[hits], j[hits]
+
+
+def random_arrays(n: int, width: int, height: int, v: int, atom_radius: float, collision_tolerance: float,
+                  x=None, y=None, rng: numpy.random.Generator = None) -> tuple:
+    """Randomly places *n* atoms on the free slots of a square lattice and draws their velocities.
+
+    :param n: number of atoms
+    :param width: width of the available space
+    :param height: height of the available space
+    :param v: velocity coordinates will be randomly chosen from <-v, v> without 0
+    :param atom_radius:
+    :param collision_tolerance:
+    :param x: the x position coordinates of already existing atoms, the slots closer to them than the lattice spacing
+        won't be used
+    :param y: the y position coordinates of already existing atoms
+    :param rng: The random number generator that will be used, a new one if omitted.
+    :return: the x and y position coordinates and the velocity vectors' x and y coordinates of the new atoms
+    :raise ValueError: if the container is too small for the chosen number of atoms
+    """
+    if rng is None:
+        rng = numpy.random.default_rng()
+    spacing = 2 * atom_radius + collision_tolerance
+    columns = int(width // spacing)
+    rows = int(height // spacing)
+    free = numpy.ones(columns * rows, dtype=bool)
+    if x is not None and len(x) > 0:
+        column = (numpy.asarray(x, dtype=numpy.float64) - atom_radius) / spacing
+        row = (numpy.asarray(y, dtype=numpy.float64) - atom_radius) / spacing
+        # An atom on a slot blocks only that slot, an atom between the slots, ex. in a relaxed state, blocks up to
+        # four of the surrounding ones.
+        for i in (0, 1):
+            for j in (0, 1):
+                slot_column = numpy.floor(column) + i
+                slot_row = numpy.floor(row) + j
+                near = ((slot_column - column) ** 2 + (slot_row - row) ** 2 < 1 - 1e-9) & \
+                    (slot_column >= 0) & (slot_column < columns) & (slot_row >= 0) & (slot_row < rows)
+                free[slot_column[near].astype(numpy.int64) * rows + slot_row[near].astype(numpy.int64)] = False
+    slots = numpy.flatnonzero(free)
+    if n > len(slots):
+        raise ValueError("The container is too small for the chosen number of atoms.")
+    column, row = numpy.divmod(rng.choice(slots, n, replace=False), rows)
+    velocity = rng.integers(1, v + 1, size=(2, n)) * rng.choice((-1, 1), size=(2, n))
+    x = (column * spacing + atom_radius).astype(numpy.float64)
+    y = (row * spacing + atom_radius).astype(numpy.float64)
+    return x, y, velocity[0].astype(numpy.float64), velocity[1].astype(numpy.float64)
@@ -0,0 +1,247 @@
+from __future__ import annotations
+import json
+import os.path
+import platform
+import random
+import time
+import tracemalloc
+import atoms_simulator
+from atoms_simulator.profiling import Profiler
+
+
+# Settings of the benchmarks that are not varied, the same as in the generated settings file.
+BASE_SETTINGS = {"r": 30, "v": 10, "c": 3, "K": 5}
+
+
+def bench_settings(n: int, size: int, turns: int) -> atoms_simulator.Settings:
+    """Creates the settings of a single benchmark.
+
+    :param n: number of atoms
+    :param size: the height and the width coefficient of the container
+    :param turns: the M constant
+    :return:
+    """
+    settings = atoms_simulator.Settings(None)
+    for name, value in dict(BASE_SETTINGS, h=size, w=size, M=turns, N=n).items():
+        settings.new(name, value)
+    return settings
+
+
+def peak_memory(function, *args) -> int:
+    """Measures the peak memory allocated while calling a function.
+
+    :param function:
+    :param args: arguments of the function
+    :return: number of bytes
+    """
+    tracemalloc.start()
+    try:
+        function(*args)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def bench_simulation(n: int, size: int, engine: str = "numpy", broad_phase: str = "grid", turns: int = 200,
+                     seed: int = 0, repeat: int = 3, memory_turns: int = 20) -> dict:
+    """Measures the throughput of a headless simulation.
+
+    :param n: number of atoms
+    :param size: the height and the width coefficient of the container
+    :param engine: the simulation engine, see :py:func:`atoms_simulator.simulate`
+    :param broad_phase: the broad phase method, see :py:func:`atoms_simulator.simulate`
+    :param turns: number of turns of a single run
+    :param seed: seed of the random number generator used to place the atoms
+    :param repeat: number of timed runs, the fastest one is reported
+    :param memory_turns: number of turns of the run used to measure the peak memory, which is much slower
+    :return: description of the benchmark and its results, the number of pair checks and the shares of the phases
+        are measured in an additional run with a :py:class:`atoms_simulator.profiling.Profiler`
+    :raise ValueError: if the container is too small for the chosen number of atoms
+    """
+    seconds = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        atoms_simulator.simulate(bench_settings(n, size, turns), False, engine, broad_phase, seed)
+        elapsed = time.perf_counter() - start
+        seconds = elapsed if seconds is None else min(seconds, elapsed)
+    # The profiler times every phase of every turn, so the counts and the shares of the phases come from a separate
+    # run, the same as the peak memory.
+    profiler = Profiler()
+    atoms_simulator.simulate(bench_settings(n, size, turns), False, engine, broad_phase, seed, observer=profiler)
+    pair_checks = profiler.counts.get("pair_checks", 0)
+    memory = peak_memory(
+        atoms_simulator.simulate, bench_settings(n, size, min(turns, memory_turns)), False, engine, broad_phase, seed
+    )
+    return {
+        "kind": "simulation", "engine": engine, "broad_phase": broad_phase, "N": n, "size": size, "turns": turns,
+        "seconds": seconds, "steps_per_second": profiler.turns / seconds, "pair_checks": pair_checks,
+        "pair_checks_per_second": pair_checks / seconds, "peak_memory": memory, "phases": profiler.summary()["shares"]
+    }
+
+
+def bench_scaling(n: int, size: int, workers: list, turns: int = 200, seed: int = 0, repeat: int = 3) -> list:
+    """Measures the strong scaling of the parallel simulation, the same simulation performed by different numbers of
+    worker processes.
+
+    :param n: number of atoms
+    :param size: the height and the width coefficient of the container
+    :param workers: numbers of worker processes, 1 - the numpy engine in a single process
+    :param turns: number of turns of a single run
+    :param seed: seed of the random number generator used to place the atoms
+    :param repeat: number of runs, the fastest one is reported
+    :return: description of the benchmark and its results for every number of workers, the speedup is relative to a
+        single process
+    :raise ValueError: if the container is too small for the chosen number of atoms or too narrow for the chosen
+        number of workers
+    """
+    results = []
+    for count in sorted(set(workers) | {1}):
+        seconds = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            atoms_simulator.simulate(bench_settings(n, size, turns), False, "numpy", "grid", seed, workers=count)
+            elapsed = time.perf_counter() - start
+            seconds = elapsed if seconds is None else min(seconds, elapsed)
+        results.append({
+            "kind": "scaling", "engine": "numpy", "broad_phase": "grid", "N": n, "size": size, "turns": turns,
+            "workers": count, "seconds": seconds, "steps_per_second": (turns + 1) / seconds
+        })
+    for result in results:
+        result["speedup"] = results[0]["seconds"] / result["seconds"]
+        result["efficiency"] = result["speedup"] / result["workers"]
+    return [result for result in results if result["workers"] in workers]
+
+
+def bench_initialization(n: int, size: int, seed: int = 0, repeat: int = 3) -> dict:
+    """Measures the time of placing the atoms with :py:func:`atoms_simulator.random_list`.
+
+    :param n: number of atoms
+    :param size: the height and the width coefficient of the container
+    :param seed: seed of the random number generator
+    :param repeat: number of runs, the fastest one is reported
+    :return: description of the benchmark and its results
+    :raise ValueError: if the container is too small for the chosen number of atoms
+    """
+    args = (n, size * BASE_SETTINGS["r"], size * BASE_SETTINGS["r"], BASE_SETTINGS["v"], BASE_SETTINGS["r"],
+            BASE_SETTINGS["c"])
+    seconds = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        atoms_simulator.random_list(*args, rng=random.Random(seed))
+        elapsed = time.perf_counter() - start
+        seconds = elapsed if seconds is None else min(seconds, elapsed)
+    memory = peak_memory(atoms_simulator.random_list, *args, None, random.Random(seed))
+    return {
+        "kind": "initialization", "N": n, "size": size, "seconds": seconds, "atoms_per_second": n / seconds,
+        "peak_memory": memory
+    }
+
+
+def run_benchmarks(numbers: list, sizes: list, engines: list = ("numpy",), broad_phases: list = ("grid",),
+                   turns: int = 200, seed: int = 0, repeat: int = 3, progress=None, workers: list = ()) -> dict:
+    """Runs the simulation and the initialization benchmarks over a grid of numbers of atoms and container sizes.
+
+    The combinations that can't be simulated, ex. the atoms don't fit in the container or the strips of the workers
+    would be too narrow, are skipped and listed in the "skipped" key of the result together with the reason.
+
+    :param numbers: numbers of atoms
+    :param sizes: the height and the width coefficients of the container
+    :param engines: the simulation engines
+    :param broad_phases: the broad phase methods
+    :param turns: number of turns of a single run
+    :param seed: seed of the random number generators
+    :param repeat: number of runs of every benchmark, the fastest one is reported
+    :param progress: If given, it is called with the description of every benchmark before it's run.
+    :param workers: If given, the strong scaling of the parallel simulation is measured for these numbers of worker
+        processes, see :py:func:`bench_scaling`.
+    :return: description of the environment and the results, ready to be saved as JSON
+    """
+    results = []
+    skipped = []
+    for size in sizes:
+        for n in numbers:
+            cases = [(bench_initialization, (n, size, seed, repeat), f"random_list N={n} size={size}")]
+            cases += [
+                (bench_simulation, (n, size, engine, broad_phase, turns, seed, repeat),
+                 f"{engine}/{broad_phase} N={n} size={size}")
+                for engine in engines for broad_phase in broad_phases
+            ]
+            if workers:
+                cases.append((bench_scaling, (n, size, workers, turns, seed, repeat),
+                              f"scaling N={n} size={size} workers={','.join(str(count) for count in workers)}"))
+            for function, args, description in cases:
+                if progress is not None:
+                    progress(description)
+                try:
+                    result = function(*args)
+                    if isinstance(result, list):
+                        results += result
+                    else:
+                        results.append(result)
+                except ValueError as error:
+                    skipped.append({"N": n, "size": size, "reason": str(error)})
+                    break
+    with open(os.path.join(os.path.dirname(atoms_simulator.__file__), "VERSION"), 'r') as version_source:
+        version = version_source.read().strip()
+    return {
+        "version": version, "python": platform.python_version(), "machine": platform.machine(), "results": results,
+        "skipped": skipped
+    }
+
+
+def result_key(result: dict) -> tuple:
+    """Returns the values that identify a benchmark, ex. to find it in a baseline.
+
+    :param result: a single result of :py:func:`run_benchmarks`
+    :return:
+    """
+    return tuple(result.get(name) for name in ("kind", "engine", "broad_phase", "N", "size", "workers"))
+
+
+def throughput(result: dict) -> float:
+    """Returns the value compared with a baseline, higher is better.
+
+    :param result: a single result of :py:func:`run_benchmarks`
+    :return:
+    """
+    return result["atoms_per_second"] if result["kind"] == "initialization" else result["steps_per_second"]
+
+
+def compare(report: dict, baseline: dict, threshold: float = 0.1) -> list:
+    """Finds the benchmarks whose throughput dropped compared to a baseline.
+
+    :param report: results of :py:func:`run_benchmarks`
+    :param baseline: previously saved results of :py:func:`run_benchmarks`
+    :param threshold: the largest allowed relative drop of throughput, ex. 0.1 for 10%
+    :return: list of (result, baseline result, relative change) tuples of the regressed benchmarks
+    """
+    previous = {result_key(result): result for result in baseline["results"]}
+    regressions = []
+    for result in report["results"]:
+        old = previous.get(result_key(result))
+        if old is None:
+            continue
+        change = throughput(result) / throughput(old) - 1
+        if change < -threshold:
+            regressions.append((result, old, change))
+    return regressions
+
+
+def save_report(report: dict, path: str):
+    """Saves the results of :py:func:`run_benchmarks` as JSON.
+
+    :param report:
+    :param path:
+    """
+    with open(path, "w") as target:
+        json.dump(report, target, indent=2)
+
+
+def load_report(path: str) -> dict:
+    """Loads results saved by :py:func:`save_report`.
+
+    :param path:
+    :return:
+    """
+    with open(path, "r") as origin:
+        return json.load(origin)
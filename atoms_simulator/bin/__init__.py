@@ -1,10 +1,23 @@
+from __future__ import annotations
 import math
 import click
+import json
+import os
 import os.path
+import random
 import shutil
+import subprocess
+import sys
+import time
+import concurrent.futures
+from typing import TYPE_CHECKING
 import atoms_simulator
-import numpy
-import matplotlib.pyplot as plt
+
+if TYPE_CHECKING:
+    import numpy
+    from atoms_simulator.store import ResultStore
+    from atoms_simulator.sweep import Sweep
+    from atoms_simulator.warmstart import WarmStart
 
 
 def get_project_path():
@@ -19,6 +32,375 @@ def get_path(path):
         i += 1
 
 
+def new_data_batch() -> str:
+    """Creates a new data_batch catalog in the ats_results catalog, its number is given by the results store.
+
+    :return: path of the new catalog
+    """
+    from atoms_simulator.store import ResultStore
+    if not os.path.isdir(results_path := os.path.join(os.getcwd(), "ats_results")):
+        os.mkdir(results_path)
+    store = ResultStore(os.path.join(results_path, "results.sqlite"))
+    try:
+        target_path = os.path.join(results_path, store.new_batch(results_path))
+    finally:
+        store.close()
+    os.mkdir(target_path)
+    return target_path
+
+
+def swept_entropy(swept: dict) -> list:
+    """Converts the values of the swept settings of a point of the grid to the entropy of a seed.
+
+    :param swept: the values of the swept settings other than the number of atoms, see
+        :py:meth:`atoms_simulator.sweep.Sweep.swept`
+    :return: a single integer derived from the values, nothing if no other setting is swept
+    """
+    if not swept:
+        return []
+    import hashlib
+    digest = hashlib.sha256(json.dumps(swept, sort_keys=True).encode()).digest()
+    return [int.from_bytes(digest[:8], "little")]
+
+
+def cell_seed(seed: int, n: int, repetition: int, swept: dict = None) -> int:
+    """Derives the seed of a single simulation of a test from the master seed.
+
+    The seed depends only on the number of atoms, the values of the other swept settings and the repetition, so a
+    simulation keeps its seed, and its cached result, when the range of numbers of atoms or the number of repetitions
+    changes, and the points of the grid with the same number of atoms don't share their initial states.
+
+    :param seed: the master seed
+    :param n: number of atoms
+    :param repetition: index of the repetition
+    :param swept: the values of the swept settings other than the number of atoms
+    :return:
+    """
+    import numpy
+    return int(numpy.random.SeedSequence([seed, n, repetition] + swept_entropy(swept)).generate_state(1)[0])
+
+
+def save_progress(path: str, bounce: numpy.ndarray, cop: numpy.ndarray, done: numpy.ndarray, stats: list):
+    """Saves the results of the finished simulations of a test, so that an interrupted test can be resumed.
+
+    :param path: path of the file, it is replaced atomically
+    :param bounce: number of bounces of every simulation
+    :param cop: the average distance of every simulation
+    :param done: Indicates which simulations have finished.
+    :param stats: statistics of distances of every number of atoms
+    """
+    import numpy
+    with open(f"{path}.tmp", "wb") as target:
+        numpy.savez(target, bounce=bounce, cop=cop, done=done, stats=[values.moments() for values in stats])
+    os.replace(f"{path}.tmp", path)
+
+
+def load_progress(path: str) -> (numpy.ndarray, numpy.ndarray, numpy.ndarray, list):
+    """Loads the results saved by :py:func:`save_progress`.
+
+    :param path: path of the file
+    :return: number of bounces, the average distance, indicators of finished simulations and the statistics of
+        distances
+    """
+    import numpy
+    with numpy.load(path) as progress:
+        return progress["bounce"], progress["cop"], progress["done"], [
+            atoms_simulator.RunningStats.from_moments(*values) for values in progress["stats"]
+        ]
+
+
+def confidence_interval(values: numpy.ndarray, z: float = 1.96) -> float:
+    """Calculates the half-width of the confidence interval of the mean, using the normal approximation.
+
+    :param values: results of the repetitions
+    :param z: the quantile of the normal distribution, 1.96 for the 95% confidence level
+    :return: the half-width, nan if there are less than two values
+    """
+    if len(values) < 2:
+        return math.nan
+    return z * float(values.std(ddof=1)) / math.sqrt(len(values))
+
+
+def relative_error(values: numpy.ndarray) -> float:
+    """Calculates the half-width of the confidence interval of the mean relative to the mean.
+
+    :param values: results of the repetitions
+    :return: the relative half-width, inf if there are less than two values or the mean is zero
+    """
+    half_width = confidence_interval(values)
+    if math.isnan(half_width):
+        return math.inf
+    if half_width == 0:
+        return 0.0
+    mean = abs(float(values.mean()))
+    return half_width / mean if mean else math.inf
+
+
+def pending_repetitions(bounce: numpy.ndarray, cop: numpy.ndarray, done: numpy.ndarray, repetitions: int,
+                        target_error: float = 0) -> list:
+    """Chooses the simulations of the next wave of a test.
+
+    Every number of atoms gets at least *repetitions* simulations. If *target_error* is given, a number of atoms gets
+    more of them until the confidence intervals of both the mean number of bounces and the mean distance are
+    narrower than *target_error* relative to the means. The number of the needed simulations is estimated from the
+    current relative error, which shrinks with the square root of the number of simulations, and limited by the
+    number of columns of the arrays.
+
+    :param bounce: number of bounces of every simulation
+    :param cop: the average distance of every simulation
+    :param done: Indicates which simulations have finished.
+    :param repetitions: the smallest number of simulations of every number of atoms
+    :param target_error: the largest relative half-width of the confidence intervals, 0 - no additional simulations
+    :return: list of (row, repetition) indices of the simulations to perform, empty if the test is complete
+    """
+    import numpy
+    cells = []
+    for i in range(done.shape[0]):
+        finished = int(done[i].sum())
+        needed = repetitions
+        if finished >= repetitions and target_error and finished < done.shape[1]:
+            error = max(relative_error(bounce[i, done[i]]), relative_error(cop[i, done[i]]))
+            if error > target_error:
+                estimate = finished * (error / target_error) ** 2 if math.isfinite(error) else finished + 1
+                needed = min(done.shape[1], max(finished + 1, math.ceil(estimate)))
+        cells += [(i, repetition) for repetition in numpy.flatnonzero(~done[i])[:max(needed - finished, 0)].tolist()]
+    return cells
+
+
+def tracer_results(path: str, sweep: Sweep, done: numpy.ndarray) -> dict:
+    """Summarizes the statistics of every atom saved by the simulations of a test.
+
+    For every point of the grid the per-atom numbers of bounces and average distances of all repetitions are treated
+    as one distribution. Their means and standard deviations are returned as tracer_bounces, tracer_bounces_sd,
+    tracer_change_of_position and tracer_change_of_position_sd, and the mean and the standard error of all distances
+    of all atoms taken together as tracer_pooled and tracer_pooled_se. The atoms that have never bounced are left out
+    of the average distances.
+
+    :param path: path of the data batch
+    :param sweep: the grid of the test
+    :param done: Indicates which simulations have finished.
+    :return: dictionary of lists with a value for every point of the grid
+    """
+    import numpy
+    from atoms_simulator.tracers import Tracers
+    results = {name: [] for name in ("bounces", "bounces_sd", "change_of_position", "change_of_position_sd",
+                                     "pooled", "pooled_se")}
+    for i in range(len(sweep)):
+        tracers = [
+            Tracers.load(os.path.join(path, "tracers", f"{sweep.cell_name(i, repetition)}.npz"))
+            for repetition in numpy.flatnonzero(done[i]).tolist()
+        ]
+        bounces = numpy.concatenate([values.count for values in tracers])
+        averages = numpy.concatenate([values.average_distance() for values in tracers])
+        averages = averages[~numpy.isnan(averages)]
+        pooled = atoms_simulator.RunningStats()
+        for values in tracers:
+            pooled.merge(values.pooled())
+        results["bounces"].append(bounces.mean())
+        results["bounces_sd"].append(bounces.std(ddof=1) if len(bounces) > 1 else 0.0)
+        results["change_of_position"].append(averages.mean() if len(averages) else 0.0)
+        results["change_of_position_sd"].append(averages.std(ddof=1) if len(averages) > 1 else 0.0)
+        results["pooled"].append(pooled.mean)
+        results["pooled_se"].append(pooled.standard_error)
+    return {f"tracer_{name}": values for name, values in results.items()}
+
+
+def prepare_warm_starts(sweep: Sweep, seed: int, turns: int, broad_phase: str) -> list:
+    """Relaxes the initial states of the simulations of a test.
+
+    The state of the smallest number of atoms of every point of the grid is relaxed from the lattice for *turns* turns.
+    The state of every next number of atoms is grown from the previous one and relaxed only for the part of *turns*
+    proportional to the share of the new atoms, or relaxed from the lattice if there is no free space left for them.
+
+    :param sweep: the grid of the test
+    :param seed: the master seed
+    :param turns: number of turns of the relaxation from the lattice
+    :param broad_phase: the broad phase method
+    :return: list of :py:class:`atoms_simulator.warmstart.WarmStart` objects, one for every point of the grid
+    """
+    import numpy
+    from atoms_simulator.warmstart import WarmStart
+    starts = []
+    with click.progressbar(range(len(sweep)), label="Relaxing the initial states:", show_eta=False) as rows:
+        for row in rows:
+            config = atoms_simulator.SimulationConfig.from_settings(sweep.settings(row))
+            state_seed = int(
+                numpy.random.SeedSequence([seed, config.N] + swept_entropy(sweep.swept(row))).generate_state(1)[0]
+            )
+            start = None
+            if row % sweep.shape[-1]:
+                added = config.N - starts[-1].config.N
+                try:
+                    start = starts[-1].grow(added, numpy.random.default_rng(state_seed))
+                except ValueError:
+                    # There is no free space left between the relaxed atoms.
+                    pass
+                else:
+                    start = start.relax(max(math.ceil(turns * added / (config.N + 1)), 1), broad_phase)
+            if start is None:
+                start = WarmStart.create(config, state_seed).relax(turns, broad_phase)
+            starts.append(start)
+    return starts
+
+
+def simulate_cell(settings: atoms_simulator.Settings, n: int, graphics: bool, engine: str, broad_phase: str, seed: int,
+                  record_path: str = None, record_every: int = 1, checkpoint_path: str = None,
+                  checkpoint_every: int = 1000,
+                  profile: bool = False, fps: int = 60, threaded: bool = False,
+                  adaptive: int = 0, tracers_path: str = None,
+                  workers: int = 0, start: WarmStart = None) -> (int, float, atoms_simulator.RunningStats, dict):
+    """Performs a single simulation of a test, can be run in a separate process.
+
+    :param settings: settings of the test
+    :param n: number of atoms
+    :param graphics: Indicates if the pygame module should be used for graphical representation of the simulation.
+    :param engine: the simulation engine
+    :param broad_phase: the broad phase method
+    :param seed: seed of the random number generator
+    :param record_path: If given, the simulation is recorded to this catalog.
+    :param record_every: the number of turns between two recorded frames
+    :param checkpoint_path: If given, the state of the simulation is periodically saved to this file, and the
+        simulation is resumed from it if it already exists.
+    :param checkpoint_every: the number of turns between two checkpoints
+    :param profile: Indicates if the phases of the simulation should be timed.
+    :param fps: the highest number of frames per second in the graphics mode
+    :param threaded: Indicates if the physics should run on a separate thread in the graphics mode.
+    :param adaptive: the largest number of turns of a single adaptive step, 0 - the adaptive time step is disabled
+    :param tracers_path: If given, the bounces and the distances of every atom are saved to this file.
+    :param workers: number of processes that perform the simulation, 0 or 1 - the current process
+    :param start: If given, the simulation starts from a fork of this state, with the velocities re-randomized by
+        the generator seeded with *seed*.
+    :return: number of bounces, the average distance and the statistics of distances of the test atom, the summary of
+        :py:class:`atoms_simulator.profiling.Profiler` or None
+    """
+    settings['N'] = n
+    stats = atoms_simulator.RunningStats()
+    recorder = None
+    if record_path is not None:
+        from atoms_simulator.recorder import Recorder
+        recorder = Recorder(record_path, record_every)
+    checkpoint = None
+    if checkpoint_path is not None:
+        from atoms_simulator.checkpoint import Checkpoint
+        checkpoint = Checkpoint(checkpoint_path, checkpoint_every)
+    profiler = None
+    if profile:
+        from atoms_simulator.profiling import Profiler
+        profiler = Profiler()
+    tracers = None
+    if tracers_path is not None:
+        from atoms_simulator.tracers import Tracers
+        tracers = Tracers(n + 1)
+    if start is not None:
+        import numpy
+        start = start.fork(numpy.random.default_rng(seed))
+    bounces, average = atoms_simulator.simulate(settings, graphics, engine, broad_phase, seed, stats, recorder,
+                                                checkpoint, profiler, fps, threaded, adaptive, tracers, workers, start)
+    if tracers is not None:
+        tracers.save(tracers_path)
+    return bounces, average, stats, None if profiler is None else profiler.summary()
+
+
+def simulate_row(settings: atoms_simulator.Settings, n: int, broad_phase: str, seeds: list,
+                 tracers_paths: list = None) -> (numpy.ndarray, numpy.ndarray, list, None):
+    """Performs all repetitions of a test at once, can be run in a separate process.
+
+    :param settings: settings of the test
+    :param n: number of atoms
+    :param broad_phase: the broad phase method
+    :param seeds: seeds of the random number generators, one per repetition
+    :param tracers_paths: If given, the bounces and the distances of every atom of every repetition are saved to
+        these files, one per repetition.
+    :return: number of bounces, the average distance and the statistics of distances of the test atom of every
+        repetition and None, the ensemble mode isn't profiled
+    """
+    settings['N'] = n
+    stats = [atoms_simulator.RunningStats() for _ in seeds]
+    tracers = None
+    if tracers_paths is not None:
+        from atoms_simulator.tracers import Tracers
+        tracers = [Tracers(n + 1) for _ in seeds]
+    bounces, average = atoms_simulator.simulate_ensemble(settings, seeds, broad_phase, stats, tracers)
+    if tracers is not None:
+        for replica_tracers, path in zip(tracers, tracers_paths):
+            replica_tracers.save(path)
+    return bounces, average, stats, None
+
+
+def run_tasks(tasks: dict, jobs: int):
+    """Performs the tasks, in separate processes if *jobs* is greater than 1.
+
+    :param tasks: dictionary of tasks, values are pairs of a function and its arguments
+    :param jobs: number of worker processes
+    :return: generator of pairs of a key and a result, in the order of completion
+    """
+    if jobs == 1:
+        for key, (function, args) in tasks.items():
+            yield key, function(*args)
+        return
+    with concurrent.futures.ProcessPoolExecutor(jobs) as executor:
+        futures = {executor.submit(function, *args): key for key, (function, args) in tasks.items()}
+        try:
+            for future in concurrent.futures.as_completed(futures):
+                yield futures[future], future.result()
+        finally:
+            for future in futures:
+                future.cancel()
+
+
+def serve_tasks(tasks: dict, path: str, max_attempts: int = 3, timeout: float = 600, interval: float = 0.5,
+                status: float = 30):
+    """Publishes the tasks in a work queue and waits for the ats worker processes to perform them.
+
+    The tasks are leased in the order of the dictionary. The unfinished tasks are removed from the queue when the
+    generator is closed, ex. after an interruption.
+
+    :param tasks: dictionary of tasks, values are pairs of a function and its arguments
+    :param path: the catalog of the :py:class:`atoms_simulator.workqueue.WorkQueue`
+    :param max_attempts: the largest number of times a task is leased
+    :param timeout: the longest time in seconds without any worker performing a task, 0 - wait forever
+    :param interval: the time between two checks of the queue in seconds
+    :param status: the time between two messages about the lack of active workers in seconds
+    :return: generator of pairs of a key and a result, in the order of completion
+    :raise RuntimeError: if a task has failed in all attempts or no worker has been active for *timeout* seconds
+    """
+    import pickle
+    import uuid
+    from atoms_simulator.workqueue import WorkQueue
+    queue = WorkQueue(path)
+    batch = uuid.uuid4().hex
+    keys = list(tasks)
+    queue.put(batch, [
+        (str(number), len(tasks) - number, pickle.dumps(task)) for number, task in enumerate(tasks.values())
+    ], max_attempts)
+    try:
+        remaining = len(tasks)
+        last_active = last_status = time.monotonic()
+        while remaining:
+            finished = queue.collect(batch)
+            for name, result, error in finished:
+                if error is not None:
+                    raise RuntimeError(f"A simulation has failed in all {max_attempts} attempts: {error}")
+                remaining -= 1
+                yield keys[int(name)], pickle.loads(result)
+            if finished:
+                continue
+            now = time.monotonic()
+            if queue.active(batch):
+                last_active = now
+            elif timeout and now - last_active > timeout:
+                raise RuntimeError(f"No worker has performed the simulations for {timeout:g} s, start ats worker "
+                                   f"processes with the queue {path}.")
+            elif now - last_active > status and now - last_status > status:
+                click.echo(f"\nNo active workers for {now - last_active:.0f} s, {remaining} simulations are waiting "
+                           f"in the queue {path}.")
+                last_status = now
+            time.sleep(interval)
+    finally:
+        queue.cancel(batch)
+        queue.close()
+
+
 @click.group()
 def ats():
     """Allows to perform detailed tests using atoms_simulator module."""
@@ -40,12 +422,103 @@ def init():
 @ats.command()
 @click.option("-g", "--graphics", "graphics", help="Turn on pygame simulation", is_flag=True)
 @click.option("--no-save", "no_save", help="Disable saving the results of the test.", is_flag=True)
-def test(graphics, no_save):
-    """Performs a series of tests based on the data in the settings_ats.toml file."""
-    settings_ats = atoms_simulator.Settings("settings_ats.toml")
-    if not settings_ats.load():
-        click.echo("No settings file detected. Generate the file first.")
-        return
+@click.option("-e", "--engine", "engine", type=click.Choice(atoms_simulator.ENGINES), default="objects",
+              show_default=True,
+              help="Simulation engine used to perform the tests. The objects and the numpy engine give the same "
+                   "results, numpy is faster. The events engine computes the exact times of the collisions instead "
+                   "of checking the atoms every turn, so its results differ and shouldn't be mixed with the others.")
+@click.option("--broad-phase", "broad_phase", type=click.Choice(atoms_simulator.BROAD_PHASES), default="grid",
+              show_default=True, help="Method used to choose the pairs of atoms tested for collisions.")
+@click.option("-j", "--jobs", "jobs", type=click.IntRange(min=0), default=1, show_default=True,
+              help="Number of worker processes, 0 - one per CPU core.")
+@click.option("-s", "--seed", "seed", type=click.IntRange(min=0), default=None,
+              help="Master seed used to derive the seeds of all simulations.")
+@click.option("--ensemble", "ensemble", is_flag=True,
+              help="Perform all repetitions of a test as one array computation, always uses the numpy engine.")
+@click.option("--record", "record", type=click.IntRange(min=0), default=0,
+              help="Record every k-th turn of every simulation to the data batch, 0 - disabled.")
+@click.option("--checkpoint", "checkpoint", type=click.IntRange(min=0), default=0,
+              help="Save the state of every simulation every k-th turn to the data batch, 0 - disabled.")
+@click.option("--resume", "resume", default=None,
+              help="Name of an interrupted data batch, its settings are used and the finished simulations skipped.")
+@click.option("--profile", "profile", is_flag=True,
+              help="Time the phases of every simulation and save a summary to profile.json in the data batch.")
+@click.option("--fps", "fps", type=click.IntRange(min=0), default=60, show_default=True,
+              help="The highest number of frames per second in the graphics mode, 0 - draw every turn.")
+@click.option("--threaded", "threaded", is_flag=True,
+              help="Run the physics on a separate thread in the graphics mode.")
+@click.option("--no-cache", "no_cache", is_flag=True,
+              help="Don't reuse or store the results of single simulations in the result cache.")
+@click.option("--adaptive", "adaptive", type=click.IntRange(min=0), default=0,
+              help="Let the numpy engine perform up to k turns in a single step, sub-stepping only the atoms that may "
+                   "collide, 0 - disabled.")
+@click.option("--target-error", "target_error", type=click.FloatRange(min=0), default=0,
+              help="Keep adding repetitions until the 95% confidence intervals of the mean number of bounces and the "
+                   "mean distance are narrower than this fraction of the means, 0 - always perform R repetitions.")
+@click.option("--max-repetitions", "max_repetitions", type=click.IntRange(min=1), default=None,
+              help="The largest number of repetitions with --target-error, 10 * R by default.")
+@click.option("--tracers", "tracers", is_flag=True,
+              help="Track the bounces and the distances of every atom, not only the test atom, and save their "
+                   "statistics to the data batch.")
+@click.option("-w", "--workers", "workers", type=click.IntRange(min=0), default=1, show_default=True,
+              help="Number of processes that share every single simulation of the numpy engine, the container is "
+                   "split into as many strips, 0 - one per CPU core.")
+@click.option("--strict", "strict", is_flag=True,
+              help="Require the settings to be in the recommended ranges described in the settings file.")
+@click.option("--warm-start", "warm_start", type=click.IntRange(min=0), default=0,
+              help="Start the simulations from a gas relaxed for this many turns instead of the lattice. The relaxed "
+                   "state is grown from the smaller numbers of atoms and shared by the repetitions, which get "
+                   "re-randomized velocities. 0 - disabled.")
+@click.option("--serve", "serve", default=None,
+              help="Publish the simulations in a work queue in this catalog, instead of performing them, and wait for "
+                   "ats worker processes to perform them. The catalog, and the data batch if the workers save "
+                   "files to it, must be reachable by the workers at the same paths.")
+@click.option("--retries", "retries", type=click.IntRange(min=0), default=2, show_default=True,
+              help="Number of times a simulation of --serve is retried after its worker fails or stops responding.")
+@click.option("--serve-timeout", "serve_timeout", type=click.FloatRange(min=0), default=600, show_default=True,
+              help="Number of seconds without any active worker after which --serve gives up and the test exits with "
+                   "an error, 0 - wait forever.")
+def test(graphics, no_save, engine, broad_phase, jobs, seed, ensemble, record, checkpoint, resume, profile, fps,
+         threaded, no_cache, adaptive, target_error, max_repetitions, tracers, workers, strict, warm_start, serve,
+         retries, serve_timeout):
+    """Performs a series of tests based on the data in the settings_ats.toml file.
+
+    Besides the numbers of atoms, the optional sweep table of the settings file can give lists of values of the other
+    physics settings, ex. r = [20, 30], and the test is performed for every combination of them. The most expensive
+    simulations are started first, and the results are saved to results.npz as arrays with an axis for every swept
+    setting, and the result of every single simulation to the results store, ats_results/results.sqlite. A sweep of
+    the numbers of atoms alone is also saved to one .csv file per array, ex. bounces.csv and change_of_position.csv.
+    """
+    import numpy
+    from atoms_simulator.sweep import Sweep, save_results
+    if resume is not None:
+        if no_save or record:
+            click.echo("A resumed test can't be recorded and its results are always saved.")
+            return
+        target_path = os.path.join(os.getcwd(), "ats_results", resume)
+        settings_ats = atoms_simulator.Settings(os.path.join(target_path, "used.toml"))
+        if not (settings_ats.load() and os.path.isfile(os.path.join(target_path, "progress.npz"))):
+            click.echo(f"The ats_results/{resume} catalog doesn't contain an interrupted test.")
+            return
+        # The simulations must continue exactly as they were started.
+        seed = settings_ats["seed"]
+        engine = settings_ats["engine"]
+        broad_phase = settings_ats["broad_phase"]
+        ensemble = settings_ats["ensemble"]
+        checkpoint = settings_ats["checkpoint"]
+        adaptive = settings_ats["adaptive"] or 0
+        target_error = settings_ats["target_error"] or 0
+        max_repetitions = settings_ats["R_max"]
+        tracers = settings_ats["tracers"] or False
+        workers = settings_ats["workers"] or 1
+        strict = settings_ats["strict"] or False
+        warm_start = settings_ats["warm_start"] or 0
+    else:
+        settings_ats = atoms_simulator.Settings("settings_ats.toml")
+        if not settings_ats.load():
+            click.echo("No settings file detected. Generate the file first.")
+            return
+        target_path = None
     if settings_ats["N_min"] is None:
         click.echo("The settings file is corrupted, please generate a new settings file.")
         return
@@ -58,83 +531,655 @@ def test(graphics, no_save):
     if settings_ats["R"] is None:
         click.echo("The settings file is corrupted, please generate a new settings file.")
         return
+    if max_repetitions is None:
+        max_repetitions = 10 * settings_ats["R"] if target_error else settings_ats["R"]
+    if max_repetitions < settings_ats["R"]:
+        click.echo("The largest number of repetitions can't be smaller than R.")
+        return
+    if jobs == 0:
+        jobs = os.cpu_count()
+    if workers == 0:
+        workers = os.cpu_count()
+    if workers > 1 and (jobs > 1 or engine != "numpy" or ensemble or graphics or record or checkpoint or adaptive):
+        click.echo("The simulations can be split between processes only in the numpy engine, with a single job and "
+                   "without the ensemble mode, graphics, recording, checkpoints and the adaptive time step.")
+        return
+    if graphics and jobs > 1:
+        click.echo("The graphics mode can't be used with more than one job.")
+        return
+    if serve is not None and (graphics or jobs > 1):
+        click.echo("The simulations published in a work queue can't use the graphics mode or more than one job.")
+        return
+    if graphics and ensemble:
+        click.echo("The graphics mode can't be used in the ensemble mode.")
+        return
+    if record and (no_save or ensemble):
+        click.echo("The simulations can't be recorded without saving the results or in the ensemble mode.")
+        return
+    if checkpoint and (no_save or ensemble):
+        click.echo("The simulations can't be checkpointed without saving the results or in the ensemble mode.")
+        return
+    if profile and (no_save or ensemble):
+        click.echo("The simulations can't be profiled without saving the results or in the ensemble mode.")
+        return
+    if tracers and (no_save or (engine == "objects" and not ensemble)):
+        click.echo("The tracers can't be saved without saving the results or used with the objects engine.")
+        return
+    if adaptive and (engine != "numpy" or ensemble):
+        click.echo("The adaptive time step is available only in the numpy engine, without the ensemble mode.")
+        return
+    if warm_start and ensemble:
+        click.echo("The warm start can't be used in the ensemble mode.")
+        return
+    try:
+        sweep = Sweep(settings_ats)
+        rows = [sweep.settings(row) for row in range(len(sweep))]
+        for row_settings in rows:
+            atoms_simulator.SimulationConfig.from_settings(row_settings, strict)
+    except ValueError as error:
+        click.echo(f"{error} Please generate a new settings file.")
+        return
+    # The pool takes the tasks in order, so starting with the longest simulations leaves no long tail at the end.
+    costs = [sweep.cost(row, broad_phase) for row in range(len(sweep))]
+    if seed is None:
+        seed = random.SystemRandom().randrange(2 ** 32)
     click.echo("Starting simulation...")
-    n_stop = settings_ats["N_min"] + settings_ats["N_step"] * (settings_ats["N_number"] - 1)
-    # size = max([settings_ats['h'], settings_ats['w'], math.ceil((4 * (n_stop + 1)) ** 0.5)])
-    # settings_ats['h'] = size
-    # settings_ats['w'] = size
-    test_cases = [
-        [i for _ in range(settings_ats['R'])] for i in range(settings_ats["N_min"], n_stop + 1, settings_ats["N_step"])
-    ]
-    bounce = numpy.empty((len(test_cases), settings_ats['R']), dtype=int)
-    bounce_results = numpy.empty(len(test_cases), dtype=int)
-    cop = numpy.empty((len(test_cases), settings_ats['R']), dtype=float)
-    cop_results = numpy.empty(len(test_cases), dtype=float)
-    settings_ats.new('N', settings_ats["N_min"])
-    with click.progressbar(
-            range(len(test_cases) * settings_ats['R'] - 1, -1, -1), label="Performing simulations:", show_eta=False
-    ) as progress:
-        for i in progress:
-            settings_ats['N'] = test_cases[i // settings_ats['R']][i % settings_ats['R']]
-            try:
-                bounce[i // settings_ats['R']][i % settings_ats['R']], \
-                cop[i // settings_ats['R']][i % settings_ats['R']] = atoms_simulator.simulate(settings_ats, graphics)
-            except ValueError as error:
-                click.echo(f"\n{error} Please generate a new settings file.")
-                return
-            if i % settings_ats['R'] == 0:
-                bounce_results[i // settings_ats['R']] = int(bounce[i // settings_ats['R']].mean())
-                cop_results[i // settings_ats['R']] = cop[i // settings_ats['R']].mean()
-    if not no_save:
-        if not os.path.isdir(results_path := os.path.join(os.getcwd(), "ats_results")):
-            os.mkdir(results_path)
-        target_path = get_path(os.path.join(results_path, "data_batch"))
-        os.mkdir(target_path)
-        numpy.savetxt(os.path.join(target_path, "bounces.csv"), bounce_results)
-        numpy.savetxt(os.path.join(target_path, "change_of_position.csv"), cop_results)
+    if target_path is not None:
+        progress_path = os.path.join(target_path, "progress.npz")
+        bounce, cop, done, cop_stats = load_progress(progress_path)
+    else:
+        bounce = numpy.empty((len(sweep), max_repetitions), dtype=int)
+        cop = numpy.empty((len(sweep), max_repetitions), dtype=float)
+        done = numpy.zeros((len(sweep), max_repetitions), dtype=bool)
+        cop_stats = [atoms_simulator.RunningStats() for _ in range(len(sweep))]
+        settings_ats.new('N', settings_ats["N_min"])
+        settings_ats.new('seed', seed)
+        settings_ats.new('engine', engine)
+        settings_ats.new('broad_phase', broad_phase)
+        settings_ats.new('ensemble', ensemble)
+        settings_ats.new('checkpoint', checkpoint)
+        settings_ats.new('adaptive', adaptive)
+        settings_ats.new('target_error', target_error)
+        settings_ats.new('R_max', max_repetitions)
+        settings_ats.new('tracers', tracers)
+        settings_ats.new('workers', workers)
+        settings_ats.new('strict', strict)
+        settings_ats.new('warm_start', warm_start)
+        if not no_save:
+            # The results are saved as they come, so that an interrupted test can be resumed.
+            target_path = new_data_batch()
+            progress_path = os.path.join(target_path, "progress.npz")
+            save_progress(progress_path, bounce, cop, done, cop_stats)
+            settings_ats.save(target=os.path.join(target_path, "used.toml"))
+    # Every cell gets its own seed, so the results don't depend on the number of jobs.
+    seeds = numpy.array(
+        [[cell_seed(seed, sweep.n(row), repetition, sweep.swept(row)) for repetition in range(max_repetitions)]
+         for row in range(len(sweep))], dtype=numpy.uint64
+    )
+    cache = None
+    if not (no_cache or graphics or record or profile or tracers):
+        from atoms_simulator.cache import ResultCache, engine_version, result_key
+        cache = ResultCache()
+        # The ensemble mode gives exactly the same results as the numpy engine.
+        engine_key = "numpy" if ensemble else engine
+        engine_options = f"adaptive {adaptive}" if adaptive else ""
+        if checkpoint and (engine == "events" or adaptive):
+            # These engines stop at the checkpointed turns instead of moving across them at once, which rounds the
+            # positions differently than a run without checkpoints.
+            engine_options += f", checkpoint every {checkpoint}"
+        if warm_start:
+            # The initial state of a simulation depends on the whole lineage of the states it was grown from, which
+            # are relaxed by the numpy engine.
+            engine_options += (f", warm start {warm_start} from N {settings_ats['N_min']} step "
+                               f"{settings_ats['N_step']}, seed {seed}, {broad_phase}, numpy engine "
+                               f"{engine_version('numpy')}")
+    profiles = {}
+    if profile and os.path.isfile(profile_path := os.path.join(target_path, "profile.json")):
+        with open(profile_path, "r") as origin:
+            profiles = json.load(origin)
+    if tracers:
+        os.makedirs(os.path.join(target_path, "tracers"), exist_ok=True)
+    starts = None
+    label = "Performing simulations:"
+    try:
+        # The simulations are performed in waves, every wave adds repetitions only to the numbers of atoms whose
+        # results are not yet precise enough. The waves depend only on the finished simulations, so a resumed test
+        # continues with the same wave.
+        while cells := pending_repetitions(bounce, cop, done, settings_ats['R'], target_error):
+            cache_keys = {}
+            if cache is not None:
+                cache_keys = {
+                    cell: result_key(rows[cell[0]], sweep.n(cell[0]), int(seeds[cell]), engine_key, engine_options)
+                    for cell in cells
+                }
+                hits = 0
+                for cell, key in cache_keys.items():
+                    if (result := cache.get(key)) is not None:
+                        bounce[cell], cop[cell] = result[0], result[1]
+                        done[cell] = True
+                        cop_stats[cell[0]].merge(result[2])
+                        hits += 1
+                if hits:
+                    click.echo(f"Found {hits} of {len(cells)} simulations in the cache.")
+                    if target_path is not None:
+                        save_progress(progress_path, bounce, cop, done, cop_stats)
+                    continue
+            if warm_start and starts is None:
+                starts = prepare_warm_starts(sweep, seed, warm_start, broad_phase)
+            if ensemble:
+                groups = {}
+                for row, repetition in cells:
+                    groups.setdefault(row, []).append(repetition)
+                tasks = {}
+                for i, repetitions in sorted(groups.items(), key=lambda group: -costs[group[0]] * len(group[1])):
+                    tasks[i, tuple(repetitions)] = (simulate_row, (
+                        rows[i], sweep.n(i), broad_phase, seeds[i, repetitions].tolist(),
+                        [os.path.join(target_path, "tracers", f"{sweep.cell_name(i, repetition)}.npz")
+                         for repetition in repetitions] if tracers else None
+                    ))
+            else:
+                tasks = {
+                    cell: (simulate_cell, (
+                        rows[cell[0]], sweep.n(cell[0]), graphics, engine, broad_phase, int(seeds[cell]),
+                        os.path.join(target_path, "trajectories", sweep.cell_name(*cell)) if record else None, record,
+                        os.path.join(target_path, "checkpoints", f"{sweep.cell_name(*cell)}.pkl")
+                        if checkpoint else None, checkpoint, profile, fps, threaded, adaptive,
+                        os.path.join(target_path, "tracers", f"{sweep.cell_name(*cell)}.npz") if tracers else None,
+                        workers, starts[cell[0]] if warm_start else None
+                    ))
+                    for cell in sorted(cells, key=lambda cell: -costs[cell[0]])
+                }
+            with click.progressbar(length=len(cells), label=label, show_eta=False) as progress:
+                if serve is None:
+                    results = run_tasks(tasks, jobs)
+                else:
+                    results = serve_tasks(tasks, serve, retries + 1, serve_timeout)
+                for key, (bounces, average, stats, summary) in results:
+                    if ensemble:
+                        finished = [(key[0], repetition) for repetition in key[1]]
+                    else:
+                        finished, bounces, average, stats = [key], [bounces], [average], [stats]
+                    for cell, cell_bounces, cell_average, cell_stats in zip(finished, bounces, average, stats):
+                        bounce[cell], cop[cell] = cell_bounces, cell_average
+                        done[cell] = True
+                        cop_stats[cell[0]].merge(cell_stats)
+                        if cache is not None:
+                            cache.put(cache_keys[cell], cell_bounces, cell_average, cell_stats)
+                    if summary is not None:
+                        profiles[sweep.cell_name(*key)] = summary
+                        with open(profile_path, "w") as target:
+                            json.dump(profiles, target, indent=2)
+                    if target_path is not None:
+                        save_progress(progress_path, bounce, cop, done, cop_stats)
+                    progress.update(len(finished))
+            label = "Performing additional simulations:"
+    except ValueError as error:
+        click.echo(f"\n{error} Please generate a new settings file.")
+        return
+    except RuntimeError as error:
+        click.echo(f"\n{error}")
+        sys.exit(1)
+    finally:
+        if cache is not None:
+            cache.close()
+    repetitions = done.sum(axis=1)
+    bounce_results = (numpy.where(done, bounce, 0).sum(axis=1) / repetitions).astype(int)
+    cop_results = numpy.where(done, cop, 0).sum(axis=1) / repetitions
+    cop_errors = numpy.array([stats.standard_error for stats in cop_stats])
+    bounce_intervals = numpy.array([confidence_interval(bounce[i, done[i]]) for i in range(len(sweep))])
+    cop_intervals = numpy.array([confidence_interval(cop[i, done[i]]) for i in range(len(sweep))])
+    if target_path is not None:
+        results = {
+            "bounces": bounce_results, "change_of_position": cop_results, "change_of_position_se": cop_errors,
+            "repetitions": repetitions, "bounces_ci": bounce_intervals, "change_of_position_ci": cop_intervals
+        }
+        if tracers:
+            results.update(tracer_results(target_path, sweep, done))
+        save_results(os.path.join(target_path, "results.npz"), sweep, results)
+        if len(sweep.axes) == 1:
+            # A sweep of the numbers of atoms alone is also saved in the older format of one .csv file per array.
+            for name, values in results.items():
+                numpy.savetxt(os.path.join(target_path, f"{name}.csv"), values,
+                              fmt="%d" if name == "repetitions" else "%.18e")
         settings_ats.save(target=os.path.join(target_path, "used.toml"))
+        from atoms_simulator.store import ResultStore
+        store = ResultStore(os.path.join(os.path.dirname(target_path), "results.sqlite"))
+        try:
+            store.add_results(os.path.basename(target_path), settings_ats.tags, sweep, bounce, cop, done, seeds)
+        finally:
+            store.close()
+        os.remove(progress_path)
+        shutil.rmtree(os.path.join(target_path, "checkpoints"), ignore_errors=True)
 
 
 @ats.command()
-@click.option("-b", "--data_batch", "data_batch", prompt=True, help="Name of the previously generated data batch.")
-def plot(data_batch):
-    """Plots the previously generated data."""
+@click.option("-q", "--queue", "queue_path", prompt=True, help="The catalog of the work queue of ats test --serve.")
+@click.option("--lease", "lease", type=click.FloatRange(min=1), default=60, show_default=True,
+              help="Number of seconds after which a simulation of a worker that stopped responding is given to "
+                   "another worker.")
+@click.option("--idle", "idle", type=click.FloatRange(min=0), default=0, show_default=True,
+              help="Number of seconds without any simulations to perform after which the worker exits, 0 - never.")
+def worker(queue_path, lease, idle):
+    """Performs the simulations published by ats test --serve, start one worker per CPU core."""
+    import pickle
+    import socket
+    import threading
+    from atoms_simulator.workqueue import WorkQueue
+
+    def heartbeat(token: str, stop: threading.Event):
+        # The lease is renewed from a separate connection, while the simulation runs.
+        renewals = WorkQueue(queue_path)
+        try:
+            while not stop.wait(lease / 3) and renewals.renew(token, lease):
+                pass
+        finally:
+            renewals.close()
+
+    name = f"{socket.gethostname()}:{os.getpid()}"
+    queue = WorkQueue(queue_path)
+    click.echo(f"Worker {name} is waiting for simulations...")
+    last_task = time.monotonic()
+    try:
+        while True:
+            if (task := queue.lease(name, lease)) is None:
+                if idle and time.monotonic() - last_task > idle:
+                    break
+                time.sleep(0.5)
+                continue
+            token, payload = task
+            stop = threading.Event()
+            renewing = threading.Thread(target=heartbeat, args=(token, stop), daemon=True)
+            renewing.start()
+            start = time.perf_counter()
+            try:
+                function, args = pickle.loads(payload)
+                result = function(*args)
+            except KeyboardInterrupt:
+                queue.release(token)
+                raise
+            except Exception as error:
+                queue.fail(token, f"{type(error).__name__}: {error}")
+                click.echo(f"A simulation has failed: {type(error).__name__}: {error}")
+            else:
+                if queue.complete(token, pickle.dumps(result)):
+                    click.echo(f"A simulation has finished in {time.perf_counter() - start:.1f} s.")
+                else:
+                    click.echo("A simulation has finished after its lease expired, the result is discarded.")
+            finally:
+                stop.set()
+                renewing.join()
+            last_task = time.monotonic()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        queue.close()
+
+
+# The labels of the axes of the plots and the names of the settings used in their titles.
+PLOT_LABELS = {
+    "N": ("Liczba atomów w pojemniku", "ilości atomów"),
+    "h": ("Współczynnik wysokości", "współczynnika wysokości"),
+    "w": ("Współczynnik szerokości", "współczynnika szerokości"),
+    "r": ("Promień atomu", "promienia atomu"),
+    "v": ("Prędkość graniczna", "prędkości granicznej"),
+    "c": ("Tolerancja kolizji", "tolerancji kolizji"),
+    "M": ("Stała M", "stałej M"),
+    "K": ("Stała K", "stałej K"),
+}
+
+
+def parse_fixed(values: tuple, option: str = "--at") -> dict:
+    """Converts the values of the --at option, or another option of the same form, to a dictionary.
+
+    :param values: strings of the form NAME=VALUE
+    :param option: name of the option, used in the error message
+    :return: the values by name
+    :raise ValueError: if a string has a wrong form
+    """
+    fixed = {}
+    for value in values:
+        name, separator, number = value.partition("=")
+        try:
+            fixed[name.strip()] = float(number)
+        except ValueError:
+            separator = ""
+        if not separator:
+            raise ValueError(f"The {option} option requires values of the form NAME=VALUE, not {value}.")
+    return fixed
+
+
+def load_batch(store: ResultStore, path: str) -> (atoms_simulator.Settings, dict, dict):
+    """Loads the results of a data batch from the results store, or from its files if it was created before the store.
+
+    The tracer results are always read from the results.npz file of the batch.
+
+    :param store: the results store
+    :param path: path of the data batch
+    :return: the settings of the test, the values of every swept setting and the arrays of the results, by name, None
+        if the batch is corrupted
+    """
+    import numpy
+    from atoms_simulator.sweep import load_results
+    name = os.path.basename(path)
+    settings = atoms_simulator.Settings(os.path.join(path, "used.toml"))
+    results_file = os.path.join(path, "results.npz")
+    if (loaded := store.load(name)) is not None:
+        settings.tags = store.settings(name)
+        axes, results = loaded
+        if os.path.isfile(results_file):
+            results.update({key: values for key, values in load_results(results_file)[1].items()
+                            if key.startswith("tracer_")})
+        return settings, axes, results
+    if not settings.load():
+        return None
+    if os.path.isfile(results_file):
+        axes, results = load_results(results_file)
+    elif os.path.isfile(os.path.join(path, "bounces.csv")) and os.path.isfile(
+            os.path.join(path, "change_of_position.csv")):
+        # The data batches created before the sweeps keep the results in .csv files.
+        n_stop = settings["N_min"] + settings["N_step"] * (settings["N_number"] - 1)
+        axes = {"N": numpy.arange(settings["N_min"], n_stop + 1, settings["N_step"])}
+        results = {
+            key: numpy.loadtxt(os.path.join(path, f"{key}.csv"), ndmin=1)
+            for key in ("bounces", "change_of_position", "tracer_bounces", "tracer_change_of_position")
+            if os.path.isfile(os.path.join(path, f"{key}.csv"))
+        }
+    else:
+        return None
+    return settings, axes, results
+
+
+@ats.command()
+@click.option("-b", "--data_batch", "data_batches", multiple=True, required=True,
+              help="Name of a previously generated data batch, give it several times to compare the batches.")
+@click.option("-x", "--x-axis", "x_axis", type=click.Choice(tuple(PLOT_LABELS)), default="N", show_default=True,
+              help="The swept setting on the horizontal axis of the plots.")
+@click.option("--at", "at", multiple=True,
+              help="Fixes a swept setting at one of its values, ex. --at r=20. All swept settings but the horizontal "
+                   "axis and at most one, which gets a curve per value, have to be fixed.")
+def plot(data_batches, x_axis, at):
+    """Plots the previously generated data, read from the results store."""
+    import matplotlib.pyplot as plt
+    from atoms_simulator.store import ResultStore
+    from atoms_simulator.sweep import select
     if not os.path.isdir(results_path := os.path.join(os.getcwd(), "ats_results")):
         click.echo(
             "The ats_results catalog doesn't exist within the current working directory. Generate some data first."
         )
         return
-    if not os.path.isdir(path := os.path.join(os.getcwd(), "ats_results", data_batch)):
-        click.echo(
-            f"The ats_results/{data_batch} catalog doesn't exist within the current working directory."
-        )
+    try:
+        fixed = parse_fixed(at)
+    except ValueError as error:
+        click.echo(error)
         return
+    batches = []
+    store = ResultStore(os.path.join(results_path, "results.sqlite"))
+    try:
+        for data_batch in data_batches:
+            path = os.path.join(results_path, data_batch)
+            if store.settings(data_batch) is None and not os.path.isdir(path):
+                click.echo(
+                    f"The ats_results/{data_batch} catalog doesn't exist within the current working directory."
+                )
+                return
+            if (loaded := load_batch(store, path)) is None:
+                click.echo(f"The {data_batch} data batch is corrupted.")
+                return
+            settings_ats, axes, results = loaded
+            # A setting that isn't swept in this batch only has to have the fixed value.
+            for name, value in fixed.items():
+                if name not in axes and name in PLOT_LABELS and settings_ats[name] is not None and \
+                        not math.isclose(settings_ats[name], value):
+                    click.echo(f"{data_batch}: The {name} setting is equal to {settings_ats[name]:g}, not {value:g}.")
+                    return
+            try:
+                series, curves = select(axes, x_axis, {name: value for name, value in fixed.items()
+                                                       if name in axes or name not in PLOT_LABELS})
+            except ValueError as error:
+                click.echo(f"{data_batch}: {error}")
+                return
+            batches.append((data_batch, settings_ats, axes, results, series, curves))
+    finally:
+        store.close()
     target_path = get_path(os.path.join(results_path, "figures_batch"))
     os.mkdir(target_path)
-    settings_ats = atoms_simulator.Settings(os.path.join(path, "used.toml"))
-    if not (settings_ats.load() and os.path.isfile(os.path.join(path, "bounces.csv"))
-            and os.path.isfile(os.path.join(path, "change_of_position.csv"))):
-        click.echo("This data batch is corrupted.")
-        return
-    n_stop = settings_ats["N_min"] + settings_ats["N_step"] * (settings_ats["N_number"] - 1)
-    x = numpy.arange(settings_ats["N_min"], n_stop + 1, settings_ats["N_step"])
-    bounce = numpy.loadtxt(os.path.join(path, "bounces.csv"))
-    plt.plot(x, bounce, marker='o')
-    plt.title(f"Zależność liczby zderzeń od ilości atomów, M = {settings_ats['M']}")
-    plt.xlabel("Liczba atomów w pojemniku")
-    plt.ylabel("Liczba odbić atomu czerownego")
-    plt.grid(True)
-    plt.savefig(os.path.join(target_path, "bounces.png"))
-    plt.clf()
-
-    cop = numpy.loadtxt(os.path.join(path, "change_of_position.csv"))
-    plt.plot(x, cop, marker='o')
-    plt.title(f"Zależność średniej drogi swobodnej od ilości atomów, M = {settings_ats['M']}")
-    plt.xlabel("Liczba atomów w pojemniku")
-    plt.ylabel("Średnia droga swobodna atomu czerwonego")
-    plt.grid(True)
-    plt.savefig(os.path.join(target_path, "change_of_position.png"))
-    plt.clf()
-
-    settings_ats.save(os.path.join(target_path, "used.toml"))
+    # The title names the settings that are the same in all batches.
+    common = [
+        {**({} if "M" in axes else {"M": settings_ats["M"]}),
+         **{name: values[0] for name, values in axes.items() if len(values) == 1 and name != x_axis}}
+        for _, settings_ats, axes, _, _, _ in batches
+    ]
+    details = {name: value for name, value in common[0].items() if all(values.get(name) == value for values in common)}
+    details.update(fixed)
+    details = "".join(f", {name} = {value:g}" for name, value in details.items())
+    for name, title, label in (
+        ("bounces", "Zależność liczby zderzeń od {}", "Liczba odbić atomu czerownego"),
+        ("change_of_position", "Zależność średniej drogi swobodnej od {}",
+         "Średnia droga swobodna atomu czerwonego")
+    ):
+        legend = len(batches) > 1
+        for data_batch, _, axes, results, series, curves in batches:
+            prefix = f"{data_batch}: " if len(batches) > 1 else ""
+            for value, index in curves:
+                suffix = "" if series is None else f", {series} = {value:g}"
+                plt.plot(axes[x_axis], results[name][index], marker='o', label=f"{prefix}Atom czerwony{suffix}")
+                if f"tracer_{name}" in results:
+                    plt.plot(axes[x_axis], results[f"tracer_{name}"][index], marker='s',
+                             label=f"{prefix}Średnia wszystkich atomów{suffix}")
+            legend = legend or series is not None or f"tracer_{name}" in results
+        if legend:
+            plt.legend()
+        heading = title.format(PLOT_LABELS[x_axis][1])
+        # A long list of the settings goes to the second line, so it fits in the figure.
+        plt.title(f"{heading}{details}" if len(heading + details) <= 70 else f"{heading}\n{details[2:]}")
+        plt.xlabel(PLOT_LABELS[x_axis][0])
+        plt.ylabel(label)
+        plt.grid(True)
+        plt.savefig(os.path.join(target_path, f"{name}.png"))
+        plt.clf()
+
+    for data_batch, settings_ats, _, _, _, _ in batches:
+        settings_ats.save(os.path.join(target_path, "used.toml" if len(batches) == 1 else f"{data_batch}.toml"))
     click.echo("Figures created successfullly.")
+
+
+@ats.command()
+@click.option("--where", "where", multiple=True,
+              help="Selects the runs with a setting equal to a value, ex. --where r=30, can be given several times.")
+def query(where):
+    """Lists the stored runs with the given settings, summarized for every data batch and number of atoms."""
+    from atoms_simulator.store import ResultStore, RUN_SETTINGS
+    if not os.path.isfile(path := os.path.join(os.getcwd(), "ats_results", "results.sqlite")):
+        click.echo("The results store doesn't exist within the current working directory. Generate some data first.")
+        return
+    try:
+        settings = parse_fixed(where, "--where")
+        store = ResultStore(path)
+        try:
+            runs = store.runs(**settings)
+        finally:
+            store.close()
+    except ValueError as error:
+        click.echo(error)
+        return
+    groups = {}
+    for run in runs:
+        groups.setdefault(run[:len(RUN_SETTINGS) + 1], []).append(run[-2:])
+    for key, values in groups.items():
+        description = " ".join(f"{name}={value:g}" for name, value in zip(RUN_SETTINGS, key[1:]))
+        bounces = sum(value[0] for value in values) / len(values)
+        average = sum(value[1] for value in values) / len(values)
+        click.echo(f"{key[0]} {description}: {len(values)} runs, {bounces:g} bounces, {average:g} average distance")
+    click.echo(f"Found {len(runs)} runs.")
+
+
+@ats.command()
+@click.option("-b", "--data_batch", "data_batch", prompt=True, help="Name of the previously generated data batch.")
+@click.option("-t", "--trajectory", "trajectory", prompt=True, help="Name of the recorded simulation, ex. N8_R0.")
+@click.option("--fps", "fps", type=click.IntRange(min=1), default=30, show_default=True,
+              help="Number of frames displayed per second.")
+@click.option("--step", "step", type=click.IntRange(min=1), default=1, show_default=True,
+              help="Number of recorded frames advanced per displayed frame.")
+def replay(data_batch, trajectory, fps, step):
+    """Displays a previously recorded simulation."""
+    from atoms_simulator.recorder import Trajectory
+    path = os.path.join(os.getcwd(), "ats_results", data_batch, "trajectories", trajectory)
+    try:
+        recording = Trajectory(path)
+    except ValueError as error:
+        click.echo(error)
+        return
+    from atoms_simulator.graphics import Window
+    import pygame
+    with open(os.path.join(get_project_path(), "VERSION"), 'r') as version_source:
+        version = version_source.read()
+    meta = recording.meta
+    window = Window(int(meta["width"]), int(meta["height"]), f"atoms_simulator {version} - {trajectory}")
+    colors = [(255, 0, 0)] + [(0, 0, 255)] * (meta["atoms"] - 1)
+    radii = [meta["radius"]] * meta["atoms"]
+    clock = pygame.time.Clock()
+    for frame in range(0, len(recording), step):
+        state, (bounces, average) = recording[frame]
+        window.draw(zip(state[:, 0], state[:, 1], radii, colors), int(bounces), average)
+        window.handle_events()
+        clock.tick(fps)
+
+
+@ats.group()
+def cache():
+    """Inspects and prunes the cache of the results of single simulations."""
+    pass
+
+
+@cache.command()
+def info():
+    """Shows the location, the number of entries and the size of the cache."""
+    from atoms_simulator.cache import ResultCache
+    results = ResultCache()
+    click.echo(f"Location: {results.path}")
+    click.echo(f"Entries: {len(results)}")
+    click.echo(f"Size: {results.size() / 2 ** 20:.2f} MiB (limit {results.limit / 2 ** 20:.2f} MiB)")
+    results.close()
+
+
+@cache.command()
+@click.option("-m", "--max-size", "max_size", type=click.FloatRange(min=0), prompt=True,
+              help="Size in MiB that the cache is reduced to, the least recently used entries are removed first.")
+def prune(max_size):
+    """Removes the least recently used entries from the cache."""
+    from atoms_simulator.cache import ResultCache
+    results = ResultCache()
+    click.echo(f"Removed {results.prune(int(max_size * 2 ** 20))} entries.")
+    results.close()
+
+
+@cache.command()
+@click.option("-m", "--max-size", "max_size", type=click.FloatRange(min=0), prompt=True,
+              help="The largest size of the cache in MiB.")
+def limit(max_size):
+    """Sets the largest size of the cache, older entries are removed automatically."""
+    from atoms_simulator.cache import ResultCache
+    results = ResultCache()
+    results.limit = int(max_size * 2 ** 20)
+    click.echo(f"The cache limit is set to {max_size:.2f} MiB.")
+    results.close()
+
+
+@cache.command()
+def clear():
+    """Removes all entries from the cache."""
+    from atoms_simulator.cache import ResultCache
+    results = ResultCache()
+    results.clear()
+    click.echo("The cache is empty.")
+    results.close()
+
+
+@ats.command()
+@click.option("-n", "--atoms", "numbers", type=click.IntRange(min=1), multiple=True, default=(10, 40, 160),
+              show_default=True, help="Number of atoms, can be given several times.")
+@click.option("--size", "sizes", type=click.IntRange(min=1), multiple=True, default=(20, 40), show_default=True,
+              help="Height and width coefficient of the container, can be given several times.")
+@click.option("-e", "--engine", "engines", type=click.Choice(atoms_simulator.ENGINES), multiple=True,
+              default=("numpy",), show_default=True, help="Simulation engine, can be given several times.")
+@click.option("--broad-phase", "broad_phases", type=click.Choice(atoms_simulator.BROAD_PHASES), multiple=True,
+              default=("grid",), show_default=True, help="Broad phase method, can be given several times.")
+@click.option("-m", "--turns", "turns", type=click.IntRange(min=1), default=200, show_default=True,
+              help="Number of turns of every simulation.")
+@click.option("-s", "--seed", "seed", type=click.IntRange(min=0), default=0, show_default=True,
+              help="Seed used to place the atoms.")
+@click.option("-r", "--repeat", "repeat", type=click.IntRange(min=1), default=3, show_default=True,
+              help="Number of runs of every benchmark, the fastest one is reported.")
+@click.option("-o", "--output", "output", default="ats_bench.json", show_default=True,
+              help="JSON file that the results are written to.")
+@click.option("--baseline", "baseline", default=None, help="JSON file with previous results to compare with.")
+@click.option("--threshold", "threshold", type=click.FloatRange(min=0), default=0.1, show_default=True,
+              help="The largest allowed relative drop of throughput compared with the baseline.")
+@click.option("-w", "--workers", "workers", type=click.IntRange(min=1), multiple=True, default=(),
+              help="Measure the strong scaling of the parallel simulation with this number of worker processes, can be "
+                   "given several times.")
+def bench(numbers, sizes, engines, broad_phases, turns, seed, repeat, output, baseline, threshold, workers):
+    """Measures the throughput of headless simulations and of placing the atoms."""
+    from atoms_simulator import bench as benchmarks
+    previous = None
+    if baseline is not None:
+        if not os.path.isfile(baseline):
+            click.echo(f"The {baseline} file doesn't exist.")
+            return
+        previous = benchmarks.load_report(baseline)
+    report = benchmarks.run_benchmarks(
+        numbers, sizes, engines, broad_phases, turns, seed, repeat,
+        lambda description: click.echo(f"Running {description}..."), workers
+    )
+    for result in report["results"]:
+        if result["kind"] == "simulation":
+            click.echo(
+                f"{result['engine']}/{result['broad_phase']} N={result['N']} size={result['size']}: "
+                f"{result['steps_per_second']:.1f} steps/s, {result['pair_checks_per_second']:.3g} pair checks/s, "
+                f"peak memory {result['peak_memory'] / 2 ** 20:.2f} MiB"
+            )
+        elif result["kind"] == "scaling":
+            click.echo(
+                f"parallel N={result['N']} size={result['size']} workers={result['workers']}: "
+                f"{result['steps_per_second']:.1f} steps/s, speedup {result['speedup']:.2f}, "
+                f"efficiency {result['efficiency']:.0%}"
+            )
+        else:
+            click.echo(
+                f"random_list N={result['N']} size={result['size']}: {result['atoms_per_second']:.3g} atoms/s, "
+                f"peak memory {result['peak_memory'] / 2 ** 20:.2f} MiB"
+            )
+    for case in report["skipped"]:
+        click.echo(f"N={case['N']} size={case['size']}: skipped. {case['reason']}")
+    benchmarks.save_report(report, output)
+    click.echo(f"Results saved to {output}.")
+    if previous is not None:
+        regressions = benchmarks.compare(report, previous, threshold)
+        for result, _, change in regressions:
+            click.echo(f"Regression: {' '.join(str(value) for value in benchmarks.result_key(result) if value)} "
+                       f"{change:+.1%}")
+        if regressions:
+            sys.exit(1)
+        click.echo("No regressions compared with the baseline.")
+
+
+@ats.command()
+@click.option("-b", "--budget", "budget", type=float, default=0.5, show_default=True,
+              help="Maximal time in seconds that importing the ats script may take.")
+@click.option("-r", "--repeat", "repeat", type=click.IntRange(min=1), default=5, show_default=True,
+              help="Number of measurements, the fastest one is compared with the budget.")
+def startup(budget, repeat):
+    """Checks that the ats script starts fast and doesn't import unnecessary modules."""
+    probe = "import sys, atoms_simulator.bin; print(' '.join(m for m in ('pygame', 'matplotlib', 'numpy') " \
+            "if m in sys.modules))"
+    best = math.inf
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = subprocess.run([sys.executable, "-c", probe], capture_output=True, text=True, check=True)
+        best = min(best, time.perf_counter() - start)
+    heavy = result.stdout.split()
+    click.echo(f"Startup time: {best:.3f} s (budget {budget:.3f} s).")
+    if heavy:
+        click.echo(f"Modules imported at startup: {', '.join(heavy)}.")
+    if heavy or best > budget:
+        sys.exit(1)
@@ -0,0 +1,71 @@
+from __future__ import annotations
+import threading
+import numpy
+
+
+class DoubleBuffer:
+    """A class used to pass the positions of the atoms from a physics thread to a drawing thread.
+
+    The physics thread writes a new frame to the back buffer, which is never read, and then swaps the buffers, so the
+    drawing thread always reads a complete frame. A new frame is written only after the previous one has been read,
+    so the physics thread doesn't spend time on frames that are never drawn.
+
+    :ivar fresh: Indicates if the front buffer contains a frame that hasn't been read yet.
+    :type fresh: bool
+    :ivar steps: the number of turns performed by the physics thread
+    :type steps: int
+    :ivar stop: set by the drawing thread to ask the physics thread to finish
+    :type stop: :py:class:`threading.Event`
+    :ivar error: the exception that stopped the physics thread, if any
+    :type error: BaseException
+    """
+    def __init__(self, size: int):
+        """Initialize a DoubleBuffer type object.
+
+        :param size: number of atoms
+        """
+        self._buffers = [numpy.zeros((2, size)), numpy.zeros((2, size))]
+        self._observables = [(0, 0.0), (0, 0.0)]
+        self._front = 0
+        self._lock = threading.Lock()
+        self.fresh = False
+        self.steps = 0
+        self.stop = threading.Event()
+        self.error = None
+
+    def publish(self, x, y, bounces: int, average: float):
+        """Writes a frame to the back buffer and makes it the front one, called by the physics thread.
+
+        :param x: the x position coordinates
+        :param y: the y position coordinates
+        :param bounces: number of bounces of the test atom
+        :param average: the average distance that the test atom travels
+        """
+        back = 1 - self._front
+        self._buffers[back][0] = x
+        self._buffers[back][1] = y
+        self._observables[back] = bounces, average
+        with self._lock:
+            self._front = back
+            self.fresh = True
+
+    def read(self, out: numpy.ndarray) -> (int, float):
+        """Copies the front buffer, called by the drawing thread.
+
+        :param out: (2, size) array that the positions are copied to
+        :return: number of bounces and the average distance of the test atom
+        """
+        with self._lock:
+            numpy.copyto(out, self._buffers[self._front])
+            self.fresh = False
+            return self._observables[self._front]
+
+    def run(self, function):
+        """Calls a function and stores the exception that it raises, used as the target of the physics thread.
+
+        :param function:
+        """
+        try:
+            function()
+        except BaseException as error:
+            self.error = error
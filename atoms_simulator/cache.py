@@ -0,0 +1,166 @@
+from __future__ import annotations
+import hashlib
+import json
+import os
+import os.path
+import sqlite3
+import time
+import atoms_simulator
+from atoms_simulator.stats import RunningStats
+
+
+# The settings that determine the result of a simulation, together with N, the seed and the engine.
+PHYSICS_SETTINGS = ("h", "w", "r", "v", "c", "M", "K")
+# The default limit of the size of the cache in bytes.
+DEFAULT_LIMIT = 64 * 2 ** 20
+
+
+def default_path() -> str:
+    """Returns the path of the cache database, in $XDG_CACHE_HOME/atoms_simulator or ~/.cache/atoms_simulator.
+
+    :return:
+    """
+    root = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(root, "atoms_simulator", "results.sqlite")
+
+
+def engine_version(engine: str) -> int:
+    """Returns the version of the results of an engine, the ENGINE_VERSION constant of its module.
+
+    :param engine: the simulation engine
+    :return:
+    :raise ValueError: if the engine is unknown
+    """
+    if engine == "objects":
+        from atoms_simulator import ENGINE_VERSION
+    elif engine == "numpy":
+        from atoms_simulator.arrays import ENGINE_VERSION
+    elif engine == "events":
+        from atoms_simulator.events import ENGINE_VERSION
+    else:
+        raise ValueError(f"Unknown engine: {engine}.")
+    return ENGINE_VERSION
+
+
+def result_key(settings: atoms_simulator.Settings, n: int, seed: int, engine: str, options: str = "") -> str:
+    """Calculates the key of the result of a single simulation.
+
+    :param settings: settings of the simulation
+    :param n: number of atoms
+    :param seed: seed of the simulation
+    :param engine: the simulation engine
+    :param options: description of the options of the engine that change the result, ex. the adaptive step
+    :return: hexadecimal SHA-256 hash of the values that determine the result and the version of the engine
+    """
+    values = {name: settings[name] for name in PHYSICS_SETTINGS}
+    values.update(N=n, seed=seed, engine=engine, options=options, engine_version=engine_version(engine))
+    return hashlib.sha256(json.dumps(values, sort_keys=True).encode()).hexdigest()
+
+
+class ResultCache:
+    """A class used to store the results of single simulations in an SQLite database, so they are never computed twice.
+
+    The entries are addressed by :py:func:`result_key`. When the size of the stored entries exceeds the limit, the
+    least recently used ones are removed.
+
+    :ivar path: the path of the database
+    :type path: str
+    """
+    def __init__(self, path: str = None):
+        """Initialize a ResultCache type object, the database is created if it doesn't exist.
+
+        :param path: the path of the database, :py:func:`default_path` by default
+        """
+        self.path = default_path() if path is None else path
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._db = sqlite3.connect(self.path)
+        with self._db:
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, bounces INTEGER, average REAL, "
+                "moments TEXT, size INTEGER, last_used REAL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS results_last_used ON results (last_used)")
+            self._db.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value)")
+
+    @property
+    def limit(self) -> int:
+        """The largest size of the stored entries in bytes."""
+        row = self._db.execute("SELECT value FROM meta WHERE name = 'limit'").fetchone()
+        return DEFAULT_LIMIT if row is None else int(row[0])
+
+    @limit.setter
+    def limit(self, value: int):
+        with self._db:
+            self._db.execute("INSERT OR REPLACE INTO meta VALUES ('limit', ?)", (int(value),))
+        self.prune(value)
+
+    def get(self, key: str) -> (int, float, RunningStats):
+        """Finds a result and marks it as recently used.
+
+        :param key: the key of the result
+        :return: number of bounces, the average distance and the statistics of distances of the test atom, None if
+            the result isn't stored
+        """
+        row = self._db.execute("SELECT bounces, average, moments FROM results WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        with self._db:
+            self._db.execute("UPDATE results SET last_used = ? WHERE key = ?", (time.time(), key))
+        return row[0], row[1], RunningStats.from_moments(*json.loads(row[2]))
+
+    def put(self, key: str, bounces: int, average: float, stats: RunningStats):
+        """Stores a result and removes the least recently used ones if the cache is too large.
+
+        :param key: the key of the result
+        :param bounces: number of bounces of the test atom
+        :param average: the average distance of the test atom
+        :param stats: the statistics of distances of the test atom
+        """
+        moments = json.dumps([float(value) for value in stats.moments()])
+        with self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?)",
+                (key, int(bounces), float(average), moments, len(key) + len(moments) + 24, time.time())
+            )
+        self.prune(self.limit)
+
+    def __len__(self):
+        return self._db.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+
+    def size(self) -> int:
+        """Returns the size of the stored entries in bytes.
+
+        :return:
+        """
+        return self._db.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+
+    def prune(self, limit: int) -> int:
+        """Removes the least recently used entries until their size doesn't exceed *limit*.
+
+        :param limit: the largest allowed size in bytes
+        :return: number of removed entries
+        """
+        excess = self.size() - limit
+        if excess <= 0:
+            return 0
+        removed = 0
+        keys = []
+        for key, size in self._db.execute("SELECT key, size FROM results ORDER BY last_used"):
+            if excess <= 0:
+                break
+            keys.append((key,))
+            excess -= size
+            removed += 1
+        with self._db:
+            self._db.executemany("DELETE FROM results WHERE key = ?", keys)
+        return removed
+
+    def clear(self):
+        """Removes all entries."""
+        with self._db:
+            self._db.execute("DELETE FROM results")
+        self._db.execute("VACUUM")
+
+    def close(self):
+        """Closes the database."""
+        self._db.close()
@@ -0,0 +1,60 @@
+from __future__ import annotations
+import os
+import os.path
+import pickle
+
+
+class Checkpoint:
+    """A class used to periodically save the state of a simulation, so that it can be resumed after an interruption.
+
+    The state is pickled at the beginning of every *every*-th turn, before any collisions of that turn are processed,
+    so a resumed simulation performs exactly the same operations as an uninterrupted one. The file is replaced
+    atomically, an interruption during saving leaves the previous checkpoint intact.
+
+    :ivar path: the file that the state is written to
+    :type path: str
+    :ivar every: the number of turns between two checkpoints
+    :type every: int
+    """
+    def __init__(self, path: str, every: int = 1000):
+        """Initialize a Checkpoint type object.
+
+        :param path: the file that the state will be written to, its directory is created if it doesn't exist
+        :param every: the number of turns between two checkpoints
+        :raise ValueError: if *every* is smaller than 1
+        """
+        if every < 1:
+            raise ValueError("The checkpoint interval must be greater than 0.")
+        self.path = path
+        self.every = every
+
+    def save(self, turn: int, step: int, state, rng_state=None):
+        """Writes the state of a simulation.
+
+        :param turn: the turn counter of the simulation
+        :param step: the number of turns performed so far
+        :param state: the atoms, a list of :py:class:`atoms_simulator.Atom` objects or an engine object
+        :param rng_state: the state of the random number generator of the simulation
+        """
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(f"{self.path}.tmp", "wb") as target:
+            pickle.dump({"turn": turn, "step": step, "state": state, "rng_state": rng_state}, target,
+                        pickle.HIGHEST_PROTOCOL)
+        os.replace(f"{self.path}.tmp", self.path)
+
+    def load(self) -> dict:
+        """Reads the last saved state.
+
+        :return: dictionary with the arguments of :py:meth:`save`, None if nothing was saved
+        """
+        if not os.path.isfile(self.path):
+            return None
+        with open(self.path, "rb") as origin:
+            return pickle.load(origin)
+
+    def remove(self):
+        """Deletes the saved state, ex. after the simulation has finished."""
+        if os.path.isfile(self.path):
+            os.remove(self.path)
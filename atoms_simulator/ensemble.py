@@ -0,0 +1,139 @@
+from __future__ import annotations
+import numpy
+from atoms_simulator.arrays import AtomArrays
+from atoms_simulator.grid import candidate_pairs
+from atoms_simulator.stats import RunningStats, push_arrays
+
+
+class Ensemble(AtomArrays):
+    """A class used to advance several independent replicas of a simulation at once.
+
+    The state of every replica is a row of a (replicas, size) array, the first atom of every row is the test atom of
+    that replica. The inherited attributes hold these arrays flattened, so all replicas are processed by the same
+    batched operations as a single :py:class:`AtomArrays` simulation, only the pairs never mix different replicas.
+
+    :ivar replicas: number of replicas
+    :type replicas: int
+    :ivar size: number of atoms in every replica
+    :type size: int
+    :ivar bounced: Indicates which test atoms have bounced recently.
+    :type bounced: :py:class:`numpy.ndarray`
+    :ivar distance: The distances that the test atoms have managed to travel since the last bounce.
+    :type distance: :py:class:`numpy.ndarray`
+    :ivar count: The number of bounces of every test atom.
+    :type count: :py:class:`numpy.ndarray`
+    :ivar total: The sum of all previous distances of every test atom.
+    :type total: :py:class:`numpy.ndarray`
+    :ivar minimum: The shortest of all previous distances of every test atom.
+    :type minimum: :py:class:`numpy.ndarray`
+    :ivar maximum: The longest of all previous distances of every test atom.
+    :type maximum: :py:class:`numpy.ndarray`
+    """
+    def __init__(self, x, y, vx, vy, radius):
+        """Initialize an Ensemble type object.
+
+        :param x: the x position coordinates, one row per replica
+        :param y: the y position coordinates, one row per replica
+        :param vx: the velocity vectors' x coordinates, one row per replica
+        :param vy: the velocity vectors' y coordinates, one row per replica
+        :param radius: the radii of the atoms, one row per replica
+        """
+        self.replicas, self.size = numpy.shape(x)
+        super().__init__(numpy.ravel(x), numpy.ravel(y), numpy.ravel(vx), numpy.ravel(vy), numpy.ravel(radius))
+        self.bounced = numpy.zeros(self.replicas, dtype=bool)
+        self.distance = numpy.zeros(self.replicas)
+        self.stats = None
+        self.count = numpy.zeros(self.replicas, dtype=numpy.int64)
+        self.total = numpy.zeros(self.replicas)
+        self.minimum = numpy.full(self.replicas, numpy.inf)
+        self.maximum = numpy.full(self.replicas, -numpy.inf)
+        self._mean = numpy.zeros(self.replicas)
+        self._m2 = numpy.zeros(self.replicas)
+        self._tracers = numpy.arange(self.replicas) * self.size
+
+    @classmethod
+    def from_atom_lists(cls, atom_lists: list) -> Ensemble:
+        """Create an Ensemble type object from lists of :py:class:`Atom` objects of equal length.
+
+        :param atom_lists: one list of atoms per replica, the first atom of every list is treated as the test atom
+        :return:
+        """
+        return cls(*(
+            [[getattr(atom, name) for atom in atoms] for atoms in atom_lists]
+            for name in ("x", "y", "vx", "vy", "radius")
+        ))
+
+    def all_pairs(self) -> (numpy.ndarray, numpy.ndarray):
+        """Returns the indices of every pair of atoms that belong to the same replica.
+
+        :return:
+        """
+        if self._pairs is None:
+            i, j = numpy.triu_indices(self.size, 1)
+            offsets = numpy.repeat(self._tracers, len(i))
+            self._pairs = numpy.tile(i, self.replicas) + offsets, numpy.tile(j, self.replicas) + offsets
+        return self._pairs
+
+    def grid_pairs(self, cell_size: float, width: float, height: float) -> (numpy.ndarray, numpy.ndarray):
+        """Finds the candidate pairs of every replica with :py:func:`atoms_simulator.grid.candidate_pairs`.
+
+        Every replica is moved to its own container, all of them placed side by side, so a single grid of cells is
+        sorted for all replicas at once.
+
+        :param cell_size: the length of a side of a single cell, ex. 2 * r + c
+        :param width: width of the container
+        :param height: height of the container
+        :return: indices *i* < *j* of the candidate pairs
+        """
+        shift = numpy.repeat(numpy.arange(self.replicas) * (width + cell_size), self.size)
+        i, j = candidate_pairs(self.x + shift, self.y, cell_size, self.replicas * (width + cell_size), height)
+        same = i // self.size == j // self.size
+        return i[same], j[same]
+
+    def update(self, time_step: float):
+        """Updates the positions by the velocities multiplied by *time_step*.
+
+        :param time_step:
+        """
+        self.x += self.vx * time_step
+        self.y += self.vy * time_step
+        self.distance += time_step * numpy.sqrt(self.vx[self._tracers] ** 2 + self.vy[self._tracers] ** 2)
+        if self.tracers is not None:
+            self.tracers.move(self.vx, self.vy, time_step)
+
+    def mark_bounced(self, i: numpy.ndarray, j: numpy.ndarray):
+        """Marks the test atoms that are a part of one of the pairs as bounced.
+
+        :param i: indices of the first atoms of the pairs that bounced
+        :param j: indices of the second atoms of the pairs that bounced
+        """
+        self.bounced[i[i % self.size == 0] // self.size] = True
+
+    def store_distance(self):
+        """Saves the current distances of the test atoms that bounced and resets their counters.
+
+        :return:
+        """
+        if self.bounced.any():
+            push_arrays(self, self.bounced, self.distance[self.bounced])
+            self.distance[self.bounced] = 0.0
+        self.bounced[:] = False
+        if self.tracers is not None:
+            self.tracers.store_distance()
+
+    def replica_stats(self) -> list:
+        """Returns the statistics of all previous distances of every test atom.
+
+        :return: list of :py:class:`atoms_simulator.stats.RunningStats` objects, one per replica
+        """
+        return [
+            RunningStats.from_moments(*values)
+            for values in zip(self.count, self.total, self._mean, self._m2, self.minimum, self.maximum)
+        ]
+
+    def average_distance(self) -> numpy.ndarray:
+        """Calculates the average distance that every test atom travels.
+
+        :return:
+        """
+        return numpy.divide(self.total, self.count, out=numpy.zeros(self.replicas), where=self.count > 0)
@@ -0,0 +1,221 @@
+from __future__ import annotations
+import heapq
+import numpy
+from atoms_simulator.stats import RunningStats
+
+
+# Partner codes used for collisions with the walls.
+VERTICAL_WALL = -1
+HORIZONTAL_WALL = -2
+# The version of the results of the events engine, increase it when a change of the prediction of the collisions alters
+# any result.
+ENGINE_VERSION = 1
+
+
+class EventSimulation:
+    """A class used to perform an event-driven simulation of atoms in an enclosed container.
+
+    Instead of moving the atoms by a fixed time step, the exact time of the next collision of every atom is computed
+    and the simulation jumps from one collision to the next. Predicted collisions are kept in a priority queue and
+    become invalid as soon as one of the atoms involved collides with something else, which is detected by comparing
+    the collision counters stored with the prediction. The atom at index 0 is the test atom.
+
+    :ivar x: the x position coordinates
+    :type x: :py:class:`numpy.ndarray`
+    :ivar y: the y position coordinates
+    :type y: :py:class:`numpy.ndarray`
+    :ivar vx: the velocity vectors' x coordinates
+    :type vx: :py:class:`numpy.ndarray`
+    :ivar vy: the velocity vectors' y coordinates
+    :type vy: :py:class:`numpy.ndarray`
+    :ivar radius: the radii of the atoms
+    :type radius: :py:class:`numpy.ndarray`
+    :ivar width: width of the container
+    :type width: float
+    :ivar height: height of the container
+    :type height: float
+    :ivar time: the time that the positions correspond to
+    :type time: float
+    :ivar counts: the number of collisions that every atom has taken part in
+    :type counts: :py:class:`numpy.ndarray`
+    :ivar queue: the priority queue of predicted collisions
+    :type queue: list
+    :ivar distance: The distance that the test atom has managed to travel since the last bounce.
+    :type distance: float
+    :ivar stats: The statistics of all previous distances of the test atom.
+    :type stats: :py:class:`atoms_simulator.stats.RunningStats`
+    :ivar tracers: If set, the bounces and the distances of every atom are accumulated in it.
+    :type tracers: :py:class:`atoms_simulator.tracers.Tracers`
+    """
+    def __init__(self, x, y, vx, vy, radius, width: float, height: float):
+        """Initialize an EventSimulation type object.
+
+        :param x: the x position coordinates
+        :param y: the y position coordinates
+        :param vx: the velocity vectors' x coordinates
+        :param vy: the velocity vectors' y coordinates
+        :param radius: the radii of the atoms
+        :param width: width of the container
+        :param height: height of the container
+        """
+        self.x = numpy.array(x, dtype=numpy.float64)
+        self.y = numpy.array(y, dtype=numpy.float64)
+        self.vx = numpy.array(vx, dtype=numpy.float64)
+        self.vy = numpy.array(vy, dtype=numpy.float64)
+        self.radius = numpy.array(radius, dtype=numpy.float64)
+        self.width = float(width)
+        self.height = float(height)
+        self.time = 0.0
+        self.counts = numpy.zeros(len(self.x), dtype=numpy.int64)
+        self.queue = []
+        self.distance = 0.0
+        self.stats = RunningStats()
+        self.tracers = None
+        self._sequence = 0
+        for atom in range(len(self.x)):
+            self.predict(atom)
+
+    @classmethod
+    def from_atoms(cls, atoms: list, width: float, height: float) -> EventSimulation:
+        """Create an EventSimulation type object from a list of :py:class:`Atom` objects.
+
+        :param atoms: list of atoms, the first one is treated as the test atom
+        :param width: width of the container
+        :param height: height of the container
+        :return:
+        """
+        return cls(
+            [atom.x for atom in atoms], [atom.y for atom in atoms],
+            [atom.vx for atom in atoms], [atom.vy for atom in atoms],
+            [atom.radius for atom in atoms], width, height
+        )
+
+    def __len__(self):
+        return len(self.x)
+
+    def wall_time(self, atom: int) -> (float, int):
+        """Calculates the time left until the atom hits one of the walls.
+
+        :param atom: index of the atom
+        :return: the time and the code of the wall
+        """
+        result = (numpy.inf, VERTICAL_WALL)
+        for position, velocity, limit, wall in ((self.x[atom], self.vx[atom], self.width, VERTICAL_WALL),
+                                                (self.y[atom], self.vy[atom], self.height, HORIZONTAL_WALL)):
+            if velocity > 0:
+                time = (limit - self.radius[atom] - position) / velocity
+            elif velocity < 0:
+                time = (self.radius[atom] - position) / velocity
+            else:
+                continue
+            result = min(result, (max(time, 0.0), wall))
+        return result
+
+    def pair_times(self, atom: int) -> numpy.ndarray:
+        """Calculates the time left until the atom hits every other atom, assuming that nothing else happens earlier.
+
+        :param atom: index of the atom
+        :return: array of times, :py:data:`numpy.inf` for the atoms that will not be hit
+        """
+        dx = self.x - self.x[atom]
+        dy = self.y - self.y[atom]
+        dvx = self.vx - self.vx[atom]
+        dvy = self.vy - self.vy[atom]
+        approach = dx * dvx + dy * dvy
+        speed = dvx ** 2 + dvy ** 2
+        gap = dx ** 2 + dy ** 2 - (self.radius + self.radius[atom]) ** 2
+        discriminant = approach ** 2 - speed * gap
+        mask = (approach < 0) & (discriminant >= 0)
+        mask[atom] = False
+        times = numpy.full(len(self.x), numpy.inf)
+        # The smaller root in a form that doesn't lose precision for nearly touching atoms.
+        times[mask] = gap[mask] / (numpy.sqrt(discriminant[mask]) - approach[mask])
+        return numpy.maximum(times, 0.0)
+
+    def predict(self, atom: int):
+        """Adds the earliest collision of the atom to the queue.
+
+        :param atom: index of the atom
+        """
+        time, partner = self.wall_time(atom)
+        if len(self.x) > 1:
+            times = self.pair_times(atom)
+            other = int(numpy.argmin(times))
+            if times[other] < time:
+                time, partner = times[other], other
+        if time == numpy.inf:
+            return
+        partner_count = self.counts[partner] if partner >= 0 else 0
+        heapq.heappush(
+            self.queue, (self.time + float(time), self._sequence, atom, partner, self.counts[atom], partner_count)
+        )
+        self._sequence += 1
+
+    def move(self, time_step: float):
+        """Moves all atoms along their current velocities.
+
+        :param time_step:
+        """
+        if time_step <= 0:
+            return
+        self.x += self.vx * time_step
+        self.y += self.vy * time_step
+        self.distance += time_step * float(self.vx[0] ** 2 + self.vy[0] ** 2) ** 0.5
+        if self.tracers is not None:
+            self.tracers.move(self.vx, self.vy, time_step)
+        self.time += time_step
+
+    def bounce(self, atom: int, partner: int):
+        """Modifies the velocities of the atoms involved in a collision.
+
+        :param atom: index of the atom
+        :param partner: index of the other atom or the code of the wall
+        """
+        if partner == VERTICAL_WALL:
+            self.vx[atom] *= -1
+        elif partner == HORIZONTAL_WALL:
+            self.vy[atom] *= -1
+        else:
+            a = self.x[partner] - self.x[atom]
+            b = self.y[partner] - self.y[atom]
+            exchange = (a * (self.vx[partner] - self.vx[atom]) + b * (self.vy[partner] - self.vy[atom])) / \
+                (a ** 2 + b ** 2)
+            self.vx[atom] += a * exchange
+            self.vy[atom] += b * exchange
+            self.vx[partner] -= a * exchange
+            self.vy[partner] -= b * exchange
+            if atom == 0 or partner == 0:
+                self.stats.push(float(self.distance))
+                self.distance = 0.0
+            if self.tracers is not None:
+                self.tracers.mark(atom, partner)
+                self.tracers.store_distance()
+
+    def advance(self, duration: float):
+        """Processes all collisions that happen within *duration* and moves the atoms to the end of it.
+
+        :param duration:
+        """
+        target = self.time + duration
+        while self.queue and self.queue[0][0] <= target:
+            time, _, atom, partner, atom_count, partner_count = heapq.heappop(self.queue)
+            if self.counts[atom] != atom_count:
+                continue
+            if partner >= 0 and self.counts[partner] != partner_count:
+                self.predict(atom)
+                continue
+            self.move(time - self.time)
+            self.bounce(atom, partner)
+            self.counts[atom] += 1
+            self.predict(atom)
+            if partner >= 0:
+                self.counts[partner] += 1
+                self.predict(partner)
+        self.move(target - self.time)
+
+    def average_distance(self) -> float:
+        """Calculates the average distance that the test atom travels.
+
+        :return:
+        """
+        return self.stats.mean
@@ -0,0 +1,280 @@
+from __future__ import annotations
+import os
+import os.path
+import sys
+import time
+os.environ['PYGAME_HIDE_SUPPORT_PROMPT'] = "hide"
+import pygame
+from pygame import gfxdraw
+from pygame import freetype
+
+
+class TextBlock:
+    """A class used to create text blocks for :py:mod:`pygame` simulation.
+
+    :ivar text: The actual text that will be displayed.
+    :type text: str
+    :ivar width: A value that will be displayed must be within range (-10 ^ (*width* - 1), 10 ^ *width*). 0 - disable
+    :type width: int
+    :ivar precision: the precision of the fraction part of the number
+    :type precision: int
+    :ivar color: The color that will be applied to the text.
+    :type color: :py:class:`pygame.Color`
+    :ivar font: The font that will be used to generate the text.
+    :type font: :py:class:`pygame.freetype.Font`
+    :ivar field:
+    :type field: :py:class:`pygame.Rect`
+    :ivar p_field: Field with added padding around it.
+    :type p_field: :py:class:`pygame.Rect`
+    """
+    def __init__(self, text: str, width: int, precision: int, color: pygame.Color, font: freetype.Font,
+                 padding: int):
+        """Initialize a TextBlock type object
+
+        :param text: The actual text that will be displayed.
+        :param width: A value that will be displayed must be within range (-10 ^ (*width* - 1), 10 ^ *width*).
+        :param precision: the precision of the fraction part of the number
+        :param color: The color that will be applied to the text.
+        :param font: The font that will be used to generate the text.
+        :param padding: The size of the padding that will be created.
+        """
+        self.text = text
+        self.width = width
+        self.precision = precision
+        self.color = color
+        self.font = font
+        self.field = self.gen_rect()
+        self.render_point = (0, self.font.get_sized_ascender())
+        self.p_field = self.gen_padded_rect(padding)
+        self.font.origin = True
+
+    def gen_rect(self) -> pygame.Rect:
+        """Generates a field.
+
+        :return:
+        """
+        if self.width == 0:
+            _, rect = self.font.render(f"|{self.text}|", self.color)
+        else:
+            placeholder = float(10 ** (self.width - 1))
+            charr = f"|{self.text}: {placeholder:<{self.width + self.precision + 1}.{self.precision}f}|"
+            _, rect = self.font.render(charr, self.color)
+        rect.width += rect.x
+        rect.height = self.font.get_sized_height()
+        return rect
+
+    def gen_padded_rect(self, padding) -> pygame.Rect:
+        """Generates a padded field.
+
+        :param padding: The size of the padding that will be created.
+        :return:
+        """
+        p_field = pygame.Rect(self.field)
+        p_field.width += 2 * padding
+        p_field.height += 2 * padding
+        return p_field
+
+    def update_field(self):
+        """Centers the field based on the position of padded field."""
+        self.field.center = self.p_field.center
+        self.render_point = (self.render_point[0] + self.field.x, self.render_point[1] + self.field.y)
+
+    def format(self, value: float = 0) -> str:
+        """Returns the text that is displayed for a value.
+
+        :param value: An updated value for an optional number field.
+        :return:
+        """
+        if self.width == 0:
+            return f"|{self.text}|"
+        if value >= 10 ** self.width:
+            value = 10 ** self.width - 10 ** -self.precision
+        elif value <= -10 ** (self.width - 1):
+            value = -10 ** (self.width - 1) + 10 ** -self.precision
+        return f"|{self.text}: {float(value):<{self.width + self.precision + 1}.{self.precision}f}|"
+
+    def gen_text(self, surface: pygame.Surface, value: float = 0):
+        """Generates a *text* surface.
+
+        :param value: An updated value for an optional number field.
+        """
+        self.font.render_to(surface, self.render_point, self.format(value), self.color)
+
+
+def create_text_blocks(font: freetype.Font, padding: int, rates: bool = False) -> dict:
+    """Initializes all the text blocks for later use.
+
+    :param font: The font that will be used to generate the texts.
+    :param padding: The size of the padding that will be created.
+    :param rates: Indicates if the blocks showing the number of turns and frames per second should be created.
+    :return: A dictionary containing :py:class:`TextBlock` objects.
+    """
+    text_blocks = {
+        "title": TextBlock("Dane atomu czerwonego", 0, 0, pygame.Color(0, 0, 0), font, padding),
+        "bounces": TextBlock("Ilość odbić", 3, 0, pygame.Color(0, 0, 0), font, padding),
+        "average": TextBlock("Średnia droga swobodna", 3, 2, pygame.Color(0, 0, 0), font, padding)
+    }
+    if rates:
+        text_blocks["steps"] = TextBlock("Kroki na sekundę", 6, 0, pygame.Color(0, 0, 0), font, padding)
+        text_blocks["fps"] = TextBlock("Klatki na sekundę", 3, 0, pygame.Color(0, 0, 0), font, padding)
+    return text_blocks
+
+
+def convert_coords(container: pygame.Rect, x: float, y: float) -> (int, int):
+    """Converts the given coordinates for a simulation display purposes.
+
+    :param container: the simulation surface
+    :param x: the x position coordinate
+    :param y: the x position coordinate
+    :return: converted coordinates
+    """
+    y = container.height - y
+    return int(x), int(y)
+
+
+class Window:
+    """A class used to display the simulation with :py:mod:`pygame`.
+
+    :ivar text_blocks: A dictionary containing :py:class:`TextBlock` objects.
+    :type text_blocks: dict
+    :ivar container: the simulation field
+    :type container: :py:class:`pygame.Rect`
+    :ivar border_rect: the border around the simulation field
+    :type border_rect: :py:class:`pygame.Rect`
+    :ivar border_width: the width of the border
+    :type border_width: int
+    :ivar screen: the display surface
+    :type screen: :py:class:`pygame.Surface`
+    :ivar container_surface: the surface that the atoms are drawn on
+    :type container_surface: :py:class:`pygame.Surface`
+    :ivar background: the color of the window outside the container
+    :type background: :py:class:`pygame.Color`
+    :ivar observer: If set, the time of drawing the atoms and the text is reported to this
+        :py:class:`atoms_simulator.profiling.Observer` object as the "draw" and "text" phases.
+    :type observer: :py:class:`atoms_simulator.profiling.Observer`
+    """
+    def __init__(self, width: int, height: int, caption: str, observer=None, rates: bool = False):
+        """Initialize a Window type object and open the window.
+
+        :param width: width of the container
+        :param height: height of the container
+        :param caption: the caption of the window
+        :param observer: the observer notified about the time of drawing
+        :param rates: Indicates if the number of turns and frames per second should be displayed, in a second row
+            of text blocks.
+        """
+        here = os.path.dirname(__file__)
+
+        # Pygame variables #1
+        pygame.init()
+        icon = pygame.image.load(os.path.join(here, "assets/icon.png"))
+        pygame.display.set_caption(caption)
+        pygame.display.set_icon(icon)
+        font = freetype.Font(os.path.join(here, "assets/JetBrainsMono-Bold.ttf"), size=25)
+        padding = 10
+        self.border_width = 1
+        self.observer = observer
+
+        # Arrange the fields
+        self.text_blocks = create_text_blocks(font, padding, rates)
+        self.container = pygame.Rect((0, 0), (width, height))
+        p_container = pygame.Rect((0, 0), (width + 2 * padding, height + 2 * padding))
+        rows = [("title", "bounces", "average")] + ([("steps", "fps")] if rates else [])
+        top = p_container.bottom
+        for row in rows:
+            current = 0
+            for name in row:
+                self.text_blocks[name].p_field.top = top
+                self.text_blocks[name].p_field.left = current
+                current = self.text_blocks[name].p_field.right
+            top = max(self.text_blocks[name].p_field.bottom for name in row)
+        screen_rect = pygame.Rect((0, 0), (0, 0))
+        screen_rect.union_ip(p_container)
+        for text_block in self.text_blocks.values():
+            screen_rect.union_ip(text_block.p_field)
+            text_block.update_field()
+        info_object = pygame.display.Info()
+        p_container.centerx = screen_rect.centerx
+        self.container.center = p_container.center
+        self.border_rect = self.container.inflate(2 * self.border_width, 2 * self.border_width)
+        if info_object.current_w < screen_rect.width or info_object.current_h < screen_rect.height:
+            screen_rect = self.container
+
+        # Pygame variables #2
+        self.screen = pygame.display.set_mode(screen_rect.bottomright)
+        self.container_surface = pygame.Surface(self.container.size)
+
+        # Everything outside of the container is drawn once, the text blocks are redrawn only when they change.
+        self.background = pygame.Color(246, 248, 250)
+        self.screen.fill(self.background)
+        pygame.draw.rect(self.screen, pygame.Color(225, 228, 232), self.border_rect, self.border_width)
+        self._sprites = {}
+        self._texts = {}
+
+    def sprite(self, radius: float, color: tuple) -> pygame.Surface:
+        """Returns a pre-rendered image of an atom, the images are created once for every radius and color.
+
+        :param radius: the radius of the atom
+        :param color: the color of the atom
+        :return: a square surface with the atom in its center
+        """
+        key = (int(radius), tuple(color))
+        sprite = self._sprites.get(key)
+        if sprite is None:
+            radius = key[0]
+            sprite = pygame.Surface((2 * radius + 1, 2 * radius + 1), pygame.SRCALPHA)
+            gfxdraw.filled_circle(sprite, radius, radius, radius, color)
+            gfxdraw.aacircle(sprite, radius, radius, radius, color)
+            sprite = self._sprites[key] = sprite.convert_alpha()
+        return sprite
+
+    def draw_text(self, name: str, value: float = 0):
+        """Redraws a text block if the displayed text has changed.
+
+        :param name: the key of the text block
+        :param value: An updated value for an optional number field.
+        """
+        text_block = self.text_blocks[name]
+        text = text_block.format(value)
+        if self._texts.get(name) != text:
+            self.screen.fill(self.background, text_block.p_field)
+            text_block.gen_text(self.screen, value)
+            self._texts[name] = text
+
+    def draw(self, positions, bounces: int, average: float, rates: tuple = None):
+        """Draws a single frame of the simulation.
+
+        :param positions: iterable of (x, y, radius, color) tuples, one for every atom
+        :param bounces: number of bounces of the test atom
+        :param average: the average distance that the test atom travels
+        :param rates: the number of turns and frames per second, displayed if the window was created with *rates*
+        """
+        if self.observer is not None:
+            start = time.perf_counter()
+        self.container_surface.fill(pygame.Color(250, 251, 252))
+        sprites = []
+        for x, y, radius, color in positions:
+            x, y = convert_coords(self.container, x, y)
+            sprites.append((self.sprite(radius, color), (x - int(radius), y - int(radius))))
+        self.container_surface.blits(sprites, doreturn=False)
+        self.screen.blit(self.container_surface, self.container)
+        if self.observer is not None:
+            text_start = time.perf_counter()
+        self.draw_text("title")
+        self.draw_text("bounces", bounces)
+        self.draw_text("average", average)
+        if rates is not None and "steps" in self.text_blocks:
+            self.draw_text("steps", rates[0])
+            self.draw_text("fps", rates[1])
+        if self.observer is not None:
+            text_stop = time.perf_counter()
+        pygame.display.flip()
+        if self.observer is not None:
+            self.observer.on_phase("text", text_stop - text_start)
+            self.observer.on_phase("draw", time.perf_counter() - text_stop + text_start - start)
+
+    def handle_events(self):
+        """Handles the events of the window, exits the program if the window was closed."""
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                sys.exit(0)
@@ -0,0 +1,62 @@
+from __future__ import annotations
+import numpy
+
+
+# Half of the neighbourhood of a cell, so that every pair of neighbouring cells is visited only once.
+NEIGHBOURS = ((0, 0), (0, 1), (1, -1), (1, 0), (1, 1))
+
+
+def candidate_pairs(x: numpy.ndarray, y: numpy.ndarray, cell_size: float, width: float, height: float,
+                    origin: float = 0.0) -> (numpy.ndarray, numpy.ndarray):
+    """Finds the pairs of atoms that are close enough to collide by sorting them into a uniform grid of cells.
+
+    Only atoms in the same or neighbouring cells are paired, so as long as *cell_size* is not smaller than the largest
+    possible collision distance, no colliding pair is missed.
+
+    :param x: the x position coordinates
+    :param y: the y position coordinates
+    :param cell_size: the length of a side of a single cell, ex. 2 * r + c
+    :param width: width of the container, or of the searched area if *origin* is given
+    :param height: height of the container
+    :param origin: the x coordinate of the left side of the searched area, the atoms outside of the area are put
+        into its first or last column of cells
+    :return: indices *i* < *j* of the candidate pairs, sorted the same way as :py:func:`numpy.triu_indices`
+    """
+    n = len(x)
+    columns = max(int(width // cell_size), 1)
+    rows = max(int(height // cell_size), 1)
+    cx = numpy.clip(((x - origin) // cell_size).astype(numpy.int64), 0, columns - 1)
+    cy = numpy.clip((y // cell_size).astype(numpy.int64), 0, rows - 1)
+    cell = cx * rows + cy
+    order = numpy.argsort(cell, kind="stable")
+    sorted_cell = cell[order]
+    bounds = numpy.searchsorted(sorted_cell, numpy.arange(columns * rows + 1))
+
+    first = []
+    second = []
+    positions = numpy.arange(n)
+    for dx, dy in NEIGHBOURS:
+        nx = cx[order] + dx
+        ny = cy[order] + dy
+        valid = (nx >= 0) & (nx < columns) & (ny >= 0) & (ny < rows)
+        source = positions[valid]
+        target = nx[valid] * rows + ny[valid]
+        start = bounds[target]
+        stop = bounds[target + 1]
+        if dx == dy == 0:
+            start = source + 1
+        counts = numpy.maximum(stop - start, 0)
+        total = counts.sum()
+        if total == 0:
+            continue
+        offsets = numpy.arange(total) - numpy.repeat(numpy.cumsum(counts) - counts, counts)
+        first.append(order[numpy.repeat(source, counts)])
+        second.append(order[numpy.repeat(start, counts) + offsets])
+    if not first:
+        return numpy.empty(0, dtype=numpy.int64), numpy.empty(0, dtype=numpy.int64)
+    first = numpy.concatenate(first)
+    second = numpy.concatenate(second)
+    i = numpy.minimum(first, second)
+    j = numpy.maximum(first, second)
+    key = numpy.sort(i * n + j)
+    return key // n, key % n
@@ -0,0 +1,382 @@
+from __future__ import annotations
+import multiprocessing
+import queue
+import threading
+from multiprocessing import shared_memory
+import numpy
+from atoms_simulator.arrays import contact_pairs, resolve_collisions, wall_collisions
+from atoms_simulator.grid import candidate_pairs
+from atoms_simulator.stats import push_arrays
+from atoms_simulator.tracers import Tracers
+
+
+# The arrays of a simulation kept in shared memory, the state of the atoms followed by the fields of
+# atoms_simulator.tracers.Tracers.
+FIELDS = (
+    ("x", numpy.float64), ("y", numpy.float64), ("vx", numpy.float64), ("vy", numpy.float64),
+    ("radius", numpy.float64), ("bounced", numpy.bool_), ("distance", numpy.float64), ("count", numpy.int64),
+    ("total", numpy.float64), ("minimum", numpy.float64), ("maximum", numpy.float64), ("_mean", numpy.float64),
+    ("_m2", numpy.float64)
+)
+# The fields copied to a Tracers object when a simulation finishes.
+TRACER_FIELDS = ("count", "total", "minimum", "maximum", "_mean", "_m2")
+
+
+class SharedArrays:
+    """A class used to keep the arrays of a simulation in a single shared memory block, so that several processes
+    can read and write them without copying.
+
+    Besides the :py:data:`FIELDS` of every atom, the block holds the lists that the strips exchange: the indices of
+    the atoms that every strip has sent to its left and right neighbour and their numbers, and the pairs of atoms in
+    contact found by every strip.
+
+    :ivar size: number of atoms
+    :type size: int
+    :ivar strips: number of strips
+    :type strips: int
+    :ivar borders: (strips, 2, size) array of indices of the atoms sent to the left and the right neighbour
+    :type borders: :py:class:`numpy.ndarray`
+    :ivar sent: (strips, 2) array of the numbers of the sent atoms
+    :type sent: :py:class:`numpy.ndarray`
+    :ivar contacts: (strips, 2, 4 * size) array of the indices of the first and the second atoms of the pairs in
+        contact
+    :type contacts: :py:class:`numpy.ndarray`
+    :ivar found: (strips,) array of the numbers of the pairs in contact
+    :type found: :py:class:`numpy.ndarray`
+    """
+    def __init__(self, size: int, strips: int, name: str = None):
+        """Initialize a SharedArrays type object, the memory block is created if *name* is omitted.
+
+        :param size: number of atoms
+        :param strips: number of strips
+        :param name: name of an existing memory block
+        """
+        self.size = size
+        self.strips = strips
+        layout = [(field, (size,), dtype) for field, dtype in FIELDS]
+        layout += [("borders", (strips, 2, size), numpy.int64), ("sent", (strips, 2), numpy.int64),
+                   ("contacts", (strips, 2, 4 * size), numpy.int64), ("found", (strips,), numpy.int64)]
+        offsets = []
+        total = 0
+        for _, shape, dtype in layout:
+            offsets.append(total)
+            total += -(-int(numpy.prod(shape)) * numpy.dtype(dtype).itemsize // 8) * 8
+        if name is None:
+            self.memory = shared_memory.SharedMemory(create=True, size=max(total, 1))
+        else:
+            self.memory = shared_memory.SharedMemory(name=name)
+        for (field, shape, dtype), offset in zip(layout, offsets):
+            setattr(self, field, numpy.ndarray(shape, dtype=dtype, buffer=self.memory.buf, offset=offset))
+
+    @property
+    def name(self) -> str:
+        """The name of the memory block, used to attach to it in other processes."""
+        return self.memory.name
+
+    def close(self):
+        """Detaches from the memory block, the arrays can't be used afterwards."""
+        for field, _ in FIELDS:
+            setattr(self, field, None)
+        self.borders = self.sent = self.contacts = self.found = None
+        self.memory.close()
+
+
+class StripSimulation:
+    """A class used to perform a single simulation of the numpy engine in several processes.
+
+    The container is split into vertical strips of equal width, one per worker process. Every worker owns the atoms
+    whose centres lie in its strip and performs their collisions, wall bounces, free path bookkeeping and movement.
+    Pairs are found among the owned atoms and the halo, the atoms of the neighbouring strips that lie within a
+    collision distance of the strip, so no pair is missed. Every worker publishes the pairs in contact whose first
+    atom it owns, then resolves all pairs of the groups of touching atoms that contain its own atoms, in the same
+    order as the numpy engine, and keeps only the velocities of its own atoms. After every turn the workers send the
+    atoms near their borders to their neighbours, which take over the ones that crossed the border and use the rest
+    as their next halo.
+
+    The worker processes are started by the first :py:meth:`run` and wait for the next one until :py:meth:`close`.
+    All arrays live in :py:class:`SharedArrays`, so the exchange only passes indices. Every turn has three barriers:
+    one after the pairs in contact have been published, one after all collisions have been resolved and one after all
+    atoms have been moved. The collisions are resolved with the same functions as in
+    :py:class:`atoms_simulator.arrays.AtomArrays` and every atom goes through the same operations in the same order,
+    so the results are equal to the results of the numpy engine. Every atom is tracked the same way as with
+    :py:class:`atoms_simulator.tracers.Tracers`, the test atom is the atom at index 0.
+
+    :ivar workers: number of worker processes
+    :type workers: int
+    :ivar width: width of the container
+    :type width: float
+    :ivar height: height of the container
+    :type height: float
+    """
+    def __init__(self, x, y, vx, vy, radius, width: float, height: float, workers: int, cell_size: float):
+        """Initialize a StripSimulation type object.
+
+        :param x: the x position coordinates
+        :param y: the y position coordinates
+        :param vx: the velocity vectors' x coordinates
+        :param vy: the velocity vectors' y coordinates
+        :param radius: the radii of the atoms
+        :param width: width of the container
+        :param height: height of the container
+        :param workers: number of worker processes
+        :param cell_size: the largest distance of two colliding atoms, ex. 2 * r + c
+        :raise ValueError: if the strips would be narrower than *cell_size*
+        """
+        if width / workers < cell_size:
+            raise ValueError("The container is too narrow for the chosen number of workers.")
+        self.workers = workers
+        self.width = float(width)
+        self.height = float(height)
+        self._cell_size = cell_size
+        self._shared = SharedArrays(len(x), workers)
+        for field, values in (("x", x), ("y", y), ("vx", vx), ("vy", vy), ("radius", radius)):
+            getattr(self._shared, field)[:] = values
+        tracers = Tracers(len(x))
+        for field, _ in FIELDS[5:]:
+            getattr(self._shared, field)[:] = getattr(tracers, field)
+        self._processes = []
+        self._commands = []
+        self._results = None
+        self._error = None
+
+    def __len__(self):
+        return self._shared.size
+
+    def run(self, turns: int, time_step: float, collision_tolerance: float):
+        """Performs *turns* turns in the worker processes and waits for them to finish.
+
+        :param turns: number of turns
+        :param time_step: the time step of a single turn
+        :param collision_tolerance:
+        :raise RuntimeError: if one of the workers failed, now or in one of the previous runs
+        """
+        if self._error is not None:
+            raise RuntimeError(f"The parallel simulation failed: {self._error}")
+        if not self._processes:
+            self._start()
+        try:
+            for commands in self._commands:
+                commands.put((turns, time_step, collision_tolerance))
+            finished = 0
+            while finished < self.workers:
+                try:
+                    error = self._results.get(timeout=1)
+                except queue.Empty:
+                    if all(process.is_alive() for process in self._processes):
+                        continue
+                    error = "A worker process was stopped."
+                if error is not None:
+                    self._error = error
+                    break
+                finished += 1
+        except BaseException:
+            self._error = "The simulation was interrupted."
+            raise
+        finally:
+            if self._error is not None:
+                self._stop(wait=False)
+        if self._error is not None:
+            raise RuntimeError(f"The parallel simulation failed: {self._error}")
+
+    def _start(self):
+        context = multiprocessing.get_context()
+        barrier = context.Barrier(self.workers)
+        self._results = context.Queue()
+        self._commands = [context.Queue() for _ in range(self.workers)]
+        self._processes = [
+            context.Process(target=run_strip, args=(
+                self._shared.name, len(self), self.workers, strip, self.width, self.height, self._cell_size, barrier,
+                self._commands[strip], self._results
+            ), daemon=True)
+            for strip in range(self.workers)
+        ]
+        for process in self._processes:
+            process.start()
+
+    def _stop(self, wait: bool = True):
+        # The idle workers finish when they get None, the ones that are stuck in a failed run are terminated.
+        if wait:
+            for commands in self._commands:
+                commands.put(None)
+            for process in self._processes:
+                process.join(5)
+        for process in self._processes:
+            if process.is_alive():
+                process.terminate()
+            process.join()
+        for channel in (*self._commands, self._results):
+            if channel is not None:
+                channel.close()
+        self._processes = []
+        self._commands = []
+        self._results = None
+
+    def tracers(self) -> Tracers:
+        """Returns a copy of the statistics of every atom.
+
+        :return:
+        """
+        tracers = Tracers(len(self))
+        for field in TRACER_FIELDS:
+            setattr(tracers, field, getattr(self._shared, field).copy())
+        return tracers
+
+    def state(self) -> tuple:
+        """Returns a copy of the state of the atoms.
+
+        :return: the x and y position coordinates and the velocity vectors' x and y coordinates
+        """
+        return tuple(getattr(self._shared, field).copy() for field in ("x", "y", "vx", "vy"))
+
+    def close(self):
+        """Stops the worker processes and releases the shared memory."""
+        self._stop(wait=self._error is None)
+        self._shared.close()
+        self._shared.memory.unlink()
+
+
+def run_strip(name: str, size: int, strips: int, strip: int, width: float, height: float, cell_size: float,
+              barrier: threading.Barrier, commands: multiprocessing.Queue, results: multiprocessing.Queue):
+    """Performs the runs of a single strip of a :py:class:`StripSimulation`, the target of a worker process.
+
+    Every command is a tuple of the number of turns, the time step and the collision tolerance, the worker puts None
+    in *results* after every finished run, or the description of an error and stops. None stops the worker.
+
+    :param name: name of the :py:class:`SharedArrays` memory block
+    :param size: number of atoms
+    :param strips: number of strips
+    :param strip: index of the strip
+    :param width: width of the container
+    :param height: height of the container
+    :param cell_size: the largest distance of two colliding atoms
+    :param barrier: the barrier shared by all workers
+    :param commands: queue of the runs of the worker
+    :param results: queue shared by all workers
+    """
+    shared = SharedArrays(size, strips, name)
+    try:
+        for turns, time_step, collision_tolerance in iter(commands.get, None):
+            try:
+                strip_turns(shared, strip, width, height, cell_size, collision_tolerance, time_step, turns, barrier)
+            except BaseException as error:
+                # The other workers would wait at the barrier forever.
+                barrier.abort()
+                if not isinstance(error, threading.BrokenBarrierError):
+                    results.put(f"{type(error).__name__}: {error}")
+                raise SystemExit(1)
+            results.put(None)
+    finally:
+        shared.close()
+
+
+def strip_turns(shared: SharedArrays, strip: int, width: float, height: float, cell_size: float,
+                collision_tolerance: float, time_step: float, turns: int, barrier: threading.Barrier):
+    """Performs *turns* turns of a single strip, see :py:func:`run_strip`.
+
+    :param shared: the arrays of the simulation
+    :param strip: index of the strip
+    :param width: width of the container
+    :param height: height of the container
+    :param cell_size: the largest distance of two colliding atoms
+    :param collision_tolerance:
+    :param time_step: the time step of a single turn
+    :param turns: number of turns
+    :param barrier: the barrier shared by all workers
+    """
+    size, strips = shared.size, shared.strips
+    edges = numpy.linspace(0, width, strips + 1)
+    left, right = edges[strip], edges[strip + 1]
+
+    def owned_by(x: numpy.ndarray) -> numpy.ndarray:
+        return numpy.searchsorted(edges[1:-1], x, side="right") == strip
+
+    def near(x: numpy.ndarray) -> numpy.ndarray:
+        return (x >= left - cell_size) & (x < right + cell_size)
+
+    x, y, vx, vy, radius = shared.x, shared.y, shared.vx, shared.vy, shared.radius
+    owned = numpy.flatnonzero(owned_by(x))
+    local = numpy.flatnonzero(near(x))
+    mask = numpy.zeros(size, dtype=bool)
+    capacity = shared.contacts.shape[2]
+    for _ in range(turns):
+        # Every pair in contact is published by the owner of its first atom.
+        mask[owned] = True
+        # Only the strip and its halo are divided into cells.
+        i, j = candidate_pairs(x[local], y[local], cell_size, right - left + 2 * cell_size, height, left - cell_size)
+        i, j = local[i], local[j]
+        mine = mask[i]
+        i, j = contact_pairs(x, y, radius, i[mine], j[mine], collision_tolerance)
+        if len(i) > capacity:
+            raise ValueError("Too many atoms are in contact with each other.")
+        shared.contacts[strip, 0, :len(i)] = i
+        shared.contacts[strip, 1, :len(i)] = j
+        shared.found[strip] = len(i)
+        barrier.wait()
+
+        # The groups of touching atoms are independent, so only the ones that contain an owned atom are resolved, on
+        # copies of the velocities, in the order of the numpy engine.
+        i = numpy.concatenate([shared.contacts[other, 0, :shared.found[other]] for other in range(strips)])
+        j = numpy.concatenate([shared.contacts[other, 1, :shared.found[other]] for other in range(strips)])
+        order = numpy.argsort(i * size + j)
+        i, j = i[order], j[order]
+        group = mask.copy()
+        selected = -1
+        while True:
+            touching = group[i] | group[j]
+            group[i[touching]] = True
+            group[j[touching]] = True
+            if touching.sum() == selected:
+                break
+            selected = touching.sum()
+        new_vx, new_vy = vx.copy(), vy.copy()
+        i, j = resolve_collisions(x, y, new_vx, new_vy, radius, i[touching], j[touching], collision_tolerance)
+        barrier.wait()
+
+        # Only the owned atoms are modified.
+        vx[owned] = new_vx[owned]
+        vy[owned] = new_vy[owned]
+        shared.bounced[i[mask[i]]] = True
+        shared.bounced[j[mask[j]]] = True
+        flip_x, flip_y = wall_collisions(x[owned], y[owned], vx[owned], vy[owned], radius[owned], width, height,
+                                         collision_tolerance)
+        vx[owned[flip_x]] *= -1
+        vy[owned[flip_y]] *= -1
+        store_distance(shared, owned)
+        x[owned] += vx[owned] * time_step
+        y[owned] += vy[owned] * time_step
+        speed = numpy.sqrt(vx[owned] ** 2 + vy[owned] ** 2)
+        if len(speed) and speed.max() * time_step >= cell_size:
+            raise ValueError("An atom has moved farther than the halo in a single turn.")
+        shared.distance[owned] += time_step * speed
+
+        # The atoms near the borders are sent to the neighbours, including the ones that have just crossed them.
+        mask[owned] = False
+        for side, neighbour, selected in ((0, strip - 1, x[owned] < left + cell_size),
+                                          (1, strip + 1, x[owned] >= right - cell_size)):
+            if 0 <= neighbour < strips:
+                sent = owned[selected]
+                shared.borders[strip, side, :len(sent)] = sent
+                shared.sent[strip, side] = len(sent)
+        barrier.wait()
+
+        received = [owned]
+        for side, neighbour in ((1, strip - 1), (0, strip + 1)):
+            if 0 <= neighbour < strips:
+                received.append(shared.borders[neighbour, side, :shared.sent[neighbour, side]].copy())
+        known = numpy.unique(numpy.concatenate(received))
+        owned = known[owned_by(x[known])]
+        local = known[near(x[known])]
+
+
+def store_distance(shared: SharedArrays, atoms: numpy.ndarray):
+    """Saves the current distances of the atoms that bounced, the same way as
+    :py:meth:`atoms_simulator.tracers.Tracers.store_distance`, but only for the given atoms.
+
+    :param shared: the arrays of the simulation
+    :param atoms: indices of the atoms
+    """
+    bounced = atoms[shared.bounced[atoms]]
+    if len(bounced):
+        push_arrays(shared, bounced, shared.distance[bounced])
+        shared.distance[bounced] = 0.0
+        shared.bounced[bounced] = False
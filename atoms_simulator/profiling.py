@@ -0,0 +1,90 @@
+from __future__ import annotations
+
+
+# The phases of a single turn of atoms_simulator.simulate, in the order they are performed. "events" is the handling of
+# the events of the window after a frame has been drawn.
+PHASES = ("broad_phase", "collisions", "store_distance", "record", "draw", "text", "events", "update")
+
+
+class Observer:
+    """A base class of the objects notified by :py:func:`atoms_simulator.simulate` about its progress.
+
+    All methods do nothing, subclasses override the ones they need. The phases are listed in :py:data:`PHASES`, the
+    counted quantities are "pair_checks" - pairs of atoms tested for a collision, "atom_bounces" - pairs that
+    collided and "wall_hits" - atoms that bounced off a wall. The event-driven engine doesn't count them, and performs
+    its collisions in the "collisions" phase together with moving the atoms.
+    """
+    def on_phase(self, phase: str, seconds: float):
+        """Called after a phase of a turn has been performed.
+
+        :param phase: the name of the phase
+        :param seconds: the time that the phase took
+        """
+        pass
+
+    def on_count(self, name: str, value: int):
+        """Called when something has been counted during a turn.
+
+        :param name: the name of the counted quantity
+        :param value: the number of occurrences in this turn
+        """
+        pass
+
+    def on_turn(self, turns: int, bounces: int, average: float):
+        """Called after one or more turns have been performed.
+
+        :param turns: the number of turns performed since the previous call
+        :param bounces: number of bounces of the test atom
+        :param average: the average distance that the test atom travels
+        """
+        pass
+
+
+class Profiler(Observer):
+    """An observer that accumulates the time of every phase and the counted quantities.
+
+    :ivar times: the cumulative time of every phase in seconds
+    :type times: dict
+    :ivar counts: the cumulative value of every counted quantity
+    :type counts: dict
+    :ivar turns: the number of performed turns
+    :type turns: int
+    """
+    def __init__(self):
+        """Initialize a Profiler type object."""
+        self.times = {}
+        self.counts = {}
+        self.turns = 0
+
+    def on_phase(self, phase: str, seconds: float):
+        self.times[phase] = self.times.get(phase, 0.0) + seconds
+
+    def on_count(self, name: str, value: int):
+        self.counts[name] = self.counts.get(name, 0) + value
+
+    def on_turn(self, turns: int, bounces: int, average: float):
+        self.turns += turns
+
+    def merge(self, other: Profiler):
+        """Adds everything accumulated by *other*.
+
+        :param other:
+        """
+        for phase, seconds in other.times.items():
+            self.on_phase(phase, seconds)
+        for name, value in other.counts.items():
+            self.on_count(name, value)
+        self.turns += other.turns
+
+    def summary(self) -> dict:
+        """Returns the accumulated values in a form that can be saved as JSON.
+
+        :return: dictionary with the "turns", "total" - the time of all phases, "times", "shares" - the fractions of
+            the total time, and "counts" keys
+        """
+        total = sum(self.times.values())
+        return {
+            "turns": self.turns, "total": total, "times": dict(self.times),
+            "shares": {phase: seconds / total if total else 0.0 for phase, seconds in self.times.items()},
+            "counts": dict(self.counts)
+        }
@@ -0,0 +1,157 @@
+from __future__ import annotations
+import json
+import os
+import os.path
+import numpy
+from numpy.lib.format import open_memmap
+
+
+class Recorder:
+    """A class used to stream the frames of a simulation to memory-mapped .npy files.
+
+    Every *every*-th turn of a simulation the positions and velocities of all atoms are written to a (frames, atoms, 4)
+    array and the number of bounces and the average distance of the test atom to a (frames, 2) array. The arrays are
+    split into chunks of at most *chunk* frames, so that a continuous simulation can be recorded too, and nothing is
+    buffered in memory.
+
+    :ivar path: the directory that the files are written to
+    :type path: str
+    :ivar every: the number of turns between two recorded frames
+    :type every: int
+    :ivar chunk: the number of frames in a single file
+    :type chunk: int
+    :ivar frames: the number of frames recorded so far
+    :type frames: int
+    """
+    def __init__(self, path: str, every: int = 1, chunk: int = 1000):
+        """Initialize a Recorder type object.
+
+        :param path: the directory that the files will be written to, it is created if it doesn't exist
+        :param every: the number of turns between two recorded frames
+        :param chunk: the number of frames in a single file
+        :raise ValueError: if *every* or *chunk* is smaller than 1
+        """
+        if every < 1 or chunk < 1:
+            raise ValueError("The recording interval and the chunk size must be greater than 0.")
+        self.path = path
+        self.every = every
+        self.chunk = chunk
+        self.frames = 0
+        self._total = None
+        self._meta = None
+        self._states = None
+        self._observables = None
+
+    def open(self, atoms: int, turns: int, width: float, height: float, radius: float, time_step: float):
+        """Prepares the recording of a simulation.
+
+        :param atoms: number of atoms, including the test atom
+        :param turns: number of turns of the simulation, 0 for a continuous simulation
+        :param width: width of the container
+        :param height: height of the container
+        :param radius: radius of the atoms
+        :param time_step: time step of a single turn
+        """
+        os.makedirs(self.path, exist_ok=True)
+        self._total = (turns - 1) // self.every + 1 if turns > 0 else None
+        self._meta = {
+            "atoms": atoms, "every": self.every, "chunk": self.chunk, "frames": 0,
+            "width": width, "height": height, "radius": radius, "time_step": time_step
+        }
+        self.save_meta()
+
+    def save_meta(self):
+        """Saves the description of the recording."""
+        self._meta["frames"] = self.frames
+        with open(os.path.join(self.path, "trajectory.json"), "w") as target:
+            json.dump(self._meta, target)
+
+    def record(self, x, y, vx, vy, bounces: int, average: float):
+        """Writes a frame.
+
+        :param x: the x position coordinates
+        :param y: the y position coordinates
+        :param vx: the velocity vectors' x coordinates
+        :param vy: the velocity vectors' y coordinates
+        :param bounces: number of bounces of the test atom
+        :param average: the average distance that the test atom travels
+        """
+        index = self.frames % self.chunk
+        if index == 0:
+            self.new_chunk()
+        self._states[index, :, 0] = x
+        self._states[index, :, 1] = y
+        self._states[index, :, 2] = vx
+        self._states[index, :, 3] = vy
+        self._observables[index] = bounces, average
+        self.frames += 1
+
+    def new_chunk(self):
+        """Flushes the current chunk and creates the next one."""
+        self.flush()
+        number = self.frames // self.chunk
+        size = self.chunk if self._total is None else min(self.chunk, self._total - self.frames)
+        self._states = open_memmap(
+            os.path.join(self.path, f"states_{number:05}.npy"), mode="w+", dtype=numpy.float64,
+            shape=(size, self._meta["atoms"], 4)
+        )
+        self._observables = open_memmap(
+            os.path.join(self.path, f"observables_{number:05}.npy"), mode="w+", dtype=numpy.float64,
+            shape=(size, 2)
+        )
+
+    def flush(self):
+        """Writes all recorded frames to the disk."""
+        if self._states is not None:
+            self._states.flush()
+            self._observables.flush()
+            self.save_meta()
+
+    def close(self):
+        """Finishes the recording."""
+        self.flush()
+        self._states = None
+        self._observables = None
+
+
+class Trajectory:
+    """A class used to read a recording made by :py:class:`Recorder` without copying it into memory.
+
+    :ivar path: the directory containing the recording
+    :type path: str
+    :ivar meta: the description of the recording
+    :type meta: dict
+    """
+    def __init__(self, path: str):
+        """Initialize a Trajectory type object.
+
+        :param path: the directory containing the recording
+        :raise ValueError: if the directory doesn't contain a recording
+        """
+        if not os.path.isfile(os.path.join(path, "trajectory.json")):
+            raise ValueError(f"The {path} catalog doesn't contain a recording.")
+        self.path = path
+        with open(os.path.join(path, "trajectory.json"), "r") as origin:
+            self.meta = json.load(origin)
+        self._chunk = None
+        self._loaded = None
+
+    def __len__(self):
+        return self.meta["frames"]
+
+    def __getitem__(self, frame: int) -> (numpy.ndarray, numpy.ndarray):
+        """Returns the state of the atoms and the observables of a single frame.
+
+        :param frame: the index of the frame
+        :return: (atoms, 4) array of positions and velocities and (bounces, average) array
+        """
+        if not 0 <= frame < len(self):
+            raise IndexError("Frame index out of range.")
+        number, index = divmod(frame, self.meta["chunk"])
+        if number != self._chunk:
+            self._loaded = (
+                numpy.load(os.path.join(self.path, f"states_{number:05}.npy"), mmap_mode="r"),
+                numpy.load(os.path.join(self.path, f"observables_{number:05}.npy"), mmap_mode="r")
+            )
+            self._chunk = number
+        return self._loaded[0][index], self._loaded[1][index]
@@ -0,0 +1,159 @@
+from __future__ import annotations
+import math
+
+
+class RunningStats:
+    """A class used to accumulate statistics of a stream of values in constant memory.
+
+    The variance is computed with Welford's algorithm, the mean is computed from the sum of the values, so that it is
+    equal to the mean of a list of the same values.
+
+    :ivar count: number of values
+    :type count: int
+    :ivar total: sum of the values
+    :type total: float
+    :ivar minimum: the smallest value
+    :type minimum: float
+    :ivar maximum: the largest value
+    :type maximum: float
+    :ivar bins: number of bins of the histogram, 0 - no histogram
+    :type bins: int
+    :ivar limit: the upper limit of the histogram, the lower limit is 0
+    :type limit: float
+    :ivar histogram: the number of values in every bin, values greater or equal to *limit* are counted in the last bin
+    :type histogram: list
+    """
+    def __init__(self, bins: int = 0, limit: float = None):
+        """Initialize a RunningStats type object.
+
+        :param bins: number of bins of the histogram, 0 - no histogram
+        :param limit: the upper limit of the histogram, the lower limit is 0
+        :raise ValueError: if the histogram has no valid limit
+        """
+        if bins and (limit is None or limit <= 0):
+            raise ValueError("The histogram limit must be greater than 0.")
+        self.count = 0
+        self.total = 0.0
+        self.minimum = math.inf
+        self.maximum = -math.inf
+        self.bins = bins
+        self.limit = limit
+        self.histogram = [0] * bins
+        self._mean = 0.0
+        self._m2 = 0.0
+
+    @classmethod
+    def from_moments(cls, count: int, total: float, mean: float, m2: float, minimum: float,
+                     maximum: float) -> RunningStats:
+        """Create a RunningStats type object from already accumulated values.
+
+        :param count: number of values
+        :param total: sum of the values
+        :param mean: the running mean of Welford's algorithm
+        :param m2: the sum of squared differences from the mean
+        :param minimum: the smallest value
+        :param maximum: the largest value
+        :return:
+        """
+        stats = cls()
+        stats.count = int(count)
+        stats.total = float(total)
+        stats._mean = float(mean)
+        stats._m2 = float(m2)
+        stats.minimum = float(minimum)
+        stats.maximum = float(maximum)
+        return stats
+
+    def moments(self) -> tuple:
+        """Returns the accumulated values in the order expected by :py:meth:`from_moments`.
+
+        :return:
+        """
+        return self.count, self.total, self._mean, self._m2, self.minimum, self.maximum
+
+    def empty(self) -> RunningStats:
+        """Returns an empty accumulator with the same histogram.
+
+        :return:
+        """
+        return RunningStats(self.bins, self.limit)
+
+    def push(self, value: float):
+        """Adds a value to the statistics.
+
+        :param value:
+        """
+        self.count += 1
+        self.total += value
+        delta = value - self._mean
+        self._mean += delta / self.count
+        self._m2 += delta * (value - self._mean)
+        self.minimum = min(self.minimum, value)
+        self.maximum = max(self.maximum, value)
+        if self.bins:
+            self.histogram[min(max(int(value / self.limit * self.bins), 0), self.bins - 1)] += 1
+
+    def merge(self, other: RunningStats):
+        """Adds all values accumulated by *other* to the statistics.
+
+        :param other:
+        :raise ValueError: if the histograms are different
+        """
+        if self.bins and other.count and (self.bins, self.limit) != (other.bins, other.limit):
+            raise ValueError("Statistics with different histograms can't be merged.")
+        if other.count == 0:
+            return
+        count = self.count + other.count
+        delta = other._mean - self._mean
+        self._m2 += other._m2 + delta ** 2 * self.count * other.count / count
+        self._mean += delta * other.count / count
+        self.count = count
+        self.total += other.total
+        self.minimum = min(self.minimum, other.minimum)
+        self.maximum = max(self.maximum, other.maximum)
+        if self.bins:
+            self.histogram = [a + b for a, b in zip(self.histogram, other.histogram)]
+
+    @property
+    def mean(self) -> float:
+        """The mean of the values, 0 if there are none."""
+        if self.count == 0:
+            return 0.0
+        return self.total / self.count
+
+    @property
+    def variance(self) -> float:
+        """The sample variance of the values, 0 if there are less than two."""
+        if self.count < 2:
+            return 0.0
+        return self._m2 / (self.count - 1)
+
+    @property
+    def std(self) -> float:
+        """The sample standard deviation of the values."""
+        return self.variance ** 0.5
+
+    @property
+    def standard_error(self) -> float:
+        """The standard error of the mean."""
+        if self.count == 0:
+            return 0.0
+        return (self.variance / self.count) ** 0.5
+
+
+def push_arrays(stats, selected, value):
+    """Adds values to arrays of statistics, with the same formulas as :py:meth:`RunningStats.push`.
+
+    :param stats: object with the count, total, _mean, _m2, minimum and maximum arrays, ex.
+        :py:class:`atoms_simulator.tracers.Tracers`
+    :param selected: indices or boolean mask of the elements of the arrays that get a value
+    :param value: array of the values, one per selected element
+    """
+    import numpy
+    stats.count[selected] += 1
+    stats.total[selected] += value
+    delta = value - stats._mean[selected]
+    stats._mean[selected] += delta / stats.count[selected]
+    stats._m2[selected] += delta * (value - stats._mean[selected])
+    stats.minimum[selected] = numpy.minimum(stats.minimum[selected], value)
+    stats.maximum[selected] = numpy.maximum(stats.maximum[selected], value)
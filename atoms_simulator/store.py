@@ -0,0 +1,176 @@
+from __future__ import annotations
+import json
+import os
+import os.path
+import sqlite3
+import time
+from typing import TYPE_CHECKING
+import numpy
+from atoms_simulator.cache import PHYSICS_SETTINGS
+
+if TYPE_CHECKING:
+    from atoms_simulator.sweep import Sweep
+
+
+# The columns of a run that describe its settings, all of them are indexed.
+RUN_SETTINGS = PHYSICS_SETTINGS + ("N",)
+
+
+def default_path() -> str:
+    """Returns the path of the store of the current working directory, ats_results/results.sqlite.
+
+    :return:
+    """
+    return os.path.join(os.getcwd(), "ats_results", "results.sqlite")
+
+
+class ResultStore:
+    """A class used to keep the results of all data batches in an SQLite database.
+
+    Every batch is registered when it's created, which also gives it its name, and the number of bounces and the
+    average distance of the test atom of every single simulation are stored when the test finishes, together with
+    the settings of the simulation, so the runs can be searched by any of them.
+
+    :ivar path: the path of the database
+    :type path: str
+    """
+    def __init__(self, path: str = None):
+        """Initialize a ResultStore type object, the database is created if it doesn't exist.
+
+        :param path: the path of the database, :py:func:`default_path` by default
+        """
+        self.path = default_path() if path is None else path
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._db = sqlite3.connect(self.path, timeout=60)
+        with self._db:
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS batches (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT UNIQUE, "
+                "created REAL, finished REAL, settings TEXT, axes TEXT)"
+            )
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS runs (batch INTEGER, row INTEGER, repetition INTEGER, h INTEGER, "
+                "w INTEGER, r REAL, v INTEGER, c REAL, M INTEGER, K INTEGER, N INTEGER, seed INTEGER, "
+                "bounces INTEGER, average REAL, PRIMARY KEY (batch, row, repetition))"
+            )
+            for name in RUN_SETTINGS:
+                self._db.execute(f"CREATE INDEX IF NOT EXISTS runs_{name} ON runs ({name})")
+
+    def new_batch(self, directory: str) -> str:
+        """Registers a new data batch.
+
+        :param directory: the catalog of the data batches, the names of the catalogs created before the store are
+            skipped
+        :return: name of the batch, data_batch followed by its number
+        """
+        while True:
+            with self._db:
+                number = self._db.execute("INSERT INTO batches (created) VALUES (?)", (time.time(),)).lastrowid
+                name = f"data_batch{number}"
+                if not os.path.lexists(os.path.join(directory, name)):
+                    self._db.execute("UPDATE batches SET name = ? WHERE id = ?", (name, number))
+                    return name
+                self._db.execute("DELETE FROM batches WHERE id = ?", (number,))
+
+    def add_results(self, name: str, settings: dict, sweep: Sweep, bounce: numpy.ndarray, cop: numpy.ndarray,
+                    done: numpy.ndarray, seeds: numpy.ndarray):
+        """Stores the results of every finished simulation of a test, replacing the previously stored ones.
+
+        :param name: name of the batch, it is registered if it's missing
+        :param settings: settings of the test
+        :param sweep: the grid of the test
+        :param bounce: number of bounces of every simulation
+        :param cop: the average distance of every simulation
+        :param done: Indicates which simulations have finished.
+        :param seeds: seed of every simulation
+        """
+        axes = {axis: list(values) for axis, values in zip(sweep.axes, sweep.values)}
+        runs = []
+        for row in range(len(sweep)):
+            row_settings = sweep.settings(row)
+            values = tuple(row_settings[setting] for setting in RUN_SETTINGS)
+            runs += [
+                (row, repetition, *values, int(seeds[row, repetition]), int(bounce[row, repetition]),
+                 float(cop[row, repetition]))
+                for repetition in numpy.flatnonzero(done[row]).tolist()
+            ]
+        with self._db:
+            if self._batch_id(name) is None:
+                self._db.execute("INSERT INTO batches (name, created) VALUES (?, ?)", (name, time.time()))
+            self._db.execute(
+                "UPDATE batches SET finished = ?, settings = ?, axes = ? WHERE name = ?",
+                (time.time(), json.dumps(settings), json.dumps(axes), name)
+            )
+            batch = self._batch_id(name)
+            self._db.execute("DELETE FROM runs WHERE batch = ?", (batch,))
+            self._db.executemany(
+                f"INSERT INTO runs VALUES (?, {', '.join('?' * (len(RUN_SETTINGS) + 5))})",
+                [(batch, *run) for run in runs]
+            )
+
+    def _batch_id(self, name: str) -> int:
+        row = self._db.execute("SELECT id FROM batches WHERE name = ?", (name,)).fetchone()
+        return None if row is None else row[0]
+
+    def batches(self) -> list:
+        """Returns the names of the batches whose results are stored, from the oldest one.
+
+        :return:
+        """
+        return [row[0] for row in self._db.execute("SELECT name FROM batches WHERE finished IS NOT NULL ORDER BY id")]
+
+    def settings(self, name: str) -> dict:
+        """Returns the settings of the test of a batch.
+
+        :param name: name of the batch
+        :return: None if the results of the batch are not stored
+        """
+        row = self._db.execute("SELECT settings FROM batches WHERE name = ? AND finished IS NOT NULL",
+                               (name,)).fetchone()
+        return None if row is None else json.loads(row[0])
+
+    def load(self, name: str) -> (dict, dict):
+        """Calculates the means of the results of a batch at every point of its grid.
+
+        :param name: name of the batch
+        :return: the values of every swept setting and the arrays of the mean number of bounces, the mean average
+            distance and the number of repetitions, by name, None if the results of the batch are not stored
+        """
+        row = self._db.execute("SELECT id, axes FROM batches WHERE name = ? AND finished IS NOT NULL",
+                               (name,)).fetchone()
+        if row is None:
+            return None
+        batch, axes = row[0], {axis: numpy.array(values) for axis, values in json.loads(row[1]).items()}
+        shape = tuple(len(values) for values in axes.values())
+        results = {
+            "bounces": numpy.full(shape, numpy.nan), "change_of_position": numpy.full(shape, numpy.nan),
+            "repetitions": numpy.zeros(shape, dtype=int)
+        }
+        for point, bounces, average, count in self._db.execute(
+                "SELECT row, AVG(bounces), AVG(average), COUNT(*) FROM runs WHERE batch = ? GROUP BY row", (batch,)):
+            index = numpy.unravel_index(point, shape)
+            results["bounces"][index] = bounces
+            results["change_of_position"][index] = average
+            results["repetitions"][index] = count
+        return axes, results
+
+    def runs(self, **settings) -> list:
+        """Finds the runs with the given settings.
+
+        :param settings: the values of the settings, ex. r=30, v=10
+        :return: list of (batch, h, w, r, v, c, M, K, N, repetition, seed, bounces, average) tuples
+        :raise ValueError: if a setting isn't one of :py:data:`RUN_SETTINGS`
+        """
+        for setting in settings:
+            if setting not in RUN_SETTINGS:
+                raise ValueError(f"The runs can't be searched by the {setting} setting, only by "
+                                 f"{', '.join(RUN_SETTINGS)}.")
+        condition = " AND ".join(f"runs.{setting} = ?" for setting in settings) or "1"
+        return self._db.execute(
+            f"SELECT batches.name, {', '.join(f'runs.{setting}' for setting in RUN_SETTINGS)}, runs.repetition, "
+            f"runs.seed, runs.bounces, runs.average FROM runs JOIN batches ON batches.id = runs.batch "
+            f"WHERE {condition} ORDER BY runs.batch, runs.row, runs.repetition", tuple(settings.values())
+        ).fetchall()
+
+    def close(self):
+        """Closes the database."""
+        self._db.close()
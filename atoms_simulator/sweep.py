@@ -0,0 +1,188 @@
+from __future__ import annotations
+import itertools
+import math
+import os
+import numpy
+import atoms_simulator
+from atoms_simulator.cache import PHYSICS_SETTINGS
+
+
+class Sweep:
+    """A class used to describe the grid of the settings of a test.
+
+    The numbers of atoms are given by the N_min, N_step and N_number settings, and any other physics setting can be
+    given a list of values in the sweep table of the settings file, ex. ``r = [20, 30]``. The test performs the
+    simulations for every combination of the values. The rows of the arrays of a test are the points of the grid in
+    the C order, so the number of atoms, which is always the last axis, changes the fastest.
+
+    :ivar axes: names of the swept settings, N is the last one
+    :type axes: tuple
+    :ivar values: the values of every swept setting
+    :type values: tuple
+    """
+    def __init__(self, settings: atoms_simulator.Settings):
+        """Initialize a Sweep type object.
+
+        :param settings: settings of the test, with the optional sweep table
+        :raise ValueError: if the sweep table is corrupted or contains a setting that can't be swept
+        """
+        sweep = settings["sweep"] or {}
+        if not isinstance(sweep, dict):
+            raise ValueError("The sweep table of the settings file is corrupted.")
+        for name, values in sweep.items():
+            if name not in PHYSICS_SETTINGS:
+                raise ValueError(f"The {name} setting can't be swept, only {', '.join(PHYSICS_SETTINGS)} can.")
+            if not isinstance(values, list) or not values:
+                raise ValueError(f"The sweep of the {name} setting must be a non-empty list of values.")
+            if len(set(values)) != len(values):
+                raise ValueError(f"The values of the swept {name} setting must be unique.")
+        n_stop = settings["N_min"] + settings["N_step"] * (settings["N_number"] - 1)
+        self.axes = tuple(sweep) + ("N",)
+        self.values = tuple(sweep.values()) + (list(range(settings["N_min"], n_stop + 1, settings["N_step"])),)
+        self._settings = settings
+        self._points = list(itertools.product(*self.values))
+
+    def __len__(self):
+        return len(self._points)
+
+    @property
+    def shape(self) -> tuple:
+        """The number of values of every swept setting."""
+        return tuple(len(values) for values in self.values)
+
+    def settings(self, row: int) -> atoms_simulator.Settings:
+        """Creates the settings of the simulations of a single point of the grid.
+
+        :param row: index of the point
+        :return: copy of the settings of the test with the swept values
+        """
+        settings = atoms_simulator.Settings(self._settings.source)
+        settings.tags = {name: value for name, value in self._settings.tags.items() if name != "sweep"}
+        for name, value in zip(self.axes, self._points[row]):
+            settings.new(name, value)
+        return settings
+
+    def n(self, row: int) -> int:
+        """Returns the number of atoms of a single point of the grid.
+
+        :param row: index of the point
+        :return:
+        """
+        return self._points[row][-1]
+
+    def swept(self, row: int) -> dict:
+        """Returns the values of the swept settings of a single point of the grid, except the number of atoms.
+
+        :param row: index of the point
+        :return: the values by name, empty if only the number of atoms is swept
+        """
+        return dict(zip(self.axes[:-1], self._points[row][:-1]))
+
+    def cell_name(self, row: int, repetition: int) -> str:
+        """Creates the name of the files of a single simulation, ex. N8_R0 or r20_N8_R0 if r is swept.
+
+        :param row: index of the point
+        :param repetition: index of the repetition
+        :return:
+        """
+        return "".join(f"{name}{value:g}_" for name, value in zip(self.axes, self._points[row])) + f"R{repetition}"
+
+    def cost(self, row: int, broad_phase: str = "grid") -> float:
+        """Estimates the cost of a single simulation of a point of the grid, see :py:func:`cell_cost`.
+
+        :param row: index of the point
+        :param broad_phase: the broad phase method
+        :return:
+        """
+        return cell_cost(atoms_simulator.SimulationConfig.from_settings(self.settings(row)), broad_phase)
+
+
+def cell_cost(config: atoms_simulator.SimulationConfig, broad_phase: str = "grid") -> float:
+    """Estimates the time of a single simulation, in arbitrary units.
+
+    Every turn costs the number of atoms plus the number of pairs checked by the broad phase. The brute broad phase
+    checks all pairs, the grid checks only the pairs in the neighbouring cells, which are about 9 / cells of them
+    in a container divided into cells of the size of the largest collision distance.
+
+    :param config: settings of the simulation
+    :param broad_phase: the broad phase method
+    :return:
+    """
+    atoms = config.N + 1
+    pairs = atoms * (atoms - 1) / 2
+    if broad_phase == "grid":
+        cells = math.ceil(config.width / config.cell_size) * math.ceil(config.height / config.cell_size)
+        pairs *= min(1.0, 9 / cells)
+    return (config.M + 1) * (atoms + pairs)
+
+
+def save_results(path: str, sweep: Sweep, results: dict):
+    """Saves the results of a test to a .npz file as arrays with an axis for every swept setting, the file is
+    replaced atomically.
+
+    :param path:
+    :param sweep: the grid of the test
+    :param results: dictionary of arrays with a value for every row of the test, by name
+    """
+    arrays = {f"axis_{name}": numpy.asarray(values) for name, values in zip(sweep.axes, sweep.values)}
+    arrays.update({name: numpy.asarray(values).reshape(sweep.shape) for name, values in results.items()})
+    with open(f"{path}.tmp", "wb") as target:
+        numpy.savez(target, axes=numpy.array(sweep.axes), **arrays)
+    os.replace(f"{path}.tmp", path)
+
+
+def load_results(path: str) -> (dict, dict):
+    """Loads the results saved by :py:func:`save_results`.
+
+    :param path:
+    :return: the values of every swept setting and the arrays of the results, by name
+    """
+    with numpy.load(path) as origin:
+        axes = {str(name): origin[f"axis_{name}"] for name in origin["axes"]}
+        results = {name: origin[name] for name in origin.files if name != "axes" and not name.startswith("axis_")}
+    return axes, results
+
+
+def select(axes: dict, x: str, fixed: dict) -> (str, list):
+    """Chooses the curves of a plot of the results.
+
+    The *x* setting is the axis of the plot, every other swept setting has to be fixed, except for at most one, whose
+    every value gets its own curve. The settings that have a single value are fixed implicitly.
+
+    :param axes: the values of every swept setting, by name
+    :param x: name of the setting on the axis of the plot
+    :param fixed: the values of the fixed settings, by name
+    :return: name of the setting whose values get separate curves, None if there is a single curve, and the list of
+        pairs of the value of that setting and the index of the curve in the arrays of the results
+    :raise ValueError: if a setting isn't swept, a value isn't a part of the sweep or too few settings are fixed
+    """
+    for name in (x, *fixed):
+        if name not in axes:
+            raise ValueError(f"The {name} setting isn't swept in this data batch.")
+    if x in fixed:
+        raise ValueError(f"The {x} setting can't be both on the axis of the plot and fixed.")
+    index = []
+    free = []
+    for axis, (name, values) in enumerate(axes.items()):
+        if name == x:
+            index.append(slice(None))
+        elif name in fixed:
+            matches = numpy.flatnonzero(numpy.isclose(values, fixed[name]))
+            if not len(matches):
+                raise ValueError(f"The {name} setting has no value {fixed[name]:g} in this data batch.")
+            index.append(int(matches[0]))
+        elif len(values) == 1:
+            index.append(0)
+        else:
+            index.append(None)
+            free.append((axis, name))
+    if len(free) > 1:
+        raise ValueError(f"Fix all but one of the {', '.join(name for _, name in free)} settings with --at.")
+    if not free:
+        return None, [(None, tuple(index))]
+    axis, name = free[0]
+    curves = []
+    for i, value in enumerate(axes[name]):
+        index[axis] = i
+        curves.append((value, tuple(index)))
+    return name, curves
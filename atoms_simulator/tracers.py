@@ -0,0 +1,164 @@
+from __future__ import annotations
+import os
+import numpy
+from atoms_simulator.stats import RunningStats, push_arrays
+
+
+class Tracers:
+    """A class used to accumulate the bounces and the free paths of every atom of a simulation at once.
+
+    Every atom is treated the same way as the test atom: it is marked as bounced when it collides with another atom,
+    and the distance that it has travelled since its previous bounce is saved after the collisions of a turn. The
+    statistics of the saved distances are kept per atom in arrays, updated with the same formulas as
+    :py:meth:`atoms_simulator.stats.RunningStats.push`, so the values of the atom at index 0 are equal to the
+    statistics of the test atom.
+
+    :ivar bounced: Indicates which atoms have bounced recently.
+    :type bounced: :py:class:`numpy.ndarray`
+    :ivar distance: The distances that the atoms have managed to travel since the last bounce.
+    :type distance: :py:class:`numpy.ndarray`
+    :ivar count: The number of bounces of every atom.
+    :type count: :py:class:`numpy.ndarray`
+    :ivar total: The sum of all previous distances of every atom.
+    :type total: :py:class:`numpy.ndarray`
+    :ivar minimum: The shortest of all previous distances of every atom.
+    :type minimum: :py:class:`numpy.ndarray`
+    :ivar maximum: The longest of all previous distances of every atom.
+    :type maximum: :py:class:`numpy.ndarray`
+    """
+    def __init__(self, size: int):
+        """Initialize a Tracers type object.
+
+        :param size: number of atoms, including the test atom
+        """
+        self.bounced = numpy.zeros(size, dtype=bool)
+        self.distance = numpy.zeros(size)
+        self.count = numpy.zeros(size, dtype=numpy.int64)
+        self.total = numpy.zeros(size)
+        self.minimum = numpy.full(size, numpy.inf)
+        self.maximum = numpy.full(size, -numpy.inf)
+        self._mean = numpy.zeros(size)
+        self._m2 = numpy.zeros(size)
+
+    def __len__(self):
+        return len(self.count)
+
+    def mark(self, i: numpy.ndarray, j: numpy.ndarray):
+        """Marks the atoms that are a part of one of the pairs as bounced.
+
+        :param i: indices of the first atoms of the pairs that bounced
+        :param j: indices of the second atoms of the pairs that bounced
+        """
+        self.bounced[i] = True
+        self.bounced[j] = True
+
+    def move(self, vx: numpy.ndarray, vy: numpy.ndarray, time_step: float, atoms: numpy.ndarray = None):
+        """Adds the distances travelled during *time_step* to the counters.
+
+        :param vx: the velocity vectors' x coordinates of all atoms
+        :param vy: the velocity vectors' y coordinates of all atoms
+        :param time_step:
+        :param atoms: If given, only these atoms are moved, indices or a boolean mask.
+        """
+        if atoms is None:
+            self.distance += time_step * numpy.sqrt(vx ** 2 + vy ** 2)
+        else:
+            self.distance[atoms] += time_step * numpy.sqrt(vx[atoms] ** 2 + vy[atoms] ** 2)
+
+    def store_distance(self):
+        """Saves the current distances of the atoms that bounced and resets their counters.
+
+        :return:
+        """
+        if self.bounced.any():
+            push_arrays(self, self.bounced, self.distance[self.bounced])
+            self.distance[self.bounced] = 0.0
+        self.bounced[:] = False
+
+    def merge(self, other: Tracers):
+        """Adds the distances accumulated by *other* to the statistics of the corresponding atoms.
+
+        :param other:
+        :raise ValueError: if the numbers of atoms are different
+        """
+        if len(other) != len(self):
+            raise ValueError("Tracers of different numbers of atoms can't be merged.")
+        count = self.count + other.count
+        share = numpy.divide(other.count, count, out=numpy.zeros(len(self)), where=count > 0)
+        delta = other._mean - self._mean
+        self._m2 += other._m2 + delta ** 2 * self.count * share
+        self._mean += delta * share
+        self.count = count
+        self.total += other.total
+        self.minimum = numpy.minimum(self.minimum, other.minimum)
+        self.maximum = numpy.maximum(self.maximum, other.maximum)
+
+    def split(self, parts: int) -> list:
+        """Divides the atoms into *parts* groups of equal size, ex. the replicas of an ensemble.
+
+        :param parts: number of groups
+        :return: list of Tracers type objects, the unfinished distances are not copied
+        """
+        tracers = []
+        for part in numpy.split(numpy.arange(len(self)), parts):
+            tracer = Tracers(len(part))
+            for name in ("count", "total", "minimum", "maximum", "_mean", "_m2"):
+                setattr(tracer, name, getattr(self, name)[part].copy())
+            tracers.append(tracer)
+        return tracers
+
+    def average_distance(self) -> numpy.ndarray:
+        """Calculates the average distance that every atom travels.
+
+        :return: the averages, nan for the atoms that have never bounced
+        """
+        return numpy.divide(self.total, self.count, out=numpy.full(len(self), numpy.nan), where=self.count > 0)
+
+    def atom_stats(self, atom: int) -> RunningStats:
+        """Returns the statistics of the distances of a single atom.
+
+        :param atom: index of the atom, 0 for the test atom
+        :return:
+        """
+        return RunningStats.from_moments(self.count[atom], self.total[atom], self._mean[atom], self._m2[atom],
+                                         self.minimum[atom], self.maximum[atom])
+
+    def pooled(self) -> RunningStats:
+        """Returns the statistics of the distances of all atoms taken together.
+
+        :return:
+        """
+        count = int(self.count.sum())
+        if count == 0:
+            return RunningStats()
+        mean = float(self.total.sum()) / count
+        m2 = float(self._m2.sum() + (self.count * (self._mean - mean) ** 2).sum())
+        return RunningStats.from_moments(count, float(self.total.sum()), mean, m2, float(self.minimum.min()),
+                                         float(self.maximum.max()))
+
+    def save(self, path: str):
+        """Saves the statistics of every atom to a .npz file, the file is replaced atomically.
+
+        :param path:
+        """
+        with open(f"{path}.tmp", "wb") as target:
+            numpy.savez(target, count=self.count, total=self.total, minimum=self.minimum, maximum=self.maximum,
+                        mean=self._mean, m2=self._m2)
+        os.replace(f"{path}.tmp", path)
+
+    @classmethod
+    def load(cls, path: str) -> Tracers:
+        """Loads the statistics saved by :py:meth:`save`.
+
+        :param path:
+        :return:
+        """
+        with numpy.load(path) as origin:
+            tracers = cls(len(origin["count"]))
+            tracers.count = origin["count"]
+            tracers.total = origin["total"]
+            tracers.minimum = origin["minimum"]
+            tracers.maximum = origin["maximum"]
+            tracers._mean = origin["mean"]
+            tracers._m2 = origin["m2"]
+        return tracers
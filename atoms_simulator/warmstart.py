@@ -0,0 +1,156 @@
+from __future__ import annotations
+import os
+import random
+import numpy
+import atoms_simulator
+from atoms_simulator.arrays import random_arrays
+
+
+class WarmStart:
+    """A class used to keep a relaxed state of the atoms, so that the simulations can start from a thermalized gas
+    instead of the lattice of :py:func:`atoms_simulator.random_list`.
+
+    A state is created on the lattice, relaxed once with :py:meth:`relax`, and then reused: :py:meth:`grow` inserts
+    more atoms into the free space, so a state of N atoms seeds the state of N + N_step atoms after a shorter
+    relaxation, and :py:meth:`fork` re-randomizes the velocities, so the repetitions of a test start from the same
+    positions with independent velocities. The speeds are only shuffled and turned, so the distribution of the
+    energy of the relaxed gas, and with it the free path, is left intact.
+
+    :ivar config: settings of the state, its N is the number of atoms without the test atom
+    :type config: :py:class:`atoms_simulator.SimulationConfig`
+    :ivar x: the x position coordinates of the atoms, the test atom is the first one
+    :type x: :py:class:`numpy.ndarray`
+    :ivar y: the y position coordinates of the atoms
+    :type y: :py:class:`numpy.ndarray`
+    :ivar vx: the velocity vectors' x coordinates of the atoms
+    :type vx: :py:class:`numpy.ndarray`
+    :ivar vy: the velocity vectors' y coordinates of the atoms
+    :type vy: :py:class:`numpy.ndarray`
+    """
+    def __init__(self, config: atoms_simulator.SimulationConfig, x: numpy.ndarray, y: numpy.ndarray,
+                 vx: numpy.ndarray, vy: numpy.ndarray):
+        """Initialize a WarmStart type object.
+
+        :param config: settings of the state
+        :param x: the x position coordinates of the atoms, the test atom is the first one
+        :param y: the y position coordinates of the atoms
+        :param vx: the velocity vectors' x coordinates of the atoms
+        :param vy: the velocity vectors' y coordinates of the atoms
+        :raise ValueError: if the number of atoms is different than N + 1
+        """
+        if not len(x) == len(y) == len(vx) == len(vy) == config.N + 1:
+            raise ValueError("The number of atoms of the state must be equal to N + 1.")
+        self.config = config
+        self.x = numpy.asarray(x, dtype=numpy.float64)
+        self.y = numpy.asarray(y, dtype=numpy.float64)
+        self.vx = numpy.asarray(vx, dtype=numpy.float64)
+        self.vy = numpy.asarray(vy, dtype=numpy.float64)
+
+    def __len__(self):
+        return len(self.x)
+
+    @classmethod
+    def create(cls, settings: atoms_simulator.Settings | atoms_simulator.SimulationConfig,
+               seed: int = None) -> WarmStart:
+        """Places the atoms on the lattice, the same way as a simulation without a warm start.
+
+        :param settings: Settings file containing all of the necessary options, or the config created from it.
+        :param seed: Seed of the random number generator used to place the atoms.
+        :return:
+        """
+        config = atoms_simulator.SimulationConfig.from_settings(settings) \
+            if isinstance(settings, atoms_simulator.Settings) else settings
+        x, y, vx, vy, _ = atoms_simulator.create_arrays(config, None if seed is None else random.Random(seed))
+        return cls(config, x, y, vx, vy)
+
+    def arrays(self) -> tuple:
+        """Returns copies of the arrays, ready to be used by an engine.
+
+        :return: the x and y position coordinates, the velocity vectors' x and y coordinates and the radii of the atoms
+        """
+        return self.x.copy(), self.y.copy(), self.vx.copy(), self.vy.copy(), \
+            numpy.full(len(self), self.config.r, dtype=numpy.float64)
+
+    def matches(self, config: atoms_simulator.SimulationConfig) -> bool:
+        """Checks if a simulation with the given settings can start from the state.
+
+        :param config: settings of the simulation
+        :return: True if the container, the atoms and the collision tolerance are the same
+        """
+        return (self.config.h, self.config.w, self.config.r, self.config.c, self.config.N) == \
+            (config.h, config.w, config.r, config.c, config.N)
+
+    def relax(self, turns: int, broad_phase: str = "grid") -> WarmStart:
+        """Lets the atoms collide without measuring anything, in the numpy engine.
+
+        :param turns: number of turns
+        :param broad_phase: the broad phase method
+        :return: the relaxed state
+        """
+        settings = atoms_simulator.Settings(None)
+        for name, value in self.config._replace(M=turns)._asdict().items():
+            settings.new(name, value)
+        with atoms_simulator.Simulation(settings, "numpy", broad_phase, start=self) as simulation:
+            simulation.step(turns)
+            state = simulation.state
+            return WarmStart(self.config, state.x.copy(), state.y.copy(), state.vx.copy(), state.vy.copy())
+
+    def grow(self, n: int, rng: numpy.random.Generator = None) -> WarmStart:
+        """Inserts new atoms into the free space between the atoms.
+
+        The new atoms are placed on the slots of the lattice that are far enough from all atoms, and get the speeds
+        of randomly chosen atoms of the state in random directions.
+
+        :param n: number of the new atoms
+        :param rng: The random number generator that will be used, a new one if omitted.
+        :return: the state with N + *n* atoms, it should be relaxed before it's used
+        :raise ValueError: if there are not enough free slots for the new atoms
+        """
+        if rng is None:
+            rng = numpy.random.default_rng()
+        config = self.config
+        x, y, _, _ = random_arrays(n, config.width, config.height, config.v, config.r, config.c, self.x, self.y, rng)
+        speed = rng.choice(numpy.sqrt(self.vx ** 2 + self.vy ** 2), n)
+        angle = rng.uniform(0, 2 * numpy.pi, n)
+        return WarmStart(config._replace(N=config.N + n), numpy.concatenate((self.x, x)),
+                         numpy.concatenate((self.y, y)), numpy.concatenate((self.vx, speed * numpy.cos(angle))),
+                         numpy.concatenate((self.vy, speed * numpy.sin(angle))))
+
+    def fork(self, rng: numpy.random.Generator = None) -> WarmStart:
+        """Creates an independent copy of the state with re-randomized velocities.
+
+        The speeds are shuffled between the atoms and every atom gets a random direction, the positions are kept.
+
+        :param rng: The random number generator that will be used, a new one if omitted.
+        :return:
+        """
+        if rng is None:
+            rng = numpy.random.default_rng()
+        speed = rng.permutation(numpy.sqrt(self.vx ** 2 + self.vy ** 2))
+        angle = rng.uniform(0, 2 * numpy.pi, len(self))
+        return WarmStart(self.config, self.x.copy(), self.y.copy(), speed * numpy.cos(angle), speed * numpy.sin(angle))
+
+    def save(self, path: str):
+        """Saves the state to a .npz file, the file is replaced atomically.
+
+        :param path:
+        """
+        with open(f"{path}.tmp", "wb") as target:
+            numpy.savez(target, config=numpy.array(self.config, dtype=numpy.float64), x=self.x, y=self.y, vx=self.vx,
+                        vy=self.vy)
+        os.replace(f"{path}.tmp", path)
+
+    @classmethod
+    def load(cls, path: str) -> WarmStart:
+        """Loads the state saved by :py:meth:`save`.
+
+        :param path:
+        :return:
+        """
+        with numpy.load(path) as origin:
+            values = origin["config"].tolist()
+            config = atoms_simulator.SimulationConfig(*(
+                value if name in ("r", "c") else int(value)
+                for name, value in zip(atoms_simulator.SimulationConfig._fields, values)
+            ))
+            return cls(config, origin["x"], origin["y"], origin["vx"], origin["vy"])
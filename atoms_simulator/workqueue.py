@@ -0,0 +1,162 @@
+from __future__ import annotations
+import os
+import os.path
+import sqlite3
+import time
+import uuid
+
+
+class WorkQueue:
+    """A class used to pass tasks between a coordinator and worker processes through an SQLite database in a shared
+    catalog, so the workers can run on any machine that can reach the catalog.
+
+    A worker leases a task for a limited time and renews the lease while it works. A task whose lease has expired,
+    ex. because its worker died, is handed to the next worker, until it has been leased *max_attempts* times, then
+    it's marked as failed. A task whose worker reported an error is retried the same way. The payloads and the
+    results are opaque bytes, the coordinator and the workers have to trust each other.
+
+    :ivar path: the catalog of the queue
+    :type path: str
+    """
+    def __init__(self, path: str, timeout: float = 60):
+        """Initialize a WorkQueue type object, the catalog and the database are created if they don't exist.
+
+        :param path: the catalog of the queue
+        :param timeout: the longest time of waiting for another process to unlock the database in seconds
+        """
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        self._db = sqlite3.connect(os.path.join(path, "queue.sqlite"), timeout=timeout)
+        with self._db:
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS tasks (id INTEGER PRIMARY KEY, batch TEXT, name TEXT, priority REAL, "
+                "payload BLOB, state TEXT, token TEXT, worker TEXT, lease_until REAL, attempts INTEGER, "
+                "max_attempts INTEGER, result BLOB, error TEXT)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS tasks_state ON tasks (state, priority)")
+            self._db.execute("CREATE INDEX IF NOT EXISTS tasks_token ON tasks (token)")
+
+    def put(self, batch: str, tasks: list, max_attempts: int = 3):
+        """Publishes tasks.
+
+        :param batch: identifier of the coordinator that the results should be returned to
+        :param tasks: list of (name, priority, payload) tuples, the tasks with higher priorities are leased first
+        :param max_attempts: the largest number of times a task is leased
+        """
+        with self._db:
+            self._db.executemany(
+                "INSERT INTO tasks (batch, name, priority, payload, state, attempts, max_attempts) "
+                "VALUES (?, ?, ?, ?, 'pending', 0, ?)",
+                [(batch, name, priority, payload, max_attempts) for name, priority, payload in tasks]
+            )
+
+    def lease(self, worker: str, duration: float) -> (str, bytes):
+        """Takes the pending task with the highest priority, or one whose lease has expired.
+
+        :param worker: name of the worker
+        :param duration: the time after which the task is given to another worker if the lease isn't renewed
+        :return: the token of the lease and the payload, None if there are no tasks to perform
+        """
+        now = time.time()
+        token = uuid.uuid4().hex
+        with self._db:
+            self._db.execute(
+                "UPDATE tasks SET state = 'failed', token = NULL, "
+                "error = 'The lease has expired ' || attempts || ' times, the last worker was ' || worker || '.' "
+                "WHERE state = 'leased' AND lease_until < ? AND attempts >= max_attempts", (now,)
+            )
+            # A single statement is atomic, so two workers never get the same task.
+            self._db.execute(
+                "UPDATE tasks SET state = 'leased', token = ?, worker = ?, lease_until = ?, attempts = attempts + 1 "
+                "WHERE id = (SELECT id FROM tasks WHERE state = 'pending' OR (state = 'leased' AND lease_until < ?) "
+                "ORDER BY priority DESC, id LIMIT 1)", (token, worker, now + duration, now)
+            )
+        row = self._db.execute("SELECT payload FROM tasks WHERE token = ?", (token,)).fetchone()
+        return None if row is None else (token, row[0])
+
+    def renew(self, token: str, duration: float) -> bool:
+        """Extends a lease.
+
+        :param token: the token of the lease
+        :param duration: the time after which the task is given to another worker if the lease isn't renewed
+        :return: False if the lease has already been taken over by another worker
+        """
+        with self._db:
+            cursor = self._db.execute(
+                "UPDATE tasks SET lease_until = ? WHERE token = ? AND state = 'leased'", (time.time() + duration, token)
+            )
+        return cursor.rowcount > 0
+
+    def complete(self, token: str, result: bytes) -> bool:
+        """Stores the result of a leased task.
+
+        :param token: the token of the lease
+        :param result:
+        :return: False if the lease has been taken over by another worker, the result is discarded then
+        """
+        with self._db:
+            cursor = self._db.execute(
+                "UPDATE tasks SET state = 'done', token = NULL, result = ? WHERE token = ? AND state = 'leased'",
+                (result, token)
+            )
+        return cursor.rowcount > 0
+
+    def fail(self, token: str, error: str):
+        """Reports an error of a leased task, it is retried unless it has been leased *max_attempts* times.
+
+        :param token: the token of the lease
+        :param error: description of the error
+        """
+        with self._db:
+            self._db.execute(
+                "UPDATE tasks SET state = CASE WHEN attempts >= max_attempts THEN 'failed' ELSE 'pending' END, "
+                "token = NULL, error = ? WHERE token = ? AND state = 'leased'", (error, token)
+            )
+
+    def release(self, token: str):
+        """Returns a leased task to the queue without counting the attempt, ex. when the worker is stopped.
+
+        :param token: the token of the lease
+        """
+        with self._db:
+            self._db.execute(
+                "UPDATE tasks SET state = 'pending', token = NULL, attempts = attempts - 1 "
+                "WHERE token = ? AND state = 'leased'", (token,)
+            )
+
+    def active(self, batch: str) -> int:
+        """Counts the tasks of a coordinator that are being performed by a worker whose lease hasn't expired.
+
+        :param batch: identifier of the coordinator
+        :return:
+        """
+        return self._db.execute(
+            "SELECT COUNT(*) FROM tasks WHERE batch = ? AND state = 'leased' AND lease_until >= ?", (batch, time.time())
+        ).fetchone()[0]
+
+    def collect(self, batch: str) -> list:
+        """Removes the finished and the failed tasks of a coordinator from the queue.
+
+        :param batch: identifier of the coordinator
+        :return: list of (name, result, error) tuples, the result is None for the failed tasks and the error is None
+            for the finished ones
+        """
+        with self._db:
+            rows = self._db.execute(
+                "SELECT id, name, result, CASE WHEN state = 'failed' THEN error END FROM tasks "
+                "WHERE batch = ? AND state IN ('done', 'failed')", (batch,)
+            ).fetchall()
+            self._db.executemany("DELETE FROM tasks WHERE id = ?", [(row[0],) for row in rows])
+        return [row[1:] for row in rows]
+
+    def cancel(self, batch: str):
+        """Removes all tasks of a coordinator, the results of the tasks that are being performed are discarded.
+
+        :param batch: identifier of the coordinator
+        """
+        with self._db:
+            self._db.execute("DELETE FROM tasks WHERE batch = ?", (batch,))
+
+    def close(self):
+        """Closes the database."""
+        self._db.close()
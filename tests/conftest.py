@@ -0,0 +1,17 @@
+import pytest
+import atoms_simulator
+
+
+# The settings of the generated settings file, with fewer turns.
+BASE_SETTINGS = {"h": 20, "w": 20, "r": 30, "v": 10, "c": 3, "M": 100, "K": 5, "N": 30}
+
+
+@pytest.fixture
+def make_settings():
+    """Creates settings of a single simulation, the values of :py:data:`BASE_SETTINGS` can be replaced."""
+    def make(**values) -> atoms_simulator.Settings:
+        settings = atoms_simulator.Settings(None)
+        for name, value in dict(BASE_SETTINGS, **values).items():
+            settings.new(name, value)
+        return settings
+    return make
@@ -0,0 +1,132 @@
+import os
+import os.path
+import sqlite3
+import subprocess
+import sys
+import numpy
+import pytest
+import toml
+from click.testing import CliRunner
+import atoms_simulator
+import atoms_simulator.bin as cli
+from atoms_simulator.sweep import load_results
+
+
+# A test small enough to be performed in a moment.
+TEST_SETTINGS = {
+    "h": 20, "w": 20, "r": 30, "v": 10, "c": 3, "M": 50, "K": 5, "R": 2, "N_min": 8, "N_step": 4, "N_number": 2
+}
+
+
+@pytest.fixture
+def workspace(tmp_path, monkeypatch):
+    """Changes the current directory to a new one with a settings file and an empty result cache."""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+    with open(tmp_path / "settings_ats.toml", "w") as target:
+        toml.dump(TEST_SETTINGS, target)
+    return tmp_path
+
+
+def run(*args):
+    """Performs a test with the numpy engine and a fixed seed."""
+    return CliRunner().invoke(cli.ats, ["test", "-s", "7", "-e", "numpy", *args])
+
+
+def batch_results(workspace, name: str) -> dict:
+    """Loads the results of a data batch."""
+    return load_results(os.path.join(workspace, "ats_results", name, "results.npz"))[1]
+
+
+def test_saves_results_of_numbers_of_atoms(workspace):
+    result = run("--no-cache")
+    assert result.exit_code == 0, result.output
+    batch = workspace / "ats_results" / "data_batch1"
+    assert batch_results(workspace, "data_batch1")["repetitions"].tolist() == [2, 2]
+    assert numpy.loadtxt(batch / "bounces.csv").shape == (2,)
+    assert numpy.loadtxt(batch / "change_of_position.csv").shape == (2,)
+
+
+def test_sweep(workspace):
+    with open("settings_ats.toml", "a") as target:
+        target.write("\n[sweep]\nv = [10, 12]\n")
+    result = run("--no-cache")
+    assert result.exit_code == 0, result.output
+    axes, results = load_results(os.path.join("ats_results", "data_batch1", "results.npz"))
+    assert {name: values.tolist() for name, values in axes.items()} == {"v": [10, 12], "N": [8, 12]}
+    assert results["bounces"].shape == (2, 2)
+    # Only a sweep of the numbers of atoms is saved in the .csv files.
+    assert not os.path.exists(os.path.join("ats_results", "data_batch1", "bounces.csv"))
+    with sqlite3.connect(os.path.join("ats_results", "results.sqlite")) as db:
+        seeds = db.execute("SELECT v, N, repetition, seed FROM runs").fetchall()
+    assert len(seeds) == 8
+    # The points of the grid that differ only in the swept setting don't share the initial states.
+    assert len({seed for *_, seed in seeds}) == 8
+
+
+def test_cache(workspace):
+    first = run()
+    assert first.exit_code == 0, first.output
+    assert "in the cache" not in first.output
+    second = run()
+    assert second.exit_code == 0, second.output
+    assert "Found 4 of 4 simulations in the cache." in second.output
+    expected, cached = batch_results(workspace, "data_batch1"), batch_results(workspace, "data_batch2")
+    for name in ("bounces", "change_of_position", "change_of_position_se"):
+        assert cached[name].tolist() == expected[name].tolist()
+    assert "in the cache" not in run("--no-cache").output
+
+
+def test_resume(workspace, monkeypatch):
+    run_tasks = cli.run_tasks
+
+    def interrupted(tasks, jobs):
+        for number, result in enumerate(run_tasks(tasks, jobs)):
+            if number == 2:
+                raise KeyboardInterrupt
+            yield result
+
+    monkeypatch.setattr(cli, "run_tasks", interrupted)
+    result = run("--no-cache")
+    assert result.exit_code != 0
+    done = cli.load_progress(os.path.join("ats_results", "data_batch1", "progress.npz"))[2]
+    assert done.sum() == 2
+    monkeypatch.setattr(cli, "run_tasks", run_tasks)
+    result = CliRunner().invoke(cli.ats, ["test", "--resume", "data_batch1", "--no-cache"])
+    assert result.exit_code == 0, result.output
+    assert not os.path.exists(os.path.join("ats_results", "data_batch1", "progress.npz"))
+    assert run("--no-cache").exit_code == 0
+    resumed, expected = batch_results(workspace, "data_batch1"), batch_results(workspace, "data_batch2")
+    for name in ("bounces", "change_of_position", "repetitions"):
+        assert resumed[name].tolist() == expected[name].tolist()
+
+
+def test_resume_of_missing_batch(workspace):
+    result = CliRunner().invoke(cli.ats, ["test", "--resume", "data_batch1"])
+    assert "doesn't contain an interrupted test" in result.output
+
+
+def test_serve(workspace):
+    queue = str(workspace / "queue")
+    root = os.path.dirname(os.path.dirname(atoms_simulator.__file__))
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, (root, os.environ.get("PYTHONPATH")))))
+    worker = subprocess.Popen(
+        [sys.executable, "-c", "from atoms_simulator.bin import ats; ats()", "worker", "-q", queue],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        result = run("--no-cache", "--serve", queue, "--serve-timeout", "60")
+    finally:
+        worker.kill()
+        worker.wait()
+    assert result.exit_code == 0, result.output
+    assert run("--no-cache").exit_code == 0
+    served, expected = batch_results(workspace, "data_batch1"), batch_results(workspace, "data_batch2")
+    for name in ("bounces", "change_of_position", "repetitions"):
+        assert served[name].tolist() == expected[name].tolist()
+
+
+def test_serve_without_workers(workspace):
+    result = run("--no-cache", "--serve", str(workspace / "queue"), "--serve-timeout", "1")
+    assert result.exit_code == 1
+    assert "No worker has performed the simulations for 1 s" in result.output
@@ -0,0 +1,31 @@
+import pytest
+import atoms_simulator
+from atoms_simulator.tracers import Tracers
+
+
+SEEDS = range(5)
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_numpy_engine_matches_objects_engine(make_settings, seed):
+    settings = make_settings(N=50, M=200)
+    expected = atoms_simulator.simulate(settings, False, "objects", "grid", seed)
+    assert atoms_simulator.simulate(settings, False, "numpy", "grid", seed) == expected
+
+
+def test_ensemble_matches_numpy_engine(make_settings):
+    settings = make_settings(N=50, M=200)
+    bounces, averages = atoms_simulator.simulate_ensemble(settings, list(SEEDS))
+    for seed, replica_bounces, replica_average in zip(SEEDS, bounces, averages):
+        assert (replica_bounces, replica_average) == atoms_simulator.simulate(settings, False, "numpy", "grid", seed)
+
+
+@pytest.mark.parametrize("workers", [2, 3])
+def test_strips_match_numpy_engine(make_settings, workers):
+    settings = make_settings(h=30, w=60, N=150, M=150)
+    expected, result = Tracers(151), Tracers(151)
+    for seed in SEEDS[:2]:
+        assert atoms_simulator.simulate(settings, False, "numpy", "grid", seed, tracers=expected) == \
+            atoms_simulator.simulate(settings, False, "numpy", "grid", seed, workers=workers, tracers=result)
+    for field in ("count", "total", "minimum", "maximum", "_mean", "_m2"):
+        assert getattr(result, field).tolist() == getattr(expected, field).tolist()
@@ -0,0 +1,26 @@
+import pytest
+import atoms_simulator
+
+
+SEED = 3
+
+
+@pytest.mark.parametrize("engine", ["objects", "numpy"])
+def test_grid_matches_brute(make_settings, engine):
+    settings = make_settings(N=60, M=200)
+    assert atoms_simulator.simulate(settings, False, engine, "grid", SEED) == \
+        atoms_simulator.simulate(settings, False, engine, "brute", SEED)
+
+
+def test_ensemble_grid_matches_brute(make_settings):
+    settings = make_settings(N=60, M=200)
+    grid = atoms_simulator.simulate_ensemble(settings, [SEED, SEED + 1], "grid")
+    brute = atoms_simulator.simulate_ensemble(settings, [SEED, SEED + 1], "brute")
+    assert [values.tolist() for values in grid] == [values.tolist() for values in brute]
+
+
+def test_strips_match_brute(make_settings):
+    # The strips always divide the container into the cells of the grid.
+    settings = make_settings(h=30, w=60, N=150, M=150)
+    assert atoms_simulator.simulate(settings, False, "numpy", "grid", SEED, workers=2) == \
+        atoms_simulator.simulate(settings, False, "numpy", "brute", SEED)